@@ -0,0 +1,245 @@
+import numpy as np
+from pydub import AudioSegment
+from logger import logger
+from exceptions import AudioGenerationError
+
+class EffectsChain:
+    """
+    声明式音频效果链
+
+    效果以dict列表配置，例如:
+        [{"type": "gain", "db": 3}, {"type": "fade_in", "ms": 300}]
+
+    支持的效果:
+        gain        增益，参数 db
+        fade_in     淡入，参数 ms
+        fade_out    淡出，参数 ms
+        normalize   响度标准化，参数 target_dbfs
+        eq          双二阶滤波，参数 kind (lowpass/highpass/peaking/lowshelf/highshelf)、freq、q、db
+        compressor  压缩器，参数 threshold_db、ratio、attack_ms、release_ms、makeup_db
+        resample    重采样，参数 rate
+
+    连续的线性效果（gain、fade_in、fade_out，以及normalize算出的增益）会合并成
+    一次NumPy遍历，整条效果链只分配一次输出缓冲区（重采样除外）。
+    """
+
+    LINEAR_EFFECTS = {'gain', 'fade_in', 'fade_out'}
+    SUPPORTED_EFFECTS = LINEAR_EFFECTS | {'normalize', 'eq', 'compressor', 'resample'}
+
+    def __init__(self, effects=None):
+        self.effects = list(effects or [])
+        for effect in self.effects:
+            if effect.get('type') not in self.SUPPORTED_EFFECTS:
+                raise AudioGenerationError(f"不支持的音频效果: {effect.get('type')}")
+
+    def __add__(self, other):
+        return EffectsChain(self.effects + list(other.effects))
+
+    def __bool__(self):
+        return bool(self.effects)
+
+    @staticmethod
+    def _to_buffer(audio):
+        """整数PCM转 (帧数, 声道数) 的float32缓冲区，返回 (缓冲区, 满量程)"""
+        scale = float(1 << (8 * audio.sample_width - 1))
+        buffer = np.array(audio.get_array_of_samples(), dtype=np.float32).reshape((-1, audio.channels))
+        buffer *= 1.0 / scale
+        return buffer, scale
+
+    def locked(self, audio):
+        """
+        用audio测得的增益代替效果链中的normalize，返回新的效果链
+        渐进式渲染拿不到整段音频，之后的片段都使用这个固定增益，而不是逐段标准化
+        """
+        effects = []
+        for effect in self.effects:
+            if effect['type'] == 'normalize':
+                # 增益按normalize之前的效果处理后的结果计算（前面的normalize已经固定）
+                buffer, _ = EffectsChain(effects).process(self._to_buffer(audio)[0], audio.frame_rate)
+                effect = {'type': 'gain', 'db': self._normalize_gain(buffer, effect)}
+            effects.append(effect)
+        return EffectsChain(effects)
+
+    def apply(self, audio):
+        """对AudioSegment应用效果链，返回新的AudioSegment"""
+        if not self.effects:
+            return audio
+
+        # 整数PCM转float32，这是效果链中唯一一次整段分配
+        buffer, scale = self._to_buffer(audio)
+        buffer, frame_rate = self.process(buffer, audio.frame_rate)
+
+        np.multiply(buffer, scale, out=buffer)
+        np.clip(buffer, -scale, scale - 1, out=buffer)
+        dtype = {1: np.int8, 2: np.int16, 4: np.int32}[audio.sample_width]
+        return AudioSegment(
+            data=buffer.astype(dtype).tobytes(),
+            sample_width=audio.sample_width,
+            frame_rate=frame_rate,
+            channels=audio.channels
+        )
+
+    def process(self, buffer, frame_rate):
+        """
+        原地处理 (帧数, 声道数) 的float32缓冲区
+        返回: (处理后的缓冲区, 采样率)，只有重采样会返回新的缓冲区
+        """
+        pending = []
+        for effect in self.effects:
+            kind = effect['type']
+            if kind in self.LINEAR_EFFECTS:
+                pending.append(effect)
+                continue
+
+            # 非线性效果需要看到之前所有线性效果的结果
+            self._apply_linear(buffer, frame_rate, pending)
+            pending = []
+
+            if kind == 'normalize':
+                # 标准化只是一个标量增益，可以并入后续的线性效果
+                pending.append({'type': 'gain', 'db': self._normalize_gain(buffer, effect)})
+            elif kind == 'eq':
+                self._apply_eq(buffer, frame_rate, effect)
+            elif kind == 'compressor':
+                self._apply_compressor(buffer, frame_rate, effect)
+                if effect.get('makeup_db'):
+                    pending.append({'type': 'gain', 'db': effect['makeup_db']})
+            elif kind == 'resample':
+                buffer, frame_rate = self._resample(buffer, frame_rate, effect)
+
+        self._apply_linear(buffer, frame_rate, pending)
+        return buffer, frame_rate
+
+    def _apply_linear(self, buffer, frame_rate, effects):
+        """将一组连续的线性效果合并为一次逐样本乘法"""
+        if not effects:
+            return
+
+        length = len(buffer)
+        gain = 1.0
+        fade_in = []
+        fade_out = []
+        for effect in effects:
+            if effect['type'] == 'gain':
+                gain *= 10 ** (effect.get('db', 0) / 20)
+            elif effect['type'] == 'fade_in':
+                fade_in.append(min(length, int(frame_rate * effect.get('ms', 0) / 1000)))
+            else:
+                fade_out.append(min(length, int(frame_rate * effect.get('ms', 0) / 1000)))
+
+        head = max(fade_in, default=0)
+        tail = max(fade_out, default=0)
+        if head + tail > length:
+            # 淡入淡出区间重叠（音频很短），直接计算整段包络
+            head, tail = length, 0
+
+        # 只在淡入/淡出区间构建包络，中间部分是纯标量增益
+        if head:
+            envelope = np.full(head, gain, dtype=np.float32)
+            for n in fade_in:
+                envelope[:n] *= np.linspace(0.0, 1.0, n, endpoint=False, dtype=np.float32)
+            if head == length:
+                for n in fade_out:
+                    envelope[length - n:] *= np.linspace(1.0, 0.0, n, dtype=np.float32)
+            buffer[:head] *= envelope[:, None]
+        if tail:
+            envelope = np.full(tail, gain, dtype=np.float32)
+            for n in fade_out:
+                envelope[tail - n:] *= np.linspace(1.0, 0.0, n, dtype=np.float32)
+            buffer[length - tail:] *= envelope[:, None]
+        if gain != 1.0 and length - head - tail > 0:
+            buffer[head:length - tail] *= gain
+
+    def _normalize_gain(self, buffer, effect):
+        """计算把RMS响度调整到target_dbfs所需的增益（dB）"""
+        rms = np.sqrt(np.mean(np.square(buffer, dtype=np.float64)))
+        if rms <= 0:
+            return 0.0
+        return effect.get('target_dbfs', -15.0) - 20 * np.log10(rms)
+
+    def _biquad_coefficients(self, frame_rate, effect):
+        """RBJ Audio EQ Cookbook 双二阶滤波器系数"""
+        kind = effect.get('kind', 'peaking')
+        freq = min(effect.get('freq', 1000), frame_rate / 2 * 0.99)
+        q = effect.get('q', 0.707)
+        amp = 10 ** (effect.get('db', 0) / 40)
+        w0 = 2 * np.pi * freq / frame_rate
+        cos_w0 = np.cos(w0)
+        alpha = np.sin(w0) / (2 * q)
+
+        if kind == 'lowpass':
+            b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+            a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+        elif kind == 'highpass':
+            b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+            a = [1 + alpha, -2 * cos_w0, 1 - alpha]
+        elif kind == 'peaking':
+            b = [1 + alpha * amp, -2 * cos_w0, 1 - alpha * amp]
+            a = [1 + alpha / amp, -2 * cos_w0, 1 - alpha / amp]
+        elif kind in ('lowshelf', 'highshelf'):
+            sign = 1 if kind == 'lowshelf' else -1
+            sqrt_amp = 2 * np.sqrt(amp) * alpha
+            b = [
+                amp * ((amp + 1) - sign * (amp - 1) * cos_w0 + sqrt_amp),
+                sign * 2 * amp * ((amp - 1) - sign * (amp + 1) * cos_w0),
+                amp * ((amp + 1) - sign * (amp - 1) * cos_w0 - sqrt_amp)
+            ]
+            a = [
+                (amp + 1) + sign * (amp - 1) * cos_w0 + sqrt_amp,
+                -sign * 2 * ((amp - 1) + sign * (amp + 1) * cos_w0),
+                (amp + 1) + sign * (amp - 1) * cos_w0 - sqrt_amp
+            ]
+        else:
+            raise AudioGenerationError(f"不支持的EQ类型: {kind}")
+
+        return np.array(b) / a[0], np.array(a) / a[0]
+
+    def _apply_eq(self, buffer, frame_rate, effect):
+        """双二阶滤波，结果写回原缓冲区"""
+        from scipy.signal import lfilter
+
+        b, a = self._biquad_coefficients(frame_rate, effect)
+        buffer[:] = lfilter(b, a, buffer, axis=0)
+
+    def _apply_compressor(self, buffer, frame_rate, effect):
+        """
+        前馈压缩器: 以10毫秒为单位计算电平和增益衰减，
+        按起音/释放时间平滑后插值到每个样本
+        """
+        threshold = effect.get('threshold_db', -20.0)
+        ratio = max(1.0, effect.get('ratio', 4.0))
+        hop = max(1, int(frame_rate * 0.01))
+        length = len(buffer)
+        n_frames = int(np.ceil(length / hop))
+
+        # 各声道取最大值做联动检测，末尾不足一帧的部分补零
+        level = np.zeros(n_frames * hop, dtype=np.float32)
+        np.max(np.abs(buffer), axis=1, out=level[:length])
+        rms = np.sqrt(np.mean(np.square(level.reshape(n_frames, hop)), axis=1))
+        level_db = 20 * np.log10(rms + 1e-10)
+        target_reduction = np.minimum(0.0, (threshold - level_db) * (1 - 1 / ratio))
+
+        attack = np.exp(-10.0 / max(effect.get('attack_ms', 10.0), 1e-3))
+        release = np.exp(-10.0 / max(effect.get('release_ms', 100.0), 1e-3))
+        smoothed = np.empty_like(target_reduction)
+        current = 0.0
+        for i, target in enumerate(target_reduction):
+            coeff = attack if target < current else release
+            current = coeff * current + (1 - coeff) * target
+            smoothed[i] = current
+
+        frame_centers = np.arange(n_frames) * hop + hop / 2
+        gain_db = np.interp(np.arange(length), frame_centers, smoothed).astype(np.float32)
+        buffer *= np.power(10.0, gain_db / 20, dtype=np.float32)[:, None]
+
+    def _resample(self, buffer, frame_rate, effect):
+        """重采样，采样率不变时直接返回原缓冲区"""
+        target_rate = int(effect['rate'])
+        if target_rate == frame_rate:
+            return buffer, frame_rate
+
+        import librosa
+
+        resampled = librosa.resample(np.ascontiguousarray(buffer.T), orig_sr=frame_rate, target_sr=target_rate)
+        logger.debug(f"重采样: {frame_rate}Hz -> {target_rate}Hz")
+        return np.ascontiguousarray(np.atleast_2d(resampled).T, dtype=np.float32), target_rate
\ No newline at end of file
@@ -0,0 +1,375 @@
+import os
+import json
+import struct
+import tempfile
+import threading
+from logger import logger
+from exceptions import AudioProbeError
+
+# MPEG音频帧头的码率表（kbps），按 (版本是否为MPEG1, 层) 索引
+MP3_BITRATES = {
+    (True, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (True, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (True, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (False, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (False, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (False, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160]
+}
+
+# 采样率表，按帧头中的版本位索引（0: MPEG2.5, 2: MPEG2, 3: MPEG1）
+MP3_SAMPLE_RATES = {
+    0: [11025, 12000, 8000],
+    2: [22050, 24000, 16000],
+    3: [44100, 48000, 32000]
+}
+
+# 查找第一帧时最多读取的字节数
+MP3_HEADER_READ = 1 << 20
+# 逐帧扫描时每次读取的字节数
+MP3_SCAN_BLOCK = 1 << 18
+
+def parse_mp3_frame_header(data, pos):
+    """
+    解析pos处的MPEG音频帧头
+    返回: dict 包含帧长、采样率、声道数等，不是合法帧头时返回None
+    """
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version_bits = (b1 >> 3) & 0x03
+    layer = 4 - ((b1 >> 1) & 0x03)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x03
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    bitrate = MP3_BITRATES[(mpeg1, layer)][bitrate_index]
+    sample_rate = MP3_SAMPLE_RATES[version_bits][rate_index]
+    padding = (b2 >> 1) & 0x01
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate * 1000 // sample_rate + padding) * 4
+    elif layer == 2 or mpeg1:
+        samples = 1152
+        length = 144 * bitrate * 1000 // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate * 1000 // sample_rate + padding
+
+    return {
+        'mpeg1': mpeg1,
+        'layer': layer,
+        'bitrate': bitrate,
+        'sample_rate': sample_rate,
+        'channels': channels,
+        'samples': samples,
+        'length': length
+    }
+
+
+class AudioProbe:
+    """
+    基于文件头的音频探测: 不解码即可得到时长、码率、声道数和采样率
+    MP3读取Xing/Info或VBRI头，没有时逐帧扫描帧头；WAV读取fmt/data块；OGG读取首尾页
+    结果按 (路径, 大小, 修改时间) 缓存，可以持久化到JSON文件
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self.cache = {}
+        self.lock = threading.Lock()
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError):
+                logger.warning(f"无法读取探测缓存，将重新创建: {cache_path}")
+
+    def probe(self, path, save=True):
+        """
+        探测音频文件
+        返回: dict 包含format、duration（秒）、bitrate（kbps）、sample_rate、channels、method
+        """
+        stat = os.stat(path)
+        key = os.path.abspath(path)
+        with self.lock:
+            entry = self.cache.get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return dict(entry['info'])
+
+        info = self._probe_file(path, stat.st_size)
+        with self.lock:
+            self.cache[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'info': info}
+        if save:
+            self.save()
+        logger.debug(f"音频探测: {path} {info}")
+        return dict(info)
+
+    def probe_many(self, paths):
+        """批量探测（例如扫描音乐库），最后统一写一次缓存；无法识别的文件跳过"""
+        results = {}
+        for path in paths:
+            try:
+                results[path] = self.probe(path, save=False)
+            except (OSError, AudioProbeError) as e:
+                logger.warning(f"音频探测失败: {path} ({str(e)})")
+        self.save()
+        return results
+
+    def save(self):
+        """原子写入缓存文件"""
+        if not self.cache_path:
+            return
+        directory = os.path.dirname(self.cache_path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        with self.lock:
+            snapshot = dict(self.cache)
+        fd, temp_path = tempfile.mkstemp(suffix='.json', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def _probe_file(self, path, size):
+        with open(path, 'rb') as f:
+            head = f.read(12)
+            f.seek(0)
+            if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+                return self._probe_wav(f, size)
+            if head[:4] == b'OggS':
+                return self._probe_ogg(f, size)
+            if head[:3] == b'ID3' or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+                return self._probe_mp3(f, size)
+            if os.path.splitext(path)[1].lower() == '.mp3':
+                # 部分文件开头有垃圾数据，按扩展名尝试查找帧同步
+                return self._probe_mp3(f, size)
+        raise AudioProbeError(f"无法识别的音频格式: {path}")
+
+    def _probe_mp3(self, f, size):
+        """MP3: 优先读取Xing/Info或VBRI头，没有时扫描全部帧头"""
+        # 跳过ID3v2标签
+        start = 0
+        header = f.read(10)
+        if header[:3] == b'ID3' and len(header) == 10:
+            tag_size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+            start = 10 + tag_size + (10 if header[5] & 0x10 else 0)
+
+        # 末尾的ID3v1标签不计入音频数据
+        end = size
+        if size >= 128:
+            f.seek(size - 128)
+            if f.read(3) == b'TAG':
+                end = size - 128
+
+        f.seek(start)
+        data = f.read(min(end - start, MP3_HEADER_READ))
+        offset = self._find_first_frame(data)
+        if offset is None:
+            raise AudioProbeError("未找到MPEG音频帧")
+        frame = parse_mp3_frame_header(data, offset)
+        audio_bytes = end - start - offset
+
+        result = {
+            'format': 'mp3',
+            'sample_rate': frame['sample_rate'],
+            'channels': frame['channels']
+        }
+
+        # Xing/Info头位于第一帧的side info之后
+        side_info = (32 if frame['channels'] == 2 else 17) if frame['mpeg1'] else (17 if frame['channels'] == 2 else 9)
+        xing = offset + 4 + side_info
+        if data[xing:xing + 4] in (b'Xing', b'Info'):
+            flags = struct.unpack('>I', data[xing + 4:xing + 8])[0]
+            cursor = xing + 8
+            frames = stream_bytes = None
+            if flags & 0x1:
+                frames = struct.unpack('>I', data[cursor:cursor + 4])[0]
+                cursor += 4
+            if flags & 0x2:
+                stream_bytes = struct.unpack('>I', data[cursor:cursor + 4])[0]
+            if frames:
+                duration = frames * frame['samples'] / frame['sample_rate']
+                return dict(result, duration=duration, bitrate=self._bitrate(stream_bytes or audio_bytes, duration), method='xing')
+
+        # VBRI头固定位于帧头之后32字节
+        vbri = offset + 36
+        if data[vbri:vbri + 4] == b'VBRI':
+            stream_bytes, frames = struct.unpack('>II', data[vbri + 10:vbri + 18])
+            if frames:
+                duration = frames * frame['samples'] / frame['sample_rate']
+                return dict(result, duration=duration, bitrate=self._bitrate(stream_bytes, duration), method='vbri')
+
+        # 没有VBR头: 逐帧扫描帧头（只读帧头，不解码）
+        f.seek(start + offset)
+        frames, samples = self._scan_frames(f, audio_bytes)
+        if not frames:
+            raise AudioProbeError("MP3帧扫描失败")
+        duration = samples / frame['sample_rate']
+        return dict(result, duration=duration, bitrate=self._bitrate(audio_bytes, duration), method='scan')
+
+    def _find_first_frame(self, data):
+        """查找第一个后面紧跟着另一个合法帧头的帧同步位置"""
+        pos = data.find(b'\xff')
+        while 0 <= pos < len(data) - 4:
+            frame = parse_mp3_frame_header(data, pos)
+            if frame:
+                following = pos + frame['length']
+                if following + 4 > len(data) or parse_mp3_frame_header(data, following):
+                    return pos
+            pos = data.find(b'\xff', pos + 1)
+        return None
+
+    def _scan_frames(self, f, length):
+        """
+        从头到尾按帧长跳转统计帧数和采样数，遇到损坏数据时重新查找同步
+        每次只读取MP3_SCAN_BLOCK字节，内存占用与文件大小无关；跨块的帧头与上一块末尾剩下的字节拼接
+        """
+        frames = 0
+        samples = 0
+        tail = b''
+        # 上一帧跨过块边界时，下一块开头还需要跳过的字节数
+        skip = 0
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(MP3_SCAN_BLOCK, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            if skip >= len(block):
+                skip -= len(block)
+                continue
+            data = tail + block[skip:] if tail else block[skip:]
+            skip = 0
+            pos = 0
+            while pos < len(data) - 4:
+                frame = parse_mp3_frame_header(data, pos)
+                if frame is None or frame['length'] <= 0:
+                    pos = data.find(b'\xff', pos + 1)
+                    if pos < 0:
+                        pos = len(data)
+                        break
+                    continue
+                frames += 1
+                samples += frame['samples']
+                pos += frame['length']
+            if pos >= len(data):
+                skip = pos - len(data)
+                tail = b''
+            else:
+                tail = data[pos:]
+        return frames, samples
+
+    def _probe_wav(self, f, size):
+        """WAV: 读取fmt块和data块的大小"""
+        f.seek(12)
+        fmt = None
+        data_size = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                break
+            chunk_id, chunk_size = chunk[:4], struct.unpack('<I', chunk[4:])[0]
+            if chunk_id == b'fmt ':
+                fmt = struct.unpack('<HHIIHH', f.read(16))
+                f.seek(chunk_size - 16 + (chunk_size & 1), os.SEEK_CUR)
+            elif chunk_id == b'data':
+                # 流式写出的WAV可能没有回填data大小
+                remaining = size - f.tell()
+                data_size = remaining if chunk_size in (0, 0xFFFFFFFF) or chunk_size > remaining else chunk_size
+                break
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+        if fmt is None or data_size is None:
+            raise AudioProbeError("WAV文件缺少fmt或data块")
+        _, channels, sample_rate, byte_rate, _, _ = fmt
+        if not byte_rate:
+            raise AudioProbeError("WAV文件的字节率无效")
+        return {
+            'format': 'wav',
+            'duration': data_size / byte_rate,
+            'bitrate': round(byte_rate * 8 / 1000),
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'method': 'header'
+        }
+
+    def _probe_ogg(self, f, size):
+        """OGG: 首页的Vorbis/Opus识别头得到参数，末页的granule position得到总采样数"""
+        page = f.read(282)
+        segments = page[26]
+        payload = page[27 + segments:]
+        serial = page[14:18]
+
+        pre_skip = 0
+        if payload.startswith(b'\x01vorbis'):
+            codec = 'vorbis'
+            channels = payload[11]
+            sample_rate = granule_rate = struct.unpack('<I', payload[12:16])[0]
+        elif payload.startswith(b'OpusHead'):
+            codec = 'opus'
+            channels = payload[9]
+            pre_skip = struct.unpack('<H', payload[10:12])[0]
+            sample_rate = struct.unpack('<I', payload[12:16])[0] or 48000
+            granule_rate = 48000  # Opus的granule position固定以48kHz计
+        else:
+            raise AudioProbeError("不支持的OGG编码")
+
+        granule = self._last_granule(f, size, serial)
+        if granule is None:
+            raise AudioProbeError("未找到OGG结束页")
+        duration = max(0, granule - pre_skip) / granule_rate
+        return {
+            'format': 'ogg',
+            'codec': codec,
+            'duration': duration,
+            'bitrate': self._bitrate(size, duration),
+            'sample_rate': sample_rate,
+            'channels': channels,
+            'method': 'header'
+        }
+
+    def _last_granule(self, f, size, serial):
+        """从文件末尾向前查找同一逻辑流最后一个有效的granule position"""
+        window = 1 << 16
+        while True:
+            start = max(0, size - window)
+            f.seek(start)
+            data = f.read(size - start)
+            pos = data.rfind(b'OggS')
+            while pos >= 0:
+                if len(data) >= pos + 18 and data[pos + 14:pos + 18] == serial:
+                    granule = struct.unpack('<q', data[pos + 6:pos + 14])[0]
+                    if granule >= 0:
+                        return granule
+                pos = data.rfind(b'OggS', 0, pos)
+            if start == 0:
+                return None
+            window *= 4
+
+    @staticmethod
+    def _bitrate(stream_bytes, duration):
+        """平均码率（kbps）"""
+        return round(stream_bytes * 8 / duration / 1000) if duration > 0 else 0
+
+
+_default_probe = None
+
+def get_probe():
+    """全局探测实例，缓存路径来自配置"""
+    global _default_probe
+    if _default_probe is None:
+        from config import Config
+        _default_probe = AudioProbe(Config().probe_cache_path)
+    return _default_probe
+
+def probe_audio(path):
+    """使用全局探测实例探测音频文件"""
+    return get_probe().probe(path)
\ No newline at end of file
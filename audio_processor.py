@@ -1,8 +1,6 @@
-from gtts import gTTS
 from pydub import AudioSegment
 import os
 from datetime import datetime
-import random
 from slugify import slugify
 from logger import logger
 from exceptions import AudioGenerationError
@@ -13,6 +11,23 @@ import librosa
 import logging
 from typing import Optional
 from config.music_crawler import MusicCrawler
+from config.music_loudness import load_loudness_index, bed_gain_db
+from config.music_info import normalize_path
+from config.music_selector import MusicSelector
+from audio_probe import probe_audio
+from podcast_templates import PodcastTemplates
+from speech_synthesizer import SpeechSynthesizer
+from dialogue_renderer import DialogueRenderer
+from audio_effects import EffectsChain
+from block_renderer import BlockRenderer, StreamingEncoder, StreamingRenderer
+from hls_writer import HLSSegmentWriter
+from live_streamer import LiveStreamer
+from audio_qc import AudioQCAnalyzer
+from waveform_peaks import WaveformPeaksBuilder
+from subtitles import SubtitleTrack, split_sentences
+
+# process_podcast的默认背景音乐音量，对应响度匹配后的BED_TARGET_LUFS
+DEFAULT_MUSIC_VOLUME = 0.3
 
 class AudioProcessor:
     """音频处理器"""
@@ -29,14 +44,74 @@ class AudioProcessor:
         self.bg_music_path = self.config.background_music_path
         self.audio_quality = self.config.audio_quality
         
+        # 静音裁剪设置
+        self.trim_silence = self.config.trim_silence
+        self.silence_threshold_db = self.config.silence_threshold_db
+        self.max_pause_ms = self.config.max_pause_ms
+        self.edge_padding_ms = self.config.edge_padding_ms
+        
+        # 目标时长设置
+        self.target_duration = self.config.target_duration
+        self.min_pause_ms = self.config.min_pause_ms
+        self.min_speed_rate = self.config.min_speed_rate
+        self.max_speed_rate = self.config.max_speed_rate
+        
+        # 分段语音合成（带缓存）和对话渲染
+        self.tts_voice = self.config.tts_voice
+        self.sentence_gap_ms = self.config.sentence_gap_ms
+        self.title_gap_ms = 1000  # 标题与正文之间的间隔
+        self.chars_per_second = 4.5  # 中文朗读语速估计，用于试听时挑选句子
+        self.preview_bitrate = self.config.preview_bitrate
+        self.preview_frame_rate = 22050
+        self.synthesizer = SpeechSynthesizer(self.config.tts_cache_dir, self.config.tts_workers)
+        self.dialogue_renderer = DialogueRenderer(
+            self.synthesizer,
+            voices=self.config.dialogue_voices,
+            gap_ms=self.config.dialogue_gap_ms,
+            overlap_ms=self.config.dialogue_overlap_ms,
+            pan=self.config.dialogue_pan,
+            trim_func=self._trim_silence
+        )
+        
+        # 音频质检设置
+        self.qc_enabled = self.config.qc_enabled
+        self.qc_thresholds = self.config.qc_thresholds
+        self.qc_spectral_flatness = self.config.qc_spectral_flatness
+        
+        # 波形峰值设置
+        self.waveform_peaks = self.config.waveform_peaks
+        self.waveform_samples_per_pixel = self.config.waveform_samples_per_pixel
+        self.waveform_levels = self.config.waveform_levels
+        
+        # HLS分段输出设置
+        self.hls_segment_seconds = self.config.hls_segment_seconds
+        
+        # 直播推流设置
+        self.live_stream_url = self.config.live_stream_url
+        self.live_buffer_ms = self.config.live_buffer_ms
+        self.live_prebuffer_ms = self.config.live_prebuffer_ms
+        
+        # 背景音乐响度设置（测量结果在首次混音时读取）
+        self.bed_target_lufs = self.config.bed_target_lufs
+        self.loudness_index = None
+        
+        # 背景音乐选择（按时长索引，避开最近用过的曲目）
+        self.bg_music_category = self.config.background_music_category
+        self.music_selector = MusicSelector(
+            history_path=self.config.music_history_path,
+            avoid_recent=self.config.music_avoid_recent,
+            crossfade_ms=self.config.music_crossfade_ms
+        )
+        
         # 确保assets目录存在
         if not os.path.exists('assets'):
             os.makedirs('assets')
     
-    def generate_audio(self, content):
+    def generate_audio(self, content, target_duration=None):
         """
         将文本内容转换为音频文件
         content: dict 包含标题、脚本和描述
+        target_duration: 目标时长（秒），为None时使用content['target_duration']或配置值
         返回: dict 包含音频文件信息
         """
         try:
@@ -48,42 +123,20 @@ class AudioProcessor:
             
             logger.info(f"开始生成音频: {output_path}")
             
-            # 将不同部分分开转换为音频，以便应用不同的处理效果
-            audio_parts = []
-            
-            # 标题部分（可以用不同的声音或效果）
-            title_path = self._generate_temp_audio(content['title'], 'title')
-            title_audio = AudioSegment.from_mp3(title_path)
-            # 为标题添加特效（例如回声）
-            title_audio = self._add_title_effects(title_audio)
-            audio_parts.append(title_audio)
-            
-            # 添加间隔
-            audio_parts.append(AudioSegment.silent(duration=1000))  # 1秒静音
-            
-            # 主体内容部分
-            script_path = self._generate_temp_audio(content['script'], 'script')
-            script_audio = AudioSegment.from_mp3(script_path)
-            # 可以为脚本内容添加特效，例如标准化音量
-            script_audio = self._normalize_audio(script_audio)
-            audio_parts.append(script_audio)
-            
-            # 合并音频
-            final_audio = audio_parts[0]
-            for part in audio_parts[1:]:
-                final_audio += part
-                
+            # 合成语音轨道，同时得到每句的时间轴
+            voice_audio, cues, voice_info = self._build_voice_track(content, target_duration)
+            
             # 添加背景音乐
-            final_audio = self._add_background_music(final_audio)
+            final_audio = self._add_background_music(voice_audio, episode=filename)
             
             # 应用音频质量设置
-            final_audio = self._apply_quality_settings(final_audio)
+            final_audio = self._apply_quality_settings(final_audio, content.get('style'))
             
-            # 导出最终音频
-            final_audio.export(output_path, format="mp3")
+            # 导出最终音频（编码和质检共用一次块遍历）
+            export_info = self._export_audio(final_audio, output_path)
             
-            # 清理临时文件
-            self._cleanup_temp_files([title_path, script_path])
+            # 字幕和时间轴直接来自分段合成的记录，不需要语音识别
+            subtitles = SubtitleTrack(cues).save(os.path.splitext(output_path)[0])
             
             logger.info(f"音频生成成功: {output_path}")
             
@@ -91,81 +144,603 @@ class AudioProcessor:
                 'path': output_path,
                 'filename': filename,
                 'duration': len(final_audio) / 1000,  # 秒
-                'size': os.path.getsize(output_path) / (1024 * 1024)  # MB
+                'size': os.path.getsize(output_path) / (1024 * 1024),  # MB
+                'subtitles': subtitles,
+                **voice_info,
+                **export_info
             }
             
         except Exception as e:
             logger.error(f"生成音频时出错: {str(e)}")
             raise AudioGenerationError(f"生成音频失败: {str(e)}")
     
-    def _generate_temp_audio(self, text, part_name):
-        """生成临时音频文件"""
-        temp_path = os.path.join(self.output_dir, f"temp_{part_name}_{int(datetime.now().timestamp())}.mp3")
-        tts = gTTS(text=text, lang='zh-cn', slow=False)
-        tts.save(temp_path)
-        return temp_path
+    def generate_preview(self, content, seconds=60):
+        """
+        生成快速试听版本: 只合成前N秒的句子，单声道低码率编码
+        合成结果写入TTS缓存，之后的完整渲染可以直接复用
+        content: dict 包含标题、脚本和描述
+        seconds: 试听时长（秒）
+        返回: dict 包含试听音频文件信息
+        """
+        try:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            slug = slugify(content['title'])
+            filename = f"preview_{slug}_{timestamp}.mp3"
+            output_path = os.path.join(self.output_dir, filename)
+            
+            logger.info(f"开始生成试听音频: {output_path} ({seconds}秒)")
+            
+            title_audio = self.synthesizer.synthesize(content['title'], self.tts_voice)
+            title_audio, _ = self._trim_silence(title_audio)
+            title_audio = self._add_title_effects(title_audio, content.get('style'))
+            budget_ms = seconds * 1000 - len(title_audio) - self.title_gap_ms
+            
+            turns = []
+            if PodcastTemplates.is_multi_speaker(content.get('style')):
+                turns = DialogueRenderer.parse_turns(content['script'])
+            if DialogueRenderer.is_dialogue(turns):
+                items = turns
+                render = lambda selected: self.dialogue_renderer.render(selected)[0]
+            else:
+                items = split_sentences(content['script'])
+                render = lambda selected: self._render_sentences(selected)[0]
+            
+            # 按字数估算需要的句子数，合成后仍不够再追加（已合成的句子命中缓存）
+            count = self._estimate_preview_count(items, budget_ms)
+            script_audio = render(items[:count])
+            while len(script_audio) < budget_ms and count < len(items):
+                missing = (budget_ms - len(script_audio)) / max(len(script_audio), 1)
+                count = min(len(items), count + int(np.ceil(count * missing)) + 1)
+                script_audio = render(items[:count])
+            script_audio = self._normalize_audio(script_audio, content.get('style'))
+            
+            gap = AudioSegment.silent(duration=self.title_gap_ms, frame_rate=title_audio.frame_rate)
+            preview = (title_audio + gap + script_audio)[:seconds * 1000]
+            
+            # 背景音乐只解码试听需要的长度
+            preview = self._add_background_music(preview).fade_out(500)
+            preview = preview.set_channels(1).set_frame_rate(self.preview_frame_rate).set_sample_width(2)
+            BlockRenderer(preview).render([
+                StreamingEncoder(output_path, preview.frame_rate, 1, 'mp3', self.preview_bitrate)
+            ])
+            
+            logger.info(f"试听音频生成成功: {output_path} (合成 {count}/{len(items)} 段)")
+            
+            return {
+                'path': output_path,
+                'filename': filename,
+                'duration': len(preview) / 1000,  # 秒
+                'size': os.path.getsize(output_path) / (1024 * 1024),  # MB
+                'preview': True
+            }
+            
+        except Exception as e:
+            logger.error(f"生成试听音频时出错: {str(e)}")
+            raise AudioGenerationError(f"生成试听音频失败: {str(e)}")
+    
+    def generate_segmented(self, content, segment_seconds=None, target_duration=None):
+        """
+        渐进式渲染: 按句合成并立即送入输出端，边渲染边写出HLS分段和播放列表
+        渲染开始几秒后即可播放，同时照常生成完整mp3、字幕、质检和波形峰值
+        content: dict 包含标题、脚本和描述
+        segment_seconds: HLS分段时长（秒），为None时使用配置值
+        target_duration: 不支持，设置了目标时长时报错
+        返回: dict 包含音频文件信息，hls_playlist 为播放列表路径
+        """
+        self._check_stream_duration(content, target_duration)
+        try:
+            output_path, filename = self._new_output_path(content)
+            logger.info(f"开始渐进式生成音频: {output_path}")
+            
+            channels, items = self._prepare_stream(content)
+            frame_rate = self._get_frame_rate()
+            sinks = self._build_sinks(output_path, frame_rate, channels)
+            sinks.append(HLSSegmentWriter(
+                f"{os.path.splitext(output_path)[0]}_hls",
+                frame_rate,
+                channels,
+                segment_seconds=segment_seconds or self.hls_segment_seconds,
+                bitrate=self._get_bitrate()
+            ))
+            
+            audio_info = self._render_stream(content, items, output_path, frame_rate, channels, sinks)
+            logger.info(f"渐进式音频生成成功: {output_path}")
+            return dict(audio_info, filename=filename)
+            
+        except Exception as e:
+            logger.error(f"渐进式生成音频时出错: {str(e)}")
+            raise AudioGenerationError(f"渐进式生成音频失败: {str(e)}")
+    
+    def generate_live(self, content, url=None, target_duration=None):
+        """
+        直播模式: 渲染结果按实时速率推送到Icecast兼容的服务器，同时保存一份完整mp3存档
+        渲染只领先播放抖动缓冲区的长度，渲染跟不上时补静音并在结果中报告欠载
+        content: dict 包含标题、脚本和描述
+        url: 推流地址，为None时使用配置值
+        target_duration: 不支持，设置了目标时长时报错
+        返回: dict 包含存档音频信息，live 为推流统计
+        """
+        url = url or self.live_stream_url
+        if not url:
+            raise AudioGenerationError("未配置直播推流地址 (LIVE_STREAM_URL)")
+        self._check_stream_duration(content, target_duration)
+        
+        try:
+            output_path, filename = self._new_output_path(content)
+            logger.info(f"开始直播: {content['title']}")
+            
+            channels, items = self._prepare_stream(content)
+            frame_rate = self._get_frame_rate()
+            sinks = self._build_sinks(output_path, frame_rate, channels)
+            sinks.append(LiveStreamer(
+                url,
+                frame_rate,
+                channels,
+                bitrate=self._get_bitrate(),
+                buffer_ms=self.live_buffer_ms,
+                prebuffer_ms=self.live_prebuffer_ms,
+                name=content['title'],
+                description=content.get('description')
+            ))
+            
+            audio_info = self._render_stream(content, items, output_path, frame_rate, channels, sinks)
+            logger.info(f"直播完成，存档: {output_path}")
+            return dict(audio_info, filename=filename)
+            
+        except Exception as e:
+            logger.error(f"直播时出错: {str(e)}")
+            raise AudioGenerationError(f"直播失败: {str(e)}")
+    
+    def _new_output_path(self, content):
+        """按标题和时间生成输出文件路径，返回 (路径, 文件名)"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"{slugify(content['title'])}_{timestamp}.mp3"
+        return os.path.join(self.output_dir, filename), filename
+    
+    def _check_stream_duration(self, content, target_duration=None):
+        """
+        渐进式渲染和直播边合成边输出，拿不到整段语音，无法压缩停顿和变速到目标时长
+        """
+        target_duration = target_duration or content.get('target_duration') or self.target_duration
+        if target_duration:
+            raise AudioGenerationError(
+                f"渐进式渲染和直播不支持目标时长 ({target_duration}秒)，请去掉TARGET_DURATION或使用普通渲染"
+            )
+    
+    def _prepare_stream(self, content):
+        """
+        准备渐进式渲染的正文片段，合成在后台线程池中按顺序进行
+        返回: (声道数, 产出 (文本, AudioSegment, 裁剪秒数, 说话人) 的生成器)
+        """
+        turns = []
+        if PodcastTemplates.is_multi_speaker(content.get('style')):
+            turns = DialogueRenderer.parse_turns(content['script'])
+        if DialogueRenderer.is_dialogue(turns):
+            items = (
+                (text, segment, removed, speaker)
+                for speaker, text, segment, removed in self.dialogue_renderer.iter_render(turns)
+            )
+            return 2, items
+        
+        sentences = split_sentences(content['script'])
+        if not sentences:
+            raise AudioGenerationError("脚本中没有可朗读的内容")
+        segments = self.synthesizer.iter_synthesize((sentence, self.tts_voice) for sentence in sentences)
+        items = (
+            (sentence, *self._trim_silence(segment), None)
+            for sentence, segment in zip(sentences, segments)
+        )
+        return 1, items
+    
+    def _render_stream(self, content, items, output_path, frame_rate, channels, sinks):
+        """
+        逐段处理语音并送入StreamingRenderer，最后写出字幕
+        返回: dict 包含音频文件信息和各输出端的结果
+        """
+        style = content.get('style')
+        gap_ms = self.dialogue_renderer.gap_ms if channels == 2 else self.sentence_gap_ms
+        
+        # 整段语音要到渲染结束才完整: 标准化的增益按第一段有声的正文测得，之后各段使用相同的增益，
+        # 不逐段拉平音量；整体音效按片段处理
+        master = PodcastTemplates.get_effects(style, 'master') + [{"type": "resample", "rate": frame_rate}]
+        voice_chain = EffectsChain(PodcastTemplates.get_effects(style, 'voice') + master)
+        locked_chain = None
+        
+        try:
+            bed = self._load_background_music(self._estimate_duration_ms(content), episode=os.path.basename(output_path))
+        except Exception as e:
+            logger.error(f"加载背景音乐时出错: {str(e)}")
+            bed = None
+        renderer = StreamingRenderer(frame_rate, channels, sinks, bed=bed)
+        
+        try:
+            # 标题 + 间隔
+            title_audio = self.synthesizer.synthesize(content['title'], self.tts_voice)
+            title_audio, silence_removed = self._trim_silence(title_audio)
+            title_audio = EffectsChain(master).apply(self._add_title_effects(title_audio, style))
+            start = renderer.push(title_audio)
+            cues = [{'text': content['title'], 'start': start, 'end': renderer.position_ms}]
+            renderer.push(AudioSegment.silent(duration=self.title_gap_ms, frame_rate=frame_rate))
+            
+            # 正文逐段合成、处理后立即送入渲染器
+            gap = AudioSegment.silent(duration=gap_ms, frame_rate=frame_rate)
+            for index, (text, segment, removed, speaker) in enumerate(items):
+                silence_removed += removed
+                if index:
+                    renderer.push(gap)
+                if locked_chain is None and segment.rms:
+                    locked_chain = voice_chain.locked(segment)
+                chain = voice_chain if locked_chain is None else locked_chain
+                start = renderer.push(chain.apply(segment))
+                cue = {'text': text, 'start': start, 'end': renderer.position_ms}
+                if speaker:
+                    cue['speaker'] = speaker
+                cues.append(cue)
+            
+            export_info = renderer.finish()
+        except Exception:
+            renderer.abort()
+            raise
+        
+        subtitles = SubtitleTrack(cues).save(os.path.splitext(output_path)[0])
+        return {
+            'path': output_path,
+            'size': os.path.getsize(output_path) / (1024 * 1024),  # MB
+            'subtitles': subtitles,
+            'silence_removed': silence_removed,
+            'stretch_rate': 1.0,
+            **export_info
+        }
+    
+    def _estimate_preview_count(self, items, budget_ms):
+        """按字数估算填满试听时长需要的句子（或对话轮次）数量"""
+        elapsed = 0.0
+        for index, item in enumerate(items):
+            text = item[1] if isinstance(item, tuple) else item
+            elapsed += len(text) / self.chars_per_second * 1000 + self.sentence_gap_ms
+            if elapsed >= budget_ms:
+                return index + 1
+        return len(items)
+    
+    def _build_voice_track(self, content, target_duration=None):
+        """
+        合成标题和正文并拼接为语音轨道
+        返回: (AudioSegment, 字幕时间轴列表（毫秒）, dict 包含silence_removed和stretch_rate)
+        """
+        # 标题部分（可以用不同的声音或效果）
+        title_audio = self.synthesizer.synthesize(content['title'], self.tts_voice)
+        # 裁剪TTS输出的首尾静音
+        title_audio, title_removed = self._trim_silence(title_audio)
+        # 为标题添加特效（例如回声）
+        title_audio = self._add_title_effects(title_audio, content.get('style'))
+        
+        # 主体内容部分
+        turns = []
+        if PodcastTemplates.is_multi_speaker(content.get('style')):
+            turns = DialogueRenderer.parse_turns(content['script'])
+        
+        if DialogueRenderer.is_dialogue(turns):
+            # 对话型脚本: 按说话人分轮并行合成，每轮已单独裁剪静音
+            script_audio, script_cues, script_removed = self.dialogue_renderer.render(turns)
+        else:
+            # 单人脚本: 按句并行合成，每句已单独裁剪静音
+            script_audio, script_cues, script_removed = self._render_sentences(split_sentences(content['script']))
+        silence_removed = title_removed + script_removed
+        # 可以为脚本内容添加特效，例如标准化音量
+        script_audio = self._normalize_audio(script_audio, content.get('style'))
+        
+        # 贴合目标时长（标题和间隔不参与变速）
+        if target_duration is None:
+            target_duration = content.get('target_duration') or self.target_duration
+        stretch_rate = 1.0
+        if target_duration:
+            script_target = target_duration - (len(title_audio) + self.title_gap_ms) / 1000
+            script_audio, stretch_rate, fit_removed = self._fit_to_duration(script_audio, script_target, script_cues)
+            silence_removed += fit_removed
+        
+        # 合并音频: 标题 + 间隔 + 正文
+        gap = AudioSegment.silent(duration=self.title_gap_ms, frame_rate=title_audio.frame_rate)
+        voice_audio = title_audio + gap + script_audio
+        
+        offset = len(title_audio) + self.title_gap_ms
+        cues = [{'text': content['title'], 'start': 0, 'end': len(title_audio)}]
+        cues += [dict(cue, start=cue['start'] + offset, end=cue['end'] + offset) for cue in script_cues]
+        
+        return voice_audio, cues, {'silence_removed': silence_removed, 'stretch_rate': stretch_rate}
+    
+    def _render_sentences(self, sentences):
+        """
+        按句并行合成（带缓存），裁剪静音后以固定停顿拼接
+        返回: (AudioSegment, [{'text', 'start', 'end'}, ...]（毫秒）, 裁剪掉的静音秒数)
+        """
+        if not sentences:
+            raise AudioGenerationError("脚本中没有可朗读的内容")
+        
+        segments = self.synthesizer.synthesize_many((sentence, self.tts_voice) for sentence in sentences)
+        frame_rate = segments[0].frame_rate
+        gap = AudioSegment.silent(duration=self.sentence_gap_ms, frame_rate=frame_rate).raw_data
+        
+        chunks = []
+        cues = []
+        removed = 0.0
+        cursor = 0.0
+        for sentence, segment in zip(sentences, segments):
+            segment, segment_removed = self._trim_silence(segment)
+            removed += segment_removed
+            segment = segment.set_frame_rate(frame_rate).set_channels(1).set_sample_width(2)
+            
+            if chunks:
+                chunks.append(gap)
+                cursor += self.sentence_gap_ms
+            chunks.append(segment.raw_data)
+            cues.append({'text': sentence, 'start': cursor, 'end': cursor + len(segment)})
+            cursor += len(segment)
+        
+        # 拼接原始字节，避免AudioSegment逐段相加的重复拷贝
+        audio = AudioSegment(data=b''.join(chunks), sample_width=2, frame_rate=frame_rate, channels=1)
+        return audio, cues, removed
+    
+    def _segment_to_array(self, audio):
+        """将AudioSegment转换为 (帧数, 声道数) 的float32数组，取值范围[-1, 1]"""
+        samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+        samples = samples.reshape((-1, audio.channels))
+        return samples / float(1 << (8 * audio.sample_width - 1))
+    
+    def _array_to_segment(self, samples, frame_rate, sample_width=2):
+        """将 (帧数, 声道数) 的float32数组转换回AudioSegment"""
+        scale = float(1 << (8 * sample_width - 1))
+        dtype = {1: np.int8, 2: np.int16, 4: np.int32}[sample_width]
+        pcm = np.clip(samples * scale, -scale, scale - 1).astype(dtype)
+        return AudioSegment(
+            data=pcm.tobytes(),
+            sample_width=sample_width,
+            frame_rate=frame_rate,
+            channels=samples.shape[1]
+        )
+    
+    def _detect_voiced_frames(self, samples, frame_rate, frame_ms=20):
+        """
+        基于短时能量的语音活动检测（向量化实现）
+        samples: (帧数, 声道数) 的float32数组
+        返回: (每个分析帧是否有声的布尔数组, 每个分析帧的采样点数)
+        """
+        frame_len = max(1, int(frame_rate * frame_ms / 1000))
+        mono = samples.mean(axis=1)
+        n_frames = int(np.ceil(len(mono) / frame_len))
+        
+        # 末尾不足一帧的部分补零，一次性reshape成 (分析帧数, 帧长)
+        padded = np.zeros(n_frames * frame_len, dtype=np.float32)
+        padded[:len(mono)] = mono
+        energy = np.mean(padded.reshape(n_frames, frame_len) ** 2, axis=1)
+        energy_db = 10 * np.log10(energy + 1e-10)
+        
+        return energy_db > self.silence_threshold_db, frame_len
+    
+    def _trim_silence(self, audio, max_pause_ms=None, cues=None):
+        """
+        裁剪首尾静音，并将内部过长的停顿压缩到max_pause_ms（TRIM_SILENCE=false时不处理）
+        audio: AudioSegment
+        cues: 可选的时间轴列表（毫秒），会原地映射到裁剪后的时间
+        返回: (处理后的AudioSegment, 移除的秒数)
+        """
+        if not self.trim_silence:
+            return audio, 0.0
+        return self._compress_pauses(audio, max_pause_ms, cues)
+    
+    def _compress_pauses(self, audio, max_pause_ms=None, cues=None, budget_ms=None):
+        """
+        静音裁剪的实现，不受TRIM_SILENCE开关影响（调整到目标时长时总是先压缩停顿）
+        budget_ms: 最多移除的毫秒数，None表示不限；超出时各段静音按可裁剪的长度等比例少裁
+        其余参数和返回值同_trim_silence
+        """
+        if len(audio) == 0:
+            return audio, 0.0
+        
+        if max_pause_ms is None:
+            max_pause_ms = self.max_pause_ms
+        
+        samples = self._segment_to_array(audio)
+        voiced, frame_len = self._detect_voiced_frames(samples, audio.frame_rate)
+        if not voiced.any():
+            logger.warning("音频中未检测到语音，跳过静音裁剪")
+            return audio, 0.0
+        
+        frame_ms = frame_len * 1000 / audio.frame_rate
+        keep = np.ones(len(voiced), dtype=bool)
+        
+        # 首尾静音: 只保留edge_padding_ms的缓冲
+        pad_frames = int(self.edge_padding_ms / frame_ms)
+        voiced_idx = np.flatnonzero(voiced)
+        # 每段静音: (起始帧, 结束帧, 可裁剪的帧数, 位置)
+        pauses = [
+            (0, voiced_idx[0], max(0, voiced_idx[0] - pad_frames), 'head'),
+            (voiced_idx[-1] + 1, len(voiced), max(0, len(voiced) - voiced_idx[-1] - 1 - pad_frames), 'tail')
+        ]
+        
+        # 内部停顿: 找出所有静音段，超过上限的部分可以裁掉
+        max_pause_frames = max(1, int(max_pause_ms / frame_ms))
+        edges = np.diff(np.concatenate(([0], (~voiced).astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        inner = (starts > voiced_idx[0]) & (ends <= voiced_idx[-1])
+        for start, end in zip(starts[inner], ends[inner]):
+            pauses.append((start, end, max(0, end - start - max_pause_frames), 'inner'))
+        
+        cuts = [frames for _, _, frames, _ in pauses]
+        removable = sum(cuts)
+        if budget_ms is not None and removable > 0:
+            budget = min(removable, max(0, int(round(budget_ms / frame_ms))))
+            shares = [frames * budget / removable for frames in cuts]
+            cuts = [int(share) for share in shares]
+            # 取整后剩下的帧给小数部分最大的几段，总数正好等于预算
+            leftover = budget - sum(cuts)
+            for index in sorted(range(len(shares)), key=lambda i: cuts[i] - shares[i])[:leftover]:
+                cuts[index] += 1
+        
+        for (start, end, _, position), cut in zip(pauses, cuts):
+            if cut <= 0:
+                continue
+            if position == 'head':
+                # 从最前面裁，保留紧挨语音的部分
+                keep[start:start + cut] = False
+            elif position == 'tail':
+                keep[end - cut:end] = False
+            else:
+                # 从中间裁掉，保留停顿两端，让语音自然衰减和起音
+                head = (end - start - cut) // 2
+                keep[start + head:start + head + cut] = False
+        
+        sample_mask = np.repeat(keep, frame_len)[:len(samples)]
+        trimmed = samples[sample_mask]
+        removed = (len(samples) - len(trimmed)) / audio.frame_rate
+        if removed <= 0:
+            return audio, 0.0
+        
+        if cues:
+            # 每个分析帧之前保留下来的帧数，用于把原时间映射到裁剪后的时间
+            kept_before = np.concatenate(([0], np.cumsum(keep)))
+            for cue in cues:
+                for key in ('start', 'end'):
+                    frame = min(len(keep), int(cue[key] / frame_ms))
+                    cue[key] = kept_before[frame] * frame_ms
+        
+        logger.info(f"静音裁剪完成，移除 {removed:.2f} 秒")
+        return self._array_to_segment(trimmed, audio.frame_rate, audio.sample_width), removed
     
-    def _add_title_effects(self, audio):
-        """为标题音频添加特效"""
-        # 提高音量
-        audio = audio + 3  # 增加3dB
+    def _fit_to_duration(self, audio, target_seconds, cues=None):
+        """
+        将语音调整到目标时长，无需重新生成脚本或TTS
+        先压缩停顿，仍不满足时在[min_speed_rate, max_speed_rate]范围内做相位声码器变速
+        cues: 可选的时间轴列表（毫秒），会原地同步调整
+        返回: (处理后的AudioSegment, 变速倍率, 压缩停顿移除的秒数)
+        """
+        if target_seconds <= 0:
+            logger.warning(f"目标时长过短，跳过时长调整: {target_seconds:.2f}秒")
+            return audio, 1.0, 0.0
+        
+        removed = 0.0
+        if len(audio) / 1000 > target_seconds:
+            # 优先压缩停顿（最短保留min_pause_ms），只移除超出目标的部分，剩下的差距再变速
+            audio, removed = self._compress_pauses(
+                audio, max_pause_ms=self.min_pause_ms, cues=cues,
+                budget_ms=len(audio) - target_seconds * 1000
+            )
         
-        # 添加淡入效果
-        audio = audio.fade_in(300)  # 300毫秒淡入
+        current = len(audio) / 1000
+        rate = min(max(current / target_seconds, self.min_speed_rate), self.max_speed_rate)
+        if abs(rate - 1.0) < 0.005:
+            return audio, 1.0, removed
         
-        return audio
+        if rate != current / target_seconds:
+            logger.warning(f"目标时长超出变速范围，按 {rate:.3f} 倍处理")
+        
+        # librosa按 (声道, 采样点) 排列，整段向量化处理
+        samples = self._segment_to_array(audio)
+        stretched = librosa.effects.time_stretch(np.ascontiguousarray(samples.T), rate=rate)
+        audio = self._array_to_segment(
+            np.atleast_2d(stretched).T.astype(np.float32),
+            audio.frame_rate,
+            audio.sample_width
+        )
+        
+        for cue in cues or []:
+            cue['start'] /= rate
+            cue['end'] /= rate
+        
+        logger.info(f"时长调整完成: {current:.2f}秒 -> {len(audio) / 1000:.2f}秒 (目标 {target_seconds:.2f}秒)")
+        return audio, rate, removed
+    
+    def _add_title_effects(self, audio, style=None):
+        """为标题音频添加特效（默认提高3dB并淡入300毫秒）"""
+        return EffectsChain(PodcastTemplates.get_effects(style, 'title')).apply(audio)
+    
+    def _normalize_audio(self, audio, style=None):
+        """标准化音频音量（默认目标-15 dBFS），风格可以追加EQ、压缩等效果"""
+        return EffectsChain(PodcastTemplates.get_effects(style, 'voice')).apply(audio)
     
-    def _normalize_audio(self, audio):
-        """标准化音频音量"""
-        # 计算目标dBFS（一般为-14到-16 dBFS）
-        target_dBFS = -15.0
+    def _bed_gain(self, music_path, loudness=None, default_gain=-20.0):
+        """
+        背景音乐增益（dB）: 有预先测量的响度时调整到bed_target_lufs，否则使用default_gain（默认降低20分贝）
+        """
+        if loudness is None:
+            if self.loudness_index is None:
+                self.loudness_index = load_loudness_index(os.path.join('assets', 'music'))
+            loudness = self.loudness_index.get(normalize_path(music_path))
+        if not loudness:
+            logger.warning(f"背景音乐未测量响度，按 {default_gain:.1f} dB 处理: {music_path}")
+            return default_gain
+        return bed_gain_db(loudness, self.bed_target_lufs)
+    
+    def _load_background_music(self, duration_ms, category=None, episode=None, default_gain=-20.0, gain_offset=0.0):
+        """
+        按所需时长选择背景音乐（单曲或交叉淡化的多首），已按预先测量的响度调整音量
+        duration_ms: 需要覆盖的时长，只解码需要的部分
+        gain_offset: 在响度匹配后的增益上额外叠加的增益（dB）
+        episode: 节目标识，记录到使用历史中，之后几集会避开这些曲目
+        返回: AudioSegment，没有背景音乐文件时返回None
+        """
+        tracks = self.music_selector.select(category or self.bg_music_category, duration_ms / 1000)
+        if not tracks:
+            logger.warning("未找到背景音乐文件")
+            return None
         
-        # 获取当前音量
-        current_dBFS = audio.dBFS
+        logger.info(f"使用背景音乐: {', '.join(track['file_path'] for track in tracks)}")
+        bed = self._build_bed(tracks, duration_ms, default_gain, gain_offset)
+        if episode:
+            self.music_selector.record(episode, tracks)
+        return bed
+    
+    def _build_bed(self, tracks, duration_ms, default_gain=-20.0, gain_offset=0.0):
+        """
+        按顺序拼接曲目，曲目之间交叉淡化；每首只解码还需要的长度，并按各自的响度调整音量
+        所有曲目用完仍不够长时循环整段；duration_ms<=0时返回空的静音段
+        """
+        if duration_ms <= 0:
+            return AudioSegment.silent(duration=0)
         
-        # 计算需要增加的分贝数
-        change_in_dBFS = target_dBFS - current_dBFS
+        crossfade = self.music_selector.crossfade_ms
+        bed = None
+        for track in tracks:
+            needed = duration_ms - (len(bed) - crossfade if bed is not None else 0)
+            if needed <= 0:
+                break
+            segment = AudioSegment.from_file(track['file_path'], duration=min(track['duration'], needed / 1000 + 0.1))
+            if len(segment) == 0:
+                logger.warning(f"背景音乐没有可用的音频，跳过: {track['file_path']}")
+                continue
+            segment = segment.apply_gain(self._bed_gain(track['file_path'], track.get('loudness'), default_gain) + gain_offset)
+            if bed is None:
+                bed = segment
+            else:
+                bed = bed.append(segment, crossfade=min(crossfade, len(bed), len(segment)))
         
-        # 调整音量
-        normalized_audio = audio.apply_gain(change_in_dBFS)
+        # 长度为0的背景音乐无法循环
+        if bed is None:
+            raise AudioGenerationError(f"背景音乐均为空: {', '.join(track['file_path'] for track in tracks)}")
         
-        return normalized_audio
+        # 循环背景音乐以匹配主音频长度
+        while len(bed) < duration_ms:
+            bed = bed.append(bed, crossfade=min(crossfade, len(bed) // 2))
+        return bed[:duration_ms]
     
-    def _add_background_music(self, audio):
+    def _estimate_duration_ms(self, content):
+        """按字数估算节目时长（渐进式渲染开始前需要知道背景音乐的长度），留出10%余量"""
+        chars = len(content['title']) + len(content['script'])
+        pauses = len(split_sentences(content['script'])) * self.sentence_gap_ms
+        return int((chars / self.chars_per_second * 1000 + pauses + self.title_gap_ms) * 1.1)
+    
+    def _add_background_music(self, audio, episode=None):
         """
         为音频添加背景音乐
         audio: AudioSegment 主音频
+        episode: 节目标识，用于记录背景音乐的使用历史
         """
         try:
-            # 从assets目录获取所有mp3文件作为可能的背景音乐
-            bg_music_files = []
-            for file in os.listdir('assets'):
-                if file.endswith('.mp3'):
-                    bg_music_files.append(os.path.join('assets', file))
-            
-            # 如果没有找到背景音乐文件，返回原始音频
-            if not bg_music_files:
-                logger.warning("未找到背景音乐文件")
+            bg_music = self._load_background_music(len(audio), episode=episode)
+            if bg_music is None:
                 return audio
             
-            # 随机选择一个背景音乐
-            bg_music_path = random.choice(bg_music_files)
-            logger.info(f"使用背景音乐: {bg_music_path}")
-            
-            # 加载背景音乐
-            bg_music = AudioSegment.from_mp3(bg_music_path)
-            
-            # 调整背景音乐音量（降低20分贝，使其不遮盖主音频）
-            bg_music = bg_music - 20
-            
-            # 循环背景音乐以匹配主音频长度
-            while len(bg_music) < len(audio):
-                bg_music += bg_music
-            
-            # 剪切背景音乐以匹配主音频长度
-            bg_music = bg_music[:len(audio)]
-            
-            # 为背景音乐添加淡入淡出效果
+            # 背景音乐已循环并截取到主音频的长度，添加淡入淡出效果
             bg_music = bg_music.fade_in(2000).fade_out(2000)
             
             # 混合音频（叠加背景音乐）
@@ -178,26 +753,55 @@ class AudioProcessor:
             # 出错时返回原始音频
             return audio
     
-    def _apply_quality_settings(self, audio):
-        """根据配置应用不同的音频质量设置"""
+    def _get_frame_rate(self):
+        """根据音频质量配置返回输出采样率"""
         if self.audio_quality == 'high':
             # 高质量: 192kbps, 44.1kHz
-            return audio.set_frame_rate(44100)
+            return 44100
         elif self.audio_quality == 'medium':
             # 中等质量: 128kbps, 32kHz
-            return audio.set_frame_rate(32000)
-        else:
-            # 低质量: 96kbps, 22.05kHz
-            return audio.set_frame_rate(22050)
+            return 32000
+        # 低质量: 96kbps, 22.05kHz
+        return 22050
     
-    def _cleanup_temp_files(self, file_paths):
-        """清理临时文件"""
-        for path in file_paths:
-            try:
-                if os.path.exists(path):
-                    os.remove(path)
-            except Exception as e:
-                logger.warning(f"清理临时文件时出错: {str(e)}")
+    def _apply_quality_settings(self, audio, style=None):
+        """根据配置应用不同的音频质量设置，和风格的整体音效合并为一条效果链"""
+        effects = PodcastTemplates.get_effects(style, 'master') + [{"type": "resample", "rate": self._get_frame_rate()}]
+        return EffectsChain(effects).apply(audio)
+    
+    def _get_bitrate(self):
+        """根据音频质量配置返回编码码率"""
+        return {'high': '192k', 'medium': '128k'}.get(self.audio_quality, '96k')
+    
+    def _build_sinks(self, output_path, frame_rate, channels):
+        """
+        构建导出用的输出端: mp3编码器，以及按配置启用的质检、波形峰值分析器
+        """
+        sinks = [StreamingEncoder(output_path, frame_rate, channels, 'mp3', self._get_bitrate())]
+        if self.qc_enabled:
+            sinks.append(AudioQCAnalyzer(
+                frame_rate,
+                channels,
+                thresholds=self.qc_thresholds,
+                spectral_flatness=self.qc_spectral_flatness
+            ))
+        if self.waveform_peaks:
+            sinks.append(WaveformPeaksBuilder(
+                f"{os.path.splitext(output_path)[0]}.peaks.json",
+                frame_rate,
+                samples_per_pixel=self.waveform_samples_per_pixel,
+                levels=self.waveform_levels
+            ))
+        return sinks
+    
+    def _export_audio(self, audio, output_path):
+        """
+        流式导出音频: 按块送入ffmpeg编码，同时交给质检、波形峰值等分析器
+        返回: dict 各分析器的结果（例如 qc、peaks_path）
+        """
+        sinks = self._build_sinks(output_path, audio.frame_rate, audio.channels)
+        audio = audio.set_sample_width(2)
+        return BlockRenderer(audio).render(sinks)
     
     def add_background_music(self, 
                            voice_path: str, 
@@ -258,30 +862,43 @@ class AudioProcessor:
     def process_podcast(self, 
                        voice_path: str,
                        category: str = "business",
-                       music_volume: float = 0.3) -> str:
+                       music_volume: float = DEFAULT_MUSIC_VOLUME) -> str:
         """处理播客音频，添加背景音乐
         
         Args:
             voice_path: 语音文件路径
             category: 背景音乐类别
-            music_volume: 背景音乐音量（0-1）
+            music_volume: 背景音乐音量（0-1），默认0.3对应BED_TARGET_LUFS，
+                其他值在响度匹配后的增益上相对调整；未测量响度的曲目按音量线性缩放；0表示不加背景音乐
             
         Returns:
             处理后的音频文件路径
         """
+        if music_volume <= 0:
+            self.logger.info("背景音乐音量为0，不添加背景音乐")
+            return voice_path
+        
         try:
-            # 获取背景音乐
-            music_list = self.music_crawler.load_music_info(category)
-            if not music_list:
+            # 按语音时长选择曲目（单曲或交叉淡化的多首）并拼接成背景音乐
+            duration_ms = int(probe_audio(voice_path)['duration'] * 1000)
+            bed = self._load_background_music(
+                duration_ms,
+                category=category,
+                episode=os.path.basename(voice_path),
+                default_gain=20 * np.log10(DEFAULT_MUSIC_VOLUME),
+                gain_offset=20 * np.log10(music_volume / DEFAULT_MUSIC_VOLUME)
+            )
+            if bed is None:
                 self.logger.warning(f"没有找到 {category} 类别的背景音乐")
                 return voice_path
             
-            # 随机选择一首音乐
-            music = np.random.choice(music_list)
-            music_path = music['file_path']
-            
-            # 添加背景音乐
-            return self.add_background_music(voice_path, music_path, music_volume=music_volume)
+            bed_path = os.path.join(self.output_dir, f"bed_{os.path.splitext(os.path.basename(voice_path))[0]}.wav")
+            bed.export(bed_path, format='wav')
+            try:
+                # 背景音乐已按响度调整过音量
+                return self.add_background_music(voice_path, bed_path, music_volume=1.0)
+            finally:
+                os.remove(bed_path)
             
         except Exception as e:
             self.logger.error(f"处理播客音频失败: {str(e)}")
@@ -0,0 +1,244 @@
+import numpy as np
+from logger import logger
+from block_renderer import read_file_blocks
+
+# 默认质检阈值
+DEFAULT_THRESHOLDS = {
+    'max_clipped_samples': 1000,  # 削波样本数上限
+    'max_true_peak_dbtp': 0.0,  # 真峰值上限 (dBTP)
+    'min_lufs': -24.0,  # 综合响度下限 (LUFS)
+    'max_lufs': -10.0,  # 综合响度上限 (LUFS)
+    'max_silence_seconds': 5.0,  # 单段静音时长上限
+    'min_duration': 10.0,  # 最短时长（秒）
+    'max_spectral_flatness': 0.5  # 频谱平坦度上限，接近1说明是噪声
+}
+
+def k_weighting_coefficients(frame_rate):
+    """ITU-R BS.1770 K计权滤波器（高架 + 高通）在任意采样率下的系数"""
+    # 第一级: 高架滤波器，模拟头部声学效应
+    gain_db = 3.999843853973347
+    q = 0.7071752369554196
+    freq = 1681.974450955533
+    k = np.tan(np.pi * freq / frame_rate)
+    vh = 10 ** (gain_db / 20)
+    vb = vh ** 0.4996667741545416
+    a0 = 1 + k / q + k * k
+    shelf_b = np.array([(vh + vb * k / q + k * k) / a0, 2 * (k * k - vh) / a0, (vh - vb * k / q + k * k) / a0])
+    shelf_a = np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+
+    # 第二级: RLB高通滤波器
+    q = 0.5003270373238773
+    freq = 38.13547087602444
+    k = np.tan(np.pi * freq / frame_rate)
+    a0 = 1 + k / q + k * k
+    highpass_b = np.array([1.0, -2.0, 1.0])
+    highpass_a = np.array([1.0, 2 * (k * k - 1) / a0, (1 - k / q + k * k) / a0])
+
+    return (shelf_b, shelf_a), (highpass_b, highpass_a)
+
+
+def to_db(amplitude):
+    """线性幅度转dB，静音返回None以便写入JSON"""
+    return round(float(20 * np.log10(amplitude)), 2) if amplitude > 0 else None
+
+
+class AudioQCAnalyzer:
+    """
+    音频质检分析器，一次块流式遍历同时计算:
+    削波样本数、真峰值、综合响度(LUFS)、静音段、时长，以及可选的频谱平坦度
+    可以作为BlockRenderer的输出端，在导出时顺带完成质检
+    """
+
+    def __init__(self, frame_rate, channels, thresholds=None, spectral_flatness=False, silence_threshold_db=-50.0):
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.thresholds = dict(DEFAULT_THRESHOLDS, **(thresholds or {}))
+        self.spectral_flatness = spectral_flatness
+        self.silence_threshold_db = silence_threshold_db
+
+        # K计权滤波器及跨块保持的滤波器状态
+        self.k_filters = k_weighting_coefficients(frame_rate)
+        self.k_states = [np.zeros((2, channels)) for _ in self.k_filters]
+
+        # 以100毫秒为步长统计，400毫秒门限块 = 连续4个步长
+        self.step = int(frame_rate * 0.1)
+        self.pending_weighted = np.zeros(0, dtype=np.float64)
+        self.pending_raw = np.zeros(0, dtype=np.float64)
+        self.step_powers = []
+
+        # 真峰值: 4倍过采样，保留上一块的尾部作为插值上下文
+        # 块末尾的样本缺少右侧上下文，插值会在截断处振铃，留到下一块（或结束时）再计算
+        self.oversample = 4
+        self.peak_context = 16
+        self.context = np.zeros((self.peak_context, channels), dtype=np.float32)
+        self.peak_pending = 0
+
+        self.total_frames = 0
+        self.clipped_samples = 0
+        self.sample_peak = 0.0
+        self.true_peak = 0.0
+        self.silence_run = 0
+        self.silence_runs = 0
+        self.longest_silence = 0
+        self.flatness_values = []
+
+    def process_block(self, block):
+        """处理一个 (帧数, 声道数) 的float32块"""
+        from scipy.signal import lfilter
+
+        if len(block) == 0:
+            return
+        self.total_frames += len(block)
+
+        # 削波与采样峰值
+        magnitude = np.abs(block)
+        self.clipped_samples += int(np.count_nonzero(magnitude >= 0.999))
+        self.sample_peak = max(self.sample_peak, float(magnitude.max()))
+
+        # 真峰值
+        self._measure_true_peak(block)
+
+        # K计权后按声道求和的能量
+        weighted = block.astype(np.float64)
+        for i, (b, a) in enumerate(self.k_filters):
+            weighted, self.k_states[i] = lfilter(b, a, weighted, axis=0, zi=self.k_states[i])
+        self.pending_weighted = np.concatenate([self.pending_weighted, np.sum(weighted ** 2, axis=1)])
+        self.pending_raw = np.concatenate([self.pending_raw, np.mean(block.astype(np.float64) ** 2, axis=1)])
+        self._consume_steps()
+
+        # 频谱平坦度（只统计非静音块）
+        if self.spectral_flatness and magnitude.mean() > 1e-4:
+            spectrum = np.abs(np.fft.rfft(block.mean(axis=1))) + 1e-12
+            self.flatness_values.append(float(np.exp(np.mean(np.log(spectrum))) / np.mean(spectrum)))
+
+    def _measure_true_peak(self, block):
+        """
+        过采样计算真峰值，只统计左右两侧都有peak_context个样本上下文的部分
+        block为None时表示流结束，剩余样本按右侧补零计算
+        """
+        from scipy.signal import resample_poly
+
+        pad = self.peak_context
+        if block is None:
+            block = np.zeros((pad, self.channels), dtype=np.float32)
+        extended = np.concatenate([self.context, block])
+        start = len(self.context) - self.peak_pending
+        end = max(start, len(extended) - pad)
+        if end > start:
+            upsampled = resample_poly(extended, self.oversample, 1, axis=0)
+            self.true_peak = max(
+                self.true_peak,
+                float(np.abs(upsampled[start * self.oversample:end * self.oversample]).max())
+            )
+        self.context = extended[max(0, end - pad):]
+        self.peak_pending = len(extended) - end
+
+    def _consume_steps(self):
+        """按100毫秒步长消费已累积的能量，更新响度与静音统计"""
+        n_steps = len(self.pending_weighted) // self.step
+        if n_steps == 0:
+            return
+
+        used = n_steps * self.step
+        self.step_powers.extend(self.pending_weighted[:used].reshape(n_steps, self.step).mean(axis=1))
+        raw_db = 10 * np.log10(self.pending_raw[:used].reshape(n_steps, self.step).mean(axis=1) + 1e-12)
+        self.pending_weighted = self.pending_weighted[used:]
+        self.pending_raw = self.pending_raw[used:]
+
+        for silent in raw_db < self.silence_threshold_db:
+            if silent:
+                self.silence_run += 1
+                continue
+            self._close_silence_run()
+
+    def _close_silence_run(self):
+        """结束当前静音段"""
+        if self.silence_run * 0.1 >= 2.0:
+            self.silence_runs += 1
+        self.longest_silence = max(self.longest_silence, self.silence_run)
+        self.silence_run = 0
+
+    def integrated_loudness(self):
+        """按BS.1770门限算法计算综合响度"""
+        powers = np.array(self.step_powers)
+        if len(powers) < 4:
+            return float('-inf')
+
+        # 400毫秒门限块，75%重叠
+        blocks = np.convolve(powers, np.ones(4) / 4, mode='valid')
+        loudness = -0.691 + 10 * np.log10(blocks + 1e-12)
+
+        gated = blocks[loudness > -70.0]
+        if len(gated) == 0:
+            return float('-inf')
+        relative_gate = -0.691 + 10 * np.log10(gated.mean()) - 10.0
+        gated = blocks[(loudness > -70.0) & (loudness > relative_gate)]
+        if len(gated) == 0:
+            return float('-inf')
+        return float(-0.691 + 10 * np.log10(gated.mean()))
+
+    def early_failures(self):
+        """流式过程中已经可以确定的失败项，用于提前终止"""
+        failures = []
+        if self.clipped_samples > self.thresholds['max_clipped_samples']:
+            failures.append(f"削波样本过多: {self.clipped_samples}")
+        if max(self.silence_run, self.longest_silence) * 0.1 > self.thresholds['max_silence_seconds']:
+            failures.append(f"静音过长: {max(self.silence_run, self.longest_silence) * 0.1:.1f}秒")
+        return failures
+
+    def finalize(self):
+        """结束分析，返回 {'qc': 质检报告}"""
+        self._close_silence_run()
+        if self.peak_pending:
+            self._measure_true_peak(None)
+        duration = self.total_frames / self.frame_rate
+        lufs = self.integrated_loudness()
+        true_peak_db = to_db(self.true_peak)
+
+        report = {
+            'duration': duration,
+            'clipped_samples': self.clipped_samples,
+            'sample_peak_dbfs': to_db(self.sample_peak),
+            'true_peak_dbtp': true_peak_db,
+            'integrated_lufs': round(lufs, 2) if np.isfinite(lufs) else None,
+            'silence_runs': self.silence_runs,
+            'longest_silence': self.longest_silence * 0.1
+        }
+        if self.spectral_flatness:
+            report['spectral_flatness'] = float(np.mean(self.flatness_values)) if self.flatness_values else 0.0
+
+        failures = self.early_failures()
+        if true_peak_db is not None and true_peak_db > self.thresholds['max_true_peak_dbtp']:
+            failures.append(f"真峰值过高: {true_peak_db:.2f} dBTP")
+        if not self.thresholds['min_lufs'] <= lufs <= self.thresholds['max_lufs']:
+            failures.append(f"响度超出范围: {lufs:.1f} LUFS")
+        if duration < self.thresholds['min_duration']:
+            failures.append(f"时长过短: {duration:.1f}秒")
+        if self.spectral_flatness and report['spectral_flatness'] > self.thresholds['max_spectral_flatness']:
+            failures.append(f"频谱平坦度异常: {report['spectral_flatness']:.2f}")
+
+        report['passed'] = not failures
+        report['failures'] = failures
+        if failures:
+            logger.warning(f"音频质检未通过: {'; '.join(failures)}")
+        else:
+            logger.info(f"音频质检通过: {lufs:.1f} LUFS, 真峰值 {true_peak_db:.2f} dBTP, 时长 {duration:.1f}秒")
+        return {'qc': report}
+
+    @classmethod
+    def analyze_file(cls, path, thresholds=None, spectral_flatness=False, fail_fast=True):
+        """
+        流式解码并质检已有的音频文件
+        fail_fast: 削波或静音超出阈值时立即停止解码
+        返回: 质检报告dict
+        """
+        frame_rate, channels, blocks = read_file_blocks(path)
+        analyzer = cls(frame_rate, channels, thresholds, spectral_flatness)
+        for block in blocks:
+            analyzer.process_block(block)
+            if fail_fast and analyzer.early_failures():
+                blocks.close()
+                report = analyzer.finalize()['qc']
+                report['aborted'] = True
+                return report
+        return analyzer.finalize()['qc']
\ No newline at end of file
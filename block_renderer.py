@@ -0,0 +1,260 @@
+import subprocess
+import numpy as np
+from pydub import AudioSegment
+from pydub.utils import mediainfo
+from logger import logger
+from exceptions import AudioGenerationError, AudioProbeError
+from audio_probe import probe_audio
+
+# 输出格式对应的ffmpeg编码参数
+ENCODER_ARGS = {
+    'mp3': ['-f', 'mp3', '-codec:a', 'libmp3lame'],
+    'wav': ['-f', 'wav'],
+    'ogg': ['-f', 'ogg', '-codec:a', 'libvorbis'],
+    'adts': ['-f', 'adts', '-codec:a', 'aac'],
+    'hls': ['-f', 'hls', '-codec:a', 'aac']
+}
+
+class StreamingEncoder:
+    """
+    通过ffmpeg管道边接收PCM块边编码，不需要把整段音频交给pydub一次性导出
+    也可以作为BlockRenderer的输出端使用
+    """
+
+    def __init__(self, output, frame_rate, channels, format='mp3', bitrate=None, extra_args=None):
+        """
+        output: 输出文件路径，'pipe:1' 表示编码结果写到stdout（调用方需要同时读取stdout）
+        extra_args: 追加在输出文件之前的ffmpeg参数
+        """
+        self.output = output
+        self.frame_rate = frame_rate
+        self.channels = channels
+
+        command = [
+            AudioSegment.converter, '-hide_banner', '-loglevel', 'error', '-y',
+            '-f', 's16le', '-ar', str(frame_rate), '-ac', str(channels), '-i', 'pipe:0'
+        ]
+        command += ENCODER_ARGS.get(format, ['-f', format])
+        if bitrate:
+            command += ['-b:a', bitrate]
+        command += extra_args or []
+        command.append(output)
+
+        self.process = subprocess.Popen(
+            command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE if output == 'pipe:1' else subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+
+    def write(self, block):
+        """写入一个 (帧数, 声道数) 的float32块"""
+        pcm = np.clip(block * 32768, -32768, 32767).astype('<i2')
+        self.process.stdin.write(pcm.tobytes())
+
+    def process_block(self, block):
+        self.write(block)
+
+    def close(self):
+        """结束编码并等待ffmpeg退出"""
+        if self.process.stdin and not self.process.stdin.closed:
+            self.process.stdin.close()
+        stderr = self.process.stderr.read() if self.process.stderr else b''
+        if self.process.wait() != 0:
+            raise AudioGenerationError(f"音频编码失败: {stderr.decode('utf-8', 'ignore').strip()}")
+
+    def abort(self):
+        """渲染出错时终止编码进程"""
+        self.process.kill()
+
+    def finalize(self):
+        self.close()
+        return {}
+
+
+def abort_sinks(sinks):
+    """渲染出错时终止所有定义了abort()的输出端（编码进程、推流连接等），一个失败不影响其他"""
+    for sink in sinks:
+        abort = getattr(sink, 'abort', None)
+        if abort is None:
+            continue
+        try:
+            abort()
+        except Exception as e:
+            logger.warning(f"终止输出端 {type(sink).__name__} 时出错: {str(e)}")
+
+
+class BlockRenderer:
+    """
+    将成品音频切成固定时长的块，依次交给各个输出端（编码器、质检、波形等）
+    所有输出端共享同一次遍历，不需要额外解码
+    """
+
+    def __init__(self, audio, block_ms=1000):
+        self.audio = audio
+        self.frame_rate = audio.frame_rate
+        self.channels = audio.channels
+        self.block_frames = max(1, int(self.frame_rate * block_ms / 1000))
+
+    def blocks(self):
+        """逐块产出 (帧数, 声道数) 的float32数组"""
+        scale = float(1 << (8 * self.audio.sample_width - 1))
+        samples = np.array(self.audio.get_array_of_samples()).reshape((-1, self.channels))
+        for start in range(0, len(samples), self.block_frames):
+            yield samples[start:start + self.block_frames].astype(np.float32) / scale
+
+    def render(self, sinks):
+        """
+        把每个块依次交给所有输出端，最后调用各输出端的finalize
+        sinks: 实现了 process_block(block) 和 finalize() 的对象列表
+        返回: 各输出端finalize结果合并后的dict
+        """
+        try:
+            for block in self.blocks():
+                for sink in sinks:
+                    sink.process_block(block)
+
+            results = {}
+            for sink in sinks:
+                results.update(sink.finalize() or {})
+            return results
+        except Exception:
+            abort_sinks(sinks)
+            raise
+
+
+class StreamingRenderer:
+    """
+    渐进式渲染器: 语音片段边合成边送入，凑够一个块就混入背景音乐并交给各输出端
+    渲染开始几秒后输出端（例如HLS分段）就能拿到可播放的数据，内存占用与节目总长无关
+    """
+
+    def __init__(self, frame_rate, channels, sinks, bed=None, bed_fade_ms=2000, block_ms=1000):
+        """
+        frame_rate/channels: 输出参数，送入的语音片段会被转换成相同格式
+        sinks: 实现了 process_block(block) 和 finalize() 的输出端列表
+        bed: 可选的背景音乐AudioSegment（已调整好音量），长度不足时循环
+        bed_fade_ms: 背景音乐淡入淡出时长
+        """
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.sinks = sinks
+        self.block_frames = max(1, int(frame_rate * block_ms / 1000))
+        self.fade_frames = int(frame_rate * bed_fade_ms / 1000)
+
+        self.bed = None
+        if bed is not None and len(bed) > 0:
+            bed = bed.set_frame_rate(frame_rate).set_channels(channels).set_sample_width(2)
+            self.bed = np.array(bed.get_array_of_samples(), dtype=np.float32).reshape((-1, channels)) / 32768
+
+        self.pending = []  # 尚未输出的语音数组
+        self.pending_frames = 0
+        self.emitted_frames = 0
+
+    @property
+    def position_ms(self):
+        """已送入语音的总时长（毫秒）"""
+        return (self.emitted_frames + self.pending_frames) * 1000 / self.frame_rate
+
+    def push(self, segment):
+        """
+        送入一段语音，返回该段在时间轴上的起始时间（毫秒）
+        """
+        start = self.position_ms
+        segment = segment.set_frame_rate(self.frame_rate).set_channels(self.channels).set_sample_width(2)
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32).reshape((-1, self.channels)) / 32768
+        self.pending.append(samples)
+        self.pending_frames += len(samples)
+
+        # 留出背景音乐淡出的长度，节目结束前无法确定这部分是否处在结尾
+        while self.pending_frames - self.fade_frames >= self.block_frames:
+            self._emit(self.block_frames)
+        return start
+
+    def _take(self, n_frames):
+        """从待输出缓冲区取出n_frames帧"""
+        buffer = np.concatenate(self.pending) if len(self.pending) > 1 else self.pending[0]
+        block, rest = buffer[:n_frames], buffer[n_frames:]
+        self.pending = [rest] if len(rest) else []
+        self.pending_frames = len(rest)
+        return block
+
+    def _bed_slice(self, start, n_frames):
+        """取出时间轴[start, start+n_frames)对应的背景音乐，长度不足时循环"""
+        indices = np.arange(start, start + n_frames) % len(self.bed)
+        return self.bed[indices]
+
+    def _emit(self, n_frames, fade_out_from=None):
+        """混入背景音乐后把一个块交给所有输出端"""
+        block = self._take(n_frames).copy()
+        start = self.emitted_frames
+        if self.bed is not None:
+            bed = self._bed_slice(start, len(block))
+            positions = np.arange(start, start + len(block))
+            envelope = np.ones(len(block), dtype=np.float32)
+            if self.fade_frames:
+                envelope = np.minimum(envelope, positions / self.fade_frames)
+                if fade_out_from is not None:
+                    envelope = np.minimum(envelope, np.clip((fade_out_from + self.fade_frames - positions) / self.fade_frames, 0, 1))
+            block += bed * envelope[:, None]
+
+        self.emitted_frames += len(block)
+        for sink in self.sinks:
+            sink.process_block(block)
+
+    def finish(self):
+        """输出剩余数据（含背景音乐淡出），结束所有输出端并返回合并后的结果"""
+        total = self.emitted_frames + self.pending_frames
+        fade_out_from = max(0, total - self.fade_frames)
+        while self.pending_frames:
+            self._emit(min(self.block_frames, self.pending_frames), fade_out_from)
+
+        results = {}
+        for sink in self.sinks:
+            results.update(sink.finalize() or {})
+        results['duration'] = total / self.frame_rate
+        return results
+
+    def abort(self):
+        """渲染出错时终止所有输出端"""
+        abort_sinks(self.sinks)
+
+
+def read_file_blocks(path, block_ms=1000, frame_rate=None, channels=None):
+    """
+    通过ffmpeg管道流式解码音频文件，逐块产出float32数组
+    frame_rate/channels 为None时使用文件本身的参数
+    返回: (采样率, 声道数, 块生成器)
+    """
+    if frame_rate is None or channels is None:
+        try:
+            info = probe_audio(path)
+        except AudioProbeError:
+            # 文件头无法识别的格式交给ffprobe
+            info = mediainfo(path)
+        frame_rate = frame_rate or int(info.get('sample_rate', 44100))
+        channels = channels or int(info.get('channels', 2))
+
+    command = [
+        AudioSegment.converter, '-hide_banner', '-loglevel', 'error',
+        '-i', path, '-f', 'f32le', '-ar', str(frame_rate), '-ac', str(channels), 'pipe:1'
+    ]
+    block_bytes = max(1, int(frame_rate * block_ms / 1000)) * channels * 4
+
+    def generate():
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                data = process.stdout.read(block_bytes)
+                if not data:
+                    break
+                usable = len(data) - len(data) % (channels * 4)
+                yield np.frombuffer(data[:usable], dtype='<f4').reshape((-1, channels))
+        finally:
+            process.stdout.close()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+
+    logger.debug(f"流式解码: {path} ({frame_rate}Hz, {channels}声道)")
+    return frame_rate, channels, generate()
\ No newline at end of file
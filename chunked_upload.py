@@ -0,0 +1,180 @@
+import os
+import json
+import asyncio
+import hashlib
+import aiohttp
+from datetime import datetime
+from logger import logger
+from exceptions import PublishingError, APIError
+
+class ChunkedUploader:
+    """
+    分块断点续传上传客户端
+
+    协议（与 scripts/mock_platform_server.py 一致）:
+        POST {api_url}/uploads           创建上传会话 {"filename", "size"} -> {"upload_id", "offset"}
+        GET  {api_url}/uploads/{id}      查询服务器已确认的字节数 -> {"offset", "size"}
+        PUT  {api_url}/uploads/{id}      Content-Range: bytes 起-止/总长，返回新的 {"offset"}
+                                         起始位置与服务器不一致时返回409和服务器的offset
+
+    每次只从磁盘读取一个分块，内存占用与文件大小无关。已确认的偏移写入本地清单文件，
+    失败或进程重启后先向服务器查询确认的偏移，从该位置继续，只重传丢失的部分。
+    """
+
+    def __init__(self, session, api_url, platform, chunk_size=5 * 1024 * 1024,
+                 manifest_dir="data/uploads", max_retries=3, retry_delay=2):
+        self.session = session
+        self.api_url = api_url.rstrip('/')
+        self.platform = platform
+        self.chunk_size = chunk_size
+        self.manifest_dir = manifest_dir
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    def _manifest_path(self, path):
+        key = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.manifest_dir, f"{self.platform}_{key}.json")
+
+    def _load_manifest(self, path, stat):
+        """读取清单，文件已变化时作废"""
+        manifest_path = self._manifest_path(path)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('size') != stat.st_size or manifest.get('mtime_ns') != stat.st_mtime_ns:
+            logger.info(f"文件已变化，放弃之前的上传会话: {path}")
+            return None
+        return manifest
+
+    def _save_manifest(self, manifest):
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        manifest_path = self._manifest_path(manifest['path'])
+        manifest['updated_at'] = datetime.now().isoformat()
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, manifest_path)
+
+    def discard(self, path):
+        """节目创建成功后删除清单"""
+        manifest_path = self._manifest_path(path)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+    async def _json(self, response):
+        if response.status >= 400:
+            text = await response.text()
+            raise APIError(f"API错误: {response.status} - {text[:500]}", response.status, text)
+        return await response.json(content_type=None)
+
+    async def _create(self, path, stat):
+        """创建上传会话"""
+        payload = {"filename": os.path.basename(path), "size": stat.st_size, "content_type": "audio/mpeg"}
+        async with self.session.post(f"{self.api_url}/uploads", json=payload) as response:
+            data = await self._json(response)
+        manifest = {
+            "platform": self.platform,
+            "path": path,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "upload_id": data["upload_id"],
+            "offset": int(data.get("offset", 0)),
+            "chunk_size": self.chunk_size,
+            "created_at": datetime.now().isoformat()
+        }
+        self._save_manifest(manifest)
+        return manifest
+
+    async def _server_offset(self, upload_id):
+        """查询服务器已确认的字节数，会话不存在（已过期）时返回None"""
+        async with self.session.get(f"{self.api_url}/uploads/{upload_id}") as response:
+            if response.status == 404:
+                return None
+            data = await self._json(response)
+        return int(data["offset"])
+
+    async def _put_chunk(self, upload_id, data, offset, total):
+        """发送一个分块，返回服务器确认的新偏移"""
+        headers = {
+            "Content-Range": f"bytes {offset}-{offset + len(data) - 1}/{total}",
+            "Content-Type": "application/octet-stream"
+        }
+        async with self.session.put(f"{self.api_url}/uploads/{upload_id}", data=data, headers=headers) as response:
+            if response.status == 409:
+                # 偏移不一致: 以服务器为准
+                return int((await response.json(content_type=None))["offset"])
+            result = await self._json(response)
+        return int(result["offset"])
+
+    async def _resume(self, path, stat):
+        """恢复之前的上传会话，没有或已过期时新建"""
+        manifest = self._load_manifest(path, stat)
+        if manifest:
+            offset = await self._server_offset(manifest["upload_id"])
+            if offset is not None:
+                if offset:
+                    logger.info(f"续传 {path}: 服务器已确认 {offset / stat.st_size:.0%} ({offset}/{stat.st_size} 字节)")
+                manifest["offset"] = offset
+                return manifest
+            logger.info(f"上传会话已过期，重新上传: {path}")
+        return await self._create(path, stat)
+
+    async def upload(self, path):
+        """
+        分块上传文件，返回upload_id
+        每个分块失败或服务器确认的偏移没有前进时重新查询偏移后重试，连续max_retries次放弃（清单保留，下次从断点继续）
+        分块被拒绝（4xx，408/429除外）时直接抛出原始的APIError
+        """
+        stat = os.stat(path)
+        manifest = await self._resume(path, stat)
+        upload_id = manifest["upload_id"]
+        offset = manifest["offset"]
+        failures = 0
+
+        with open(path, 'rb') as f:
+            while offset < stat.st_size:
+                f.seek(offset)
+                data = f.read(self.chunk_size)
+                try:
+                    confirmed = await self._put_chunk(upload_id, data, offset, stat.st_size)
+                except (aiohttp.ClientError, asyncio.TimeoutError, APIError) as e:
+                    failures += 1
+                    if isinstance(e, APIError) and e.status_code is not None and e.status_code < 500 \
+                            and e.status_code not in (408, 429):
+                        # 保留原始的APIError（含状态码），发布队列据此判断为永久失败，不再重试
+                        logger.error(f"分块上传被拒绝: {str(e)}")
+                        raise
+                    if failures >= self.max_retries:
+                        raise PublishingError(f"分块上传失败（已确认 {offset}/{stat.st_size} 字节）: {str(e) or type(e).__name__}")
+                    logger.warning(f"分块上传出错，{self.retry_delay} 秒后从服务器确认的位置重试: {str(e) or type(e).__name__}")
+                    await asyncio.sleep(self.retry_delay)
+                    try:
+                        confirmed = await self._server_offset(upload_id)
+                    except (aiohttp.ClientError, asyncio.TimeoutError, APIError):
+                        continue
+                    if confirmed is None:
+                        raise PublishingError("上传会话已失效")
+                else:
+                    if confirmed > offset:
+                        failures = 0
+                    else:
+                        # 服务器确认的偏移没有前进: 计为一次失败，避免一直重发同一个分块
+                        failures += 1
+                        if failures >= self.max_retries:
+                            raise PublishingError(f"分块上传没有进展（服务器确认 {confirmed}/{stat.st_size} 字节）")
+                        if confirmed < offset:
+                            logger.warning(f"服务器确认的偏移回退到 {confirmed}（本地 {offset}），从服务器的位置重新发送")
+                        else:
+                            logger.warning(f"服务器确认的偏移没有前进（{confirmed}），重新发送该分块")
+                        await asyncio.sleep(self.retry_delay)
+
+                offset = confirmed
+                manifest["offset"] = offset
+                self._save_manifest(manifest)
+
+        logger.info(f"分块上传完成: {os.path.basename(path)} ({stat.st_size} 字节)")
+        return upload_id
\ No newline at end of file
@@ -20,12 +20,81 @@ class Config:
         self.audio_quality = os.getenv('AUDIO_QUALITY', 'high')  # high, medium, low
         self.background_music_path = os.path.join('assets', 'music', self.background_music_category)
         
+        # 静音裁剪配置
+        self.trim_silence = os.getenv('TRIM_SILENCE', 'true').lower() == 'true'
+        self.silence_threshold_db = float(os.getenv('SILENCE_THRESHOLD_DB', '-45'))
+        self.max_pause_ms = int(os.getenv('MAX_PAUSE_MS', '600'))
+        self.edge_padding_ms = int(os.getenv('EDGE_PADDING_MS', '100'))
+        
+        # 目标时长配置（秒，0表示不限制）
+        self.target_duration = float(os.getenv('TARGET_DURATION', '0'))
+        self.min_pause_ms = int(os.getenv('MIN_PAUSE_MS', '250'))
+        self.min_speed_rate = float(os.getenv('MIN_SPEED_RATE', '0.9'))
+        self.max_speed_rate = float(os.getenv('MAX_SPEED_RATE', '1.15'))
+        
+        # 语音合成配置
+        self.tts_cache_dir = os.getenv('TTS_CACHE_DIR', os.path.join('cache', 'tts'))
+        self.tts_workers = int(os.getenv('TTS_WORKERS', '4'))
+        self.tts_voice = os.getenv('TTS_VOICE', 'zh-CN')
+        self.sentence_gap_ms = int(os.getenv('SENTENCE_GAP_MS', '350'))
+        self.preview_bitrate = os.getenv('PREVIEW_BITRATE', '48k')
+        
+        # 对话型播客配置（声音格式为 语言 或 语言:口音域名）
+        self.dialogue_voices = os.getenv('DIALOGUE_VOICES', 'zh-CN,zh-TW').split(',')
+        self.dialogue_gap_ms = int(os.getenv('DIALOGUE_GAP_MS', '250'))
+        self.dialogue_overlap_ms = int(os.getenv('DIALOGUE_OVERLAP_MS', '0'))
+        self.dialogue_pan = float(os.getenv('DIALOGUE_PAN', '0.3'))
+        
         # 音乐管理器
         self.music_manager = MusicManager()
         self.music_storage = MusicStorage()
         self.permission_manager = PermissionManager()
         self.analytics = MusicAnalytics()
         
+        # 音频质检配置
+        self.qc_enabled = os.getenv('QC_ENABLED', 'true').lower() == 'true'
+        self.qc_spectral_flatness = os.getenv('QC_SPECTRAL_FLATNESS', 'false').lower() == 'true'
+        self.qc_thresholds = {
+            'max_clipped_samples': int(os.getenv('QC_MAX_CLIPPED_SAMPLES', '1000')),
+            'max_true_peak_dbtp': float(os.getenv('QC_MAX_TRUE_PEAK_DBTP', '0.0')),
+            'min_lufs': float(os.getenv('QC_MIN_LUFS', '-24')),
+            'max_lufs': float(os.getenv('QC_MAX_LUFS', '-10')),
+            'max_silence_seconds': float(os.getenv('QC_MAX_SILENCE_SECONDS', '5')),
+            'min_duration': float(os.getenv('QC_MIN_DURATION', '10')),
+            'max_spectral_flatness': float(os.getenv('QC_MAX_SPECTRAL_FLATNESS', '0.5'))
+        }
+        
+        # 波形峰值配置
+        self.waveform_peaks = os.getenv('WAVEFORM_PEAKS', 'true').lower() == 'true'
+        self.waveform_samples_per_pixel = int(os.getenv('WAVEFORM_SAMPLES_PER_PIXEL', '256'))
+        self.waveform_levels = int(os.getenv('WAVEFORM_LEVELS', '4'))
+        
+        # HLS分段输出配置
+        self.hls_segment_seconds = int(os.getenv('HLS_SEGMENT_SECONDS', '6'))
+        
+        # 直播推流配置
+        self.live_stream_url = os.getenv('LIVE_STREAM_URL', '')
+        self.live_buffer_ms = int(os.getenv('LIVE_BUFFER_MS', '5000'))
+        self.live_prebuffer_ms = int(os.getenv('LIVE_PREBUFFER_MS', '2000'))
+        
+        # 背景音乐响度（按预先测量的响度把背景音乐调整到目标电平）
+        self.bed_target_lufs = float(os.getenv('BED_TARGET_LUFS', '-34'))
+        
+        # 背景音乐选择（按时长覆盖节目，避开最近几集用过的曲目）
+        self.music_history_path = os.getenv('MUSIC_HISTORY_PATH', os.path.join('data', 'music_history.json'))
+        self.music_avoid_recent = int(os.getenv('MUSIC_AVOID_RECENT', '5'))
+        self.music_crossfade_ms = int(os.getenv('MUSIC_CROSSFADE_MS', '3000'))
+        
+        # 音乐特征分析（BPM、能量、频谱质心、调性 -> 情绪标签，按文件内容哈希缓存）
+        self.feature_cache_path = os.getenv('FEATURE_CACHE_PATH', os.path.join('cache', 'music_features.json'))
+        self.feature_workers = int(os.getenv('FEATURE_WORKERS', '0')) or None
+        
+        # 音乐指纹索引（同一首歌的不同编码、不同ID只保存一份）
+        self.fingerprint_index_path = os.getenv('FINGERPRINT_INDEX_PATH', os.path.join('cache', 'fingerprints.json'))
+        
+        # 音频探测缓存（按路径、大小、修改时间缓存文件头解析结果）
+        self.probe_cache_path = os.getenv('PROBE_CACHE_PATH', os.path.join('cache', 'probe_cache.json'))
+        
         # 日志配置
         self.log_level = os.getenv('LOG_LEVEL', 'INFO')
         self.log_file = os.getenv('LOG_FILE', os.path.join('logs', 'app.log'))
@@ -34,6 +103,71 @@ class Config:
         self.max_retries = int(os.getenv('MAX_RETRIES', '3'))
         self.timeout = int(os.getenv('TIMEOUT', '30'))
         
+        # 播客平台配置（配置了API密钥的平台才会发布）
+        self.xiaoyuzhou_api_key = os.getenv('XIAOYUZHOU_API_KEY')
+        self.xiaoyuzhou_api_url = os.getenv('XIAOYUZHOU_API_URL', 'https://api.xiaoyuzhou.com/v1')
+        self.lizhi_api_key = os.getenv('LIZHI_API_KEY')
+        self.lizhi_api_url = os.getenv('LIZHI_API_URL')
+        self.ximalaya_api_key = os.getenv('XIMALAYA_API_KEY')
+        self.ximalaya_api_url = os.getenv('XIMALAYA_API_URL')
+        self.qingting_api_key = os.getenv('QINGTING_API_KEY')
+        self.qingting_api_url = os.getenv('QINGTING_API_URL')
+        
+        # 各平台每小时上传次数上限（0表示不限）和是否支持先上传草稿再定时发布
+        self.xiaoyuzhou_uploads_per_hour = float(os.getenv('XIAOYUZHOU_UPLOADS_PER_HOUR', '0'))
+        self.xiaoyuzhou_drafts = os.getenv('XIAOYUZHOU_DRAFTS', 'false').lower() == 'true'
+        self.lizhi_uploads_per_hour = float(os.getenv('LIZHI_UPLOADS_PER_HOUR', '0'))
+        self.lizhi_drafts = os.getenv('LIZHI_DRAFTS', 'false').lower() == 'true'
+        self.ximalaya_uploads_per_hour = float(os.getenv('XIMALAYA_UPLOADS_PER_HOUR', '0'))
+        self.ximalaya_drafts = os.getenv('XIMALAYA_DRAFTS', 'false').lower() == 'true'
+        self.qingting_uploads_per_hour = float(os.getenv('QINGTING_UPLOADS_PER_HOUR', '0'))
+        self.qingting_drafts = os.getenv('QINGTING_DRAFTS', 'false').lower() == 'true'
+        self.upload_bucket_burst = int(os.getenv('UPLOAD_BUCKET_BURST', '2'))
+        
+        # 定时发布（--schedule 入队到下一个发布时间点，草稿提前上传，到点只调用发布接口）
+        self.release_slots = [slot.strip() for slot in os.getenv('RELEASE_SLOTS', '07:00').split(',') if slot.strip()]
+        self.upload_idle_hours = os.getenv('UPLOAD_IDLE_HOURS', '')
+        self.upload_lead_seconds = float(os.getenv('UPLOAD_LEAD_SECONDS', '3600'))
+        
+        # 发布连接池（每个平台一个长连接会话）
+        self.publish_pool_size = int(os.getenv('PUBLISH_POOL_SIZE', '4'))
+        self.publish_keepalive = int(os.getenv('PUBLISH_KEEPALIVE', '60'))
+        
+        # 分块断点续传（大于分块大小的文件分块上传，进度记录在清单目录中）
+        self.upload_chunk_size = int(os.getenv('UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024)))
+        self.upload_manifest_dir = os.getenv('UPLOAD_MANIFEST_DIR', os.path.join('data', 'uploads'))
+        
+        # 发布队列（--queue 入队后由 --mode worker 进程上传）
+        self.publish_queue_path = os.getenv('PUBLISH_QUEUE_PATH', os.path.join('data', 'publish_queue.db'))
+        self.publish_concurrency = int(os.getenv('PUBLISH_CONCURRENCY', '2'))
+        self.publish_max_attempts = int(os.getenv('PUBLISH_MAX_ATTEMPTS', '8'))
+        self.publish_backoff_base = float(os.getenv('PUBLISH_BACKOFF_BASE', '5'))
+        self.publish_backoff_max = float(os.getenv('PUBLISH_BACKOFF_MAX', '1800'))
+        self.breaker_failure_threshold = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))
+        self.breaker_reset_seconds = float(os.getenv('BREAKER_RESET_SECONDS', '300'))
+        
+        # 节目目录（集号按节目和季原子分配，记录各平台的节目ID）
+        self.episode_catalog_path = os.getenv('EPISODE_CATALOG_PATH', os.path.join('data', 'episodes.db'))
+        self.podcast_show = os.getenv('PODCAST_SHOW', 'zaka')
+        self.podcast_season = int(os.getenv('PODCAST_SEASON', '1'))
+        
+        # 自托管RSS（发布成功后增量更新，scripts/serve_feed.py 提供订阅）
+        self.feed_enabled = os.getenv('FEED_ENABLED', 'false').lower() == 'true'
+        self.feed_dir = os.getenv('FEED_DIR', os.path.join('data', 'feed'))
+        self.feed_base_url = os.getenv('FEED_BASE_URL', 'http://localhost:8200')
+        self.feed_title = os.getenv('FEED_TITLE', 'Zaka播客')
+        self.feed_description = os.getenv('FEED_DESCRIPTION', '')
+        self.feed_author = os.getenv('FEED_AUTHOR', '')
+        self.feed_language = os.getenv('FEED_LANGUAGE', 'zh-cn')
+        self.feed_image_url = os.getenv('FEED_IMAGE_URL', '')
+        self.feed_max_items = int(os.getenv('FEED_MAX_ITEMS', '300'))
+        
+        # 分类和标签的补充关键词词典（JSON: {分类: {关键词: 权重}}）
+        self.keyword_dict_path = os.getenv('KEYWORD_DICT_PATH', os.path.join('assets', 'keywords.json'))
+        
+        # 发布历史（SQLite，首次使用时导入旧的 logs/publish_history.json）
+        self.publish_history_path = os.getenv('PUBLISH_HISTORY_PATH', os.path.join('data', 'publish_history.db'))
+        
         # 确保必要的目录存在
         self._ensure_directories()
     
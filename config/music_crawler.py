@@ -1,7 +1,7 @@
 import os
 import json
 import requests
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime
 import logging
 from urllib.parse import urlparse
@@ -26,6 +26,10 @@ class MusicCrawler:
         self.jamendo_client_secret = os.getenv('JAMENDO_CLIENT_SECRET')
         self.fma_api_key = os.getenv('FMA_API_KEY')
         
+        # 下载前先取文件开头做指纹比对，重复的音乐不再完整下载
+        self.prefetch_bytes = int(os.getenv('FINGERPRINT_PREFETCH_BYTES', '262144'))
+        self._fingerprints = None
+        
         if not self.jamendo_client_id or not self.jamendo_client_secret:
             self.logger.warning("Jamendo API 凭据未配置")
     
@@ -72,6 +76,8 @@ class MusicCrawler:
                             music_info['file_path'] = file_path
                             results.append(music_info)
             
+            if self._fingerprints is not None:
+                self._fingerprints.save()
             return results
             
         except Exception as e:
@@ -120,14 +126,41 @@ class MusicCrawler:
                     music_info['file_path'] = file_path
                     results.append(music_info)
             
+            if self._fingerprints is not None:
+                self._fingerprints.save()
             return results
             
         except Exception as e:
             self.logger.error(f"从 Jamendo 爬取音乐失败: {str(e)}")
             return []
     
+    @property
+    def fingerprints(self):
+        """指纹索引（首次使用时加载）"""
+        if self._fingerprints is None:
+            from config.music_fingerprint import get_fingerprint_index
+            self._fingerprints = get_fingerprint_index()
+        return self._fingerprints
+    
+    def _fetch_head(self, url: str) -> Tuple[bytes, bool]:
+        """
+        只下载文件开头prefetch_bytes字节
+        返回 (数据, 服务器是否支持Range)；不支持Range时读够字节数后直接断开
+        """
+        response = self.session.get(url, headers={'Range': f"bytes=0-{self.prefetch_bytes - 1}"}, stream=True, timeout=30)
+        response.raise_for_status()
+        data = bytearray()
+        try:
+            for chunk in response.iter_content(chunk_size=8192):
+                data.extend(chunk)
+                if len(data) >= self.prefetch_bytes:
+                    break
+        finally:
+            response.close()
+        return bytes(data[:self.prefetch_bytes]), response.status_code == 206
+    
     def _download_file(self, url: str, category: str, music_id: str) -> Optional[str]:
-        """下载音乐文件"""
+        """下载音乐文件，先用开头一段的指纹检查是否与音乐库中已有的曲目重复"""
         try:
             # 创建类别目录
             category_dir = os.path.join(self.save_dir, category)
@@ -141,15 +174,45 @@ class MusicCrawler:
             filename = f"{music_id}{file_ext}"
             file_path = os.path.join(category_dir, filename)
             
-            # 下载文件
-            response = self.session.get(url, stream=True)
-            response.raise_for_status()
+            # 取开头一段做指纹比对
+            head, ranged = self._fetch_head(url)
+            try:
+                duplicate = self.fingerprints.find_duplicate(head)
+            except Exception as e:
+                self.logger.warning(f"开头片段无法计算指纹，直接下载: {str(e)}")
+                duplicate = None
+            if duplicate:
+                self.logger.info(
+                    f"跳过重复音乐 {music_id}: 与 {duplicate['path']} 一致 "
+                    f"({duplicate['matches']} 个地标, 占 {duplicate['ratio']:.0%})"
+                )
+                return None
+            
+            # 下载文件，服务器支持Range时从已取得的开头之后续传
+            headers = {'Range': f"bytes={len(head)}-"} if ranged and len(head) == self.prefetch_bytes else {}
+            if ranged and not headers:
+                # 文件比预取长度还短，已经完整取得
+                response = None
+            else:
+                response = self.session.get(url, headers=headers, stream=True)
+                if response.status_code == 416:
+                    # 文件长度恰好等于预取长度
+                    response = None
+                else:
+                    response.raise_for_status()
             
             with open(file_path, 'wb') as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
+                if response is None or response.status_code == 206:
+                    f.write(head)
+                if response is not None:
+                    for chunk in response.iter_content(chunk_size=8192):
+                        if chunk:
+                            f.write(chunk)
             
+            try:
+                self.fingerprints.add(f"{category}/{music_id}", file_path)
+            except Exception as e:
+                self.logger.warning(f"计算指纹失败: {file_path} ({str(e)})")
             return file_path
             
         except Exception as e:
@@ -157,8 +220,10 @@ class MusicCrawler:
             return None
     
     def _analyze_mood(self, title: str) -> str:
-        """分析音乐情绪"""
-        # 简单的情绪分析，可以根据需要扩展
+        """
+        根据标题关键词粗略判断音乐情绪
+        只作为下载后的临时标签，运行 MusicFeatureAnalyzer 后会按声学特征重新标注
+        """
         mood_keywords = {
             'energetic': ['upbeat', 'energetic', 'happy', 'joyful', 'exciting'],
             'calm': ['calm', 'peaceful', 'relaxing', 'soothing', 'meditation'],
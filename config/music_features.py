@@ -0,0 +1,245 @@
+import os
+import json
+import hashlib
+import logging
+import numpy as np
+from datetime import datetime
+from typing import Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from config.background_music import MusicMood
+from config.music_info import MusicInfoLibrary, normalize_path
+
+# 特征提取算法版本，算法或参数变化时递增，使缓存失效
+FEATURE_VERSION = 1
+
+# Krumhansl-Schmuckler 调性轮廓（C为主音）
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+PITCH_NAMES = ['C', 'C#', 'D', 'D#', 'E', 'F', 'F#', 'G', 'G#', 'A', 'A#', 'B']
+
+def file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """分块读取文件计算SHA-256，作为特征缓存的键（文件改名或移动后缓存仍然有效）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def estimate_key(chroma: np.ndarray) -> Dict:
+    """用平均色度与大小调轮廓的相关系数估计调性"""
+    best = None
+    for mode, profile in (('major', MAJOR_PROFILE), ('minor', MINOR_PROFILE)):
+        for tonic in range(12):
+            score = float(np.corrcoef(chroma, np.roll(profile, tonic))[0, 1])
+            if best is None or score > best[0]:
+                best = (score, tonic, mode)
+    score, tonic, mode = best
+    return {'key': f"{PITCH_NAMES[tonic]} {mode}", 'mode': mode, 'key_confidence': round(score, 3)}
+
+def extract_features(path: str, max_seconds: float = 120.0, sample_rate: int = 22050) -> Dict:
+    """
+    提取一首曲目的节奏、能量、频谱质心和调性
+    只分析开头max_seconds秒，背景音乐的风格在这段时间内已经足够稳定
+    """
+    import librosa
+
+    y, sr = librosa.load(path, sr=sample_rate, mono=True, duration=max_seconds)
+    if not len(y):
+        raise ValueError("音频为空")
+
+    tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
+    rms = librosa.feature.rms(y=y)[0]
+    centroid = librosa.feature.spectral_centroid(y=y, sr=sr)[0]
+    chroma = librosa.feature.chroma_stft(y=y, sr=sr).mean(axis=1)
+
+    features = {
+        'bpm': round(float(np.atleast_1d(tempo)[0]), 1),
+        'energy_db': round(float(20 * np.log10(max(float(rms.mean()), 1e-10))), 2),
+        'energy_variation': round(float(rms.std() / max(float(rms.mean()), 1e-10)), 3),
+        'spectral_centroid': round(float(centroid.mean()), 1),
+        'analyzed_seconds': round(len(y) / sr, 2)
+    }
+    features.update(estimate_key(chroma))
+    return features
+
+def features_to_mood(features: Dict) -> MusicMood:
+    """
+    把声学特征映射为情绪标签
+    快而响 -> 充满活力；慢而轻 -> 平静/放松；小调按音色明暗分为神秘/严肃；
+    其余按音色和速度分为现代、专业、专注
+    """
+    bpm = features['bpm']
+    energy = features['energy_db']
+    centroid = features['spectral_centroid']
+    minor = features.get('mode') == 'minor'
+
+    if bpm >= 115 and energy >= -20:
+        return MusicMood.ENERGETIC
+    if bpm < 85 and energy < -24:
+        return MusicMood.CALM if centroid < 1500 else MusicMood.RELAXING
+    if minor:
+        return MusicMood.MYSTERIOUS if centroid < 1800 else MusicMood.SERIOUS
+    if centroid >= 3000:
+        return MusicMood.CONTEMPORARY
+    if bpm >= 100:
+        return MusicMood.PROFESSIONAL
+    return MusicMood.FOCUSED
+
+def _analyze_file(path: str, max_seconds: float) -> Dict:
+    """进程池中执行的分析任务（模块级函数，可被pickle）"""
+    return extract_features(path, max_seconds)
+
+
+class MusicFeatureAnalyzer(MusicInfoLibrary):
+    """
+    音乐库声学特征批量分析: 在进程池中提取BPM、能量、频谱质心和调性，映射为MusicMood
+    结果按文件内容哈希缓存，未变化的文件不会重复分析；写入各类别目录下的music_info.json
+    和MusicManager中的BackgroundMusic（mood、bpm、metadata['features']）
+    """
+    def __init__(self, music_dir: str = "assets/music", cache_path: str = "cache/music_features.json",
+                 max_workers: Optional[int] = None, max_seconds: float = 120.0):
+        self.music_dir = music_dir
+        self.cache_path = cache_path
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_seconds = max_seconds
+        self.logger = logging.getLogger(__name__)
+        self.cache = self._load_cache()
+
+    def _load_cache(self) -> Dict:
+        """缓存结构: files按路径记录大小、修改时间和哈希（避免重复计算哈希），features按哈希记录特征"""
+        empty = {'version': FEATURE_VERSION, 'files': {}, 'features': {}}
+        if not os.path.exists(self.cache_path):
+            return empty
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            self.logger.warning(f"特征缓存损坏，重新分析: {self.cache_path}")
+            return empty
+        if cache.get('version') != FEATURE_VERSION:
+            return dict(empty, files=cache.get('files', {}))
+        return cache
+
+    def save_cache(self):
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+        temp_path = f"{self.cache_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False)
+        os.replace(temp_path, self.cache_path)
+
+    def content_hash(self, path: str) -> str:
+        """文件大小和修改时间未变时沿用记录的哈希"""
+        key = os.path.abspath(path)
+        stat = os.stat(path)
+        entry = self.cache['files'].get(key)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            return entry['sha256']
+        digest = file_hash(path)
+        self.cache['files'][key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest}
+        return digest
+
+    def analyze_files(self, paths: List[str], force: bool = False) -> Dict[str, Dict]:
+        """
+        分析一批文件，返回 {路径: 特征}（分析失败的文件不在结果中）
+        哈希在线程池中计算，特征提取在进程池中并行执行，按CPU核数扩展
+        """
+        paths = list(dict.fromkeys(paths))
+        with ThreadPoolExecutor(max_workers=min(8, self.max_workers * 2)) as executor:
+            hashes = dict(zip(paths, executor.map(self.content_hash, paths)))
+
+        results = {}
+        pending = {}
+        for path, digest in hashes.items():
+            cached = self.cache['features'].get(digest)
+            if cached and not force:
+                results[path] = cached
+            else:
+                # 内容相同的多个文件只分析一次
+                pending.setdefault(digest, []).append(path)
+
+        if pending:
+            self.logger.info(f"分析 {len(pending)} 首曲目（缓存命中 {len(results)} 首），{self.max_workers} 个进程")
+            done = 0
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {
+                    executor.submit(_analyze_file, same_paths[0], self.max_seconds): digest
+                    for digest, same_paths in pending.items()
+                }
+                for future in as_completed(futures):
+                    digest = futures[future]
+                    same_paths = pending[digest]
+                    try:
+                        features = future.result()
+                    except Exception as e:
+                        self.logger.error(f"特征提取失败: {same_paths[0]} ({str(e)})")
+                        continue
+                    features['mood'] = features_to_mood(features).value
+                    features['analyzed_at'] = datetime.now().isoformat()
+                    self.cache['features'][digest] = features
+                    for path in same_paths:
+                        results[path] = features
+                    done += 1
+                    # 定期保存缓存，中断后已完成的部分不必重新分析
+                    if done % 50 == 0:
+                        self.save_cache()
+                        self.logger.info(f"已分析 {done}/{len(pending)} 首")
+
+        self.save_cache()
+        return results
+
+    def _apply(self, category: str, music_list: List[Dict], results: Dict[str, Dict]):
+        for music in music_list:
+            features = results.get(music.get('file_path'))
+            if features:
+                music['features'] = features
+                music['mood'] = features['mood']
+                music['mood_source'] = 'features'
+                music['bpm'] = int(round(features['bpm']))
+        if music_list:
+            self._save_info(category, music_list)
+
+    def analyze_category(self, category: str, force: bool = False) -> List[Dict]:
+        """分析一个类别下的所有曲目，结果写回music_info.json"""
+        return self.analyze_library(force, categories=[category])[category]
+
+    def analyze_library(self, force: bool = False, music_manager=None,
+                        categories: Optional[List[str]] = None) -> Dict[str, List[Dict]]:
+        """
+        分析整个音乐库（或指定类别）并同步到MusicManager
+        所有类别的文件放入同一个进程池，避免每个类别单独启动进程
+        """
+        music_lists = {category: self._collect(category) for category in (categories or self.list_categories())}
+        paths = [
+            music['file_path']
+            for music_list in music_lists.values()
+            for music in music_list
+            if music.get('file_path') and os.path.exists(music['file_path'])
+        ]
+        results = self.analyze_files(paths, force)
+
+        for category, music_list in music_lists.items():
+            self._apply(category, music_list, results)
+            moods = {}
+            for music in music_list:
+                if music.get('mood_source') == 'features':
+                    moods[music['mood']] = moods.get(music['mood'], 0) + 1
+            self.logger.info(f"类别 {category}: 共 {len(music_list)} 首, 情绪分布 {moods}")
+
+        if music_manager is not None:
+            self.update_music_manager(music_manager, results)
+        return music_lists
+
+    def update_music_manager(self, music_manager, results: Dict[str, Dict]):
+        """按文件路径把分析结果写入BackgroundMusic的mood、bpm和metadata['features']"""
+        by_path = {normalize_path(path): features for path, features in results.items()}
+        updated = 0
+        for music in music_manager.music_library.values():
+            features = by_path.get(normalize_path(music.path))
+            if features:
+                music.mood = features['mood']
+                music.bpm = int(round(features['bpm']))
+                music.metadata = dict(music.metadata or {}, features=features, key=features['key'])
+                updated += 1
+        if updated:
+            music_manager._save_config()
+        self.logger.info(f"已更新 {updated} 首背景音乐的情绪标签")
\ No newline at end of file
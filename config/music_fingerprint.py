@@ -0,0 +1,245 @@
+import os
+import json
+import base64
+import logging
+import subprocess
+import numpy as np
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from scipy.ndimage import maximum_filter
+from pydub import AudioSegment
+from exceptions import AudioProbeError
+from config.music_info import normalize_path, AUDIO_EXTENSIONS
+
+# 指纹参数: 8kHz单声道，1024点FFT，帧移32毫秒
+SAMPLE_RATE = 8000
+FFT_SIZE = 1024
+HOP_SIZE = 256
+# 频谱峰值的邻域（频率bin数, 帧数）和每秒最多保留的峰值数
+PEAK_NEIGHBORHOOD = (15, 11)
+PEAKS_PER_SECOND = 12
+# 每个锚点与目标区内最近的FAN_OUT个峰值组成地标，目标区为锚点之后1~63帧
+FAN_OUT = 3
+MAX_DELTA_FRAMES = 63
+# 建库时指纹覆盖的时长；重复检测只需要曲目开头
+INDEX_SECONDS = 60.0
+QUERY_SECONDS = 20.0
+
+def decode_mono(source, max_seconds: float) -> np.ndarray:
+    """
+    用ffmpeg（pydub配置的AudioSegment.converter）解码为8kHz单声道float32
+    source为文件路径或字节串（例如只下载了开头一部分的MP3，ffmpeg会解码到数据结束为止）
+    """
+    from_bytes = isinstance(source, (bytes, bytearray))
+    command = [
+        AudioSegment.converter, '-v', 'error', '-i', 'pipe:0' if from_bytes else source,
+        '-t', str(max_seconds), '-ac', '1', '-ar', str(SAMPLE_RATE), '-f', 'f32le', 'pipe:1'
+    ]
+    try:
+        result = subprocess.run(command, input=source if from_bytes else None, capture_output=True)
+    except OSError as e:
+        raise AudioProbeError(f"无法运行ffmpeg（{AudioSegment.converter}）: {str(e)}")
+    samples = np.frombuffer(result.stdout, dtype=np.float32)
+    if not len(samples):
+        raise AudioProbeError(f"无法解码音频: {result.stderr.decode('utf-8', 'replace').strip()[-200:]}")
+    return samples
+
+def landmarks(samples: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    计算地标指纹: 取对数频谱的局部峰值，锚点与后续峰值两两组成 (f1, f2, Δt) 哈希
+    返回 (哈希数组uint32, 锚点帧号数组uint16)
+    对重新编码、码率变化、音量变化不敏感
+    """
+    if len(samples) < FFT_SIZE:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+
+    frames = 1 + (len(samples) - FFT_SIZE) // HOP_SIZE
+    index = np.arange(FFT_SIZE)[None, :] + HOP_SIZE * np.arange(frames)[:, None]
+    spectrum = np.abs(np.fft.rfft(samples[index] * np.hanning(FFT_SIZE), axis=1)).T
+    log_spectrum = 20 * np.log10(spectrum + 1e-6)
+
+    # 局部最大值且高于整体中位数的点作为峰值
+    local_max = maximum_filter(log_spectrum, size=PEAK_NEIGHBORHOOD) == log_spectrum
+    peaks = local_max & (log_spectrum > np.median(log_spectrum) + 10)
+    freqs, times = np.nonzero(peaks)
+    if not len(times):
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+
+    # 只保留最强的峰值，控制指纹大小
+    limit = max(1, int(PEAKS_PER_SECOND * frames * HOP_SIZE / SAMPLE_RATE))
+    if len(times) > limit:
+        strongest = np.argsort(log_spectrum[freqs, times])[-limit:]
+        freqs, times = freqs[strongest], times[strongest]
+    order = np.lexsort((freqs, times))
+    freqs, times = freqs[order], times[order]
+
+    hashes = []
+    offsets = []
+    for i in range(len(times)):
+        paired = 0
+        for j in range(i + 1, len(times)):
+            delta = times[j] - times[i]
+            if delta == 0:
+                continue
+            if delta > MAX_DELTA_FRAMES or paired >= FAN_OUT:
+                break
+            # 频率bin量化到9位: f1(9) | f2(9) | Δt(6)
+            hashes.append((int(freqs[i]) >> 1) << 15 | (int(freqs[j]) >> 1) << 6 | int(delta))
+            offsets.append(int(times[i]))
+            paired += 1
+    return np.array(hashes, dtype=np.uint32), np.array(offsets, dtype=np.uint16)
+
+def fingerprint(source, max_seconds: float = INDEX_SECONDS) -> Tuple[np.ndarray, np.ndarray]:
+    """解码文件或字节串并计算地标指纹"""
+    return landmarks(decode_mono(source, max_seconds))
+
+
+class FingerprintIndex:
+    """
+    音乐指纹索引: 哈希 -> [(曲目, 锚点帧号)] 的倒排表，查询时按 (曲目, 时间差) 投票
+    同一首歌的不同编码、不同ID，时间差一致的地标会大量命中；不同歌曲只会零星碰撞
+    每首曲目只保存开头INDEX_SECONDS秒的指纹（约每秒36个哈希），索引以紧凑的base64数组存为JSON
+    """
+    def __init__(self, index_path: str = "cache/fingerprints.json",
+                 min_matches: int = 15, min_ratio: float = 0.05):
+        """
+        min_matches: 判定重复所需的最少一致地标数
+        min_ratio: 一致地标数至少占查询地标数的比例
+        """
+        self.index_path = index_path
+        self.min_matches = min_matches
+        self.min_ratio = min_ratio
+        self.logger = logging.getLogger(__name__)
+        self.tracks: Dict[str, Dict] = {}
+        self.inverted: Dict[int, List[Tuple[str, int]]] = {}
+        self.dirty = False
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            self.logger.warning(f"指纹索引损坏，重新建立: {self.index_path}")
+            return
+        for track_id, entry in stored.items():
+            hashes = np.frombuffer(base64.b64decode(entry['hashes']), dtype=np.uint32)
+            offsets = np.frombuffer(base64.b64decode(entry['offsets']), dtype=np.uint16)
+            self._insert(track_id, entry['path'], hashes, offsets)
+
+    def save(self):
+        """原子写入索引文件"""
+        if not self.dirty:
+            return
+        stored = {
+            track_id: {
+                'path': entry['path'],
+                'hashes': base64.b64encode(entry['hashes'].tobytes()).decode('ascii'),
+                'offsets': base64.b64encode(entry['offsets'].tobytes()).decode('ascii')
+            }
+            for track_id, entry in self.tracks.items()
+        }
+        os.makedirs(os.path.dirname(self.index_path) or '.', exist_ok=True)
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(stored, f)
+        os.replace(temp_path, self.index_path)
+        self.dirty = False
+
+    def _insert(self, track_id: str, path: str, hashes: np.ndarray, offsets: np.ndarray):
+        self.tracks[track_id] = {'path': path, 'hashes': hashes, 'offsets': offsets}
+        for value, offset in zip(hashes.tolist(), offsets.tolist()):
+            self.inverted.setdefault(value, []).append((track_id, offset))
+
+    def remove(self, track_id: str):
+        """从索引中删除曲目"""
+        entry = self.tracks.pop(track_id, None)
+        if not entry:
+            return
+        for value in set(entry['hashes'].tolist()):
+            postings = [item for item in self.inverted.get(value, []) if item[0] != track_id]
+            if postings:
+                self.inverted[value] = postings
+            else:
+                self.inverted.pop(value, None)
+        self.dirty = True
+
+    def add(self, track_id: str, path: str, hashes: Optional[np.ndarray] = None,
+            offsets: Optional[np.ndarray] = None):
+        """把曲目加入索引；未提供指纹时从文件计算"""
+        if hashes is None:
+            hashes, offsets = fingerprint(path)
+        self.remove(track_id)
+        self._insert(track_id, normalize_path(path), hashes, offsets)
+        self.dirty = True
+
+    def match(self, hashes: np.ndarray, offsets: np.ndarray) -> Optional[Dict]:
+        """
+        查询指纹，返回最可能的重复曲目 {'track_id', 'path', 'matches', 'ratio', 'offset_seconds'}，没有则返回None
+        offset_seconds为查询音频相对已入库曲目的起点偏移（例如片头多了几秒静音）
+        """
+        if not len(hashes):
+            return None
+        votes = Counter()
+        for value, offset in zip(hashes.tolist(), offsets.tolist()):
+            for track_id, track_offset in self.inverted.get(value, ()):
+                votes[(track_id, track_offset - offset)] += 1
+        if not votes:
+            return None
+
+        (track_id, delta), count = votes.most_common(1)[0]
+        ratio = count / len(hashes)
+        if count < self.min_matches or ratio < self.min_ratio:
+            return None
+        return {
+            'track_id': track_id,
+            'path': self.tracks[track_id]['path'],
+            'matches': count,
+            'ratio': round(ratio, 3),
+            'offset_seconds': round(delta * HOP_SIZE / SAMPLE_RATE, 2)
+        }
+
+    def find_duplicate(self, source, max_seconds: float = QUERY_SECONDS) -> Optional[Dict]:
+        """检查文件或（部分下载的）字节串是否与已入库的曲目重复"""
+        return self.match(*fingerprint(source, max_seconds))
+
+    def index_library(self, music_dir: str = "assets/music") -> List[Tuple[str, str]]:
+        """
+        为音乐库中尚未入库的文件建立指纹，返回发现的重复 [(新文件, 已有文件)]
+        track_id 为 "类别/文件名"（不含扩展名）
+        """
+        duplicates = []
+        known_paths = {entry['path'] for entry in self.tracks.values()}
+        for root, _, files in os.walk(music_dir):
+            for file in sorted(files):
+                if not file.lower().endswith(AUDIO_EXTENSIONS):
+                    continue
+                path = normalize_path(os.path.join(root, file))
+                if path in known_paths:
+                    continue
+                try:
+                    hashes, offsets = fingerprint(path)
+                except AudioProbeError as e:
+                    self.logger.warning(f"无法计算指纹: {path} ({str(e)})")
+                    continue
+                duplicate = self.match(hashes, offsets)
+                if duplicate:
+                    duplicates.append((path, duplicate['path']))
+                    self.logger.info(f"发现重复音乐: {path} 与 {duplicate['path']} ({duplicate['matches']} 个地标一致)")
+                track_id = f"{os.path.basename(root)}/{os.path.splitext(file)[0]}"
+                self.add(track_id, path, hashes, offsets)
+        self.save()
+        return duplicates
+
+
+_default_index = None
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """全局指纹索引实例，索引路径来自配置"""
+    global _default_index
+    if _default_index is None:
+        from config import Config
+        _default_index = FingerprintIndex(Config().fingerprint_index_path)
+    return _default_index
\ No newline at end of file
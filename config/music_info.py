@@ -0,0 +1,59 @@
+import os
+import json
+from typing import Dict, List
+
+AUDIO_EXTENSIONS = ('.mp3', '.wav', '.ogg')
+
+def normalize_path(path: str) -> str:
+    """统一路径分隔符（music_info.json中可能保存了Windows路径）"""
+    return os.path.normpath(path.replace('\\', '/'))
+
+
+class MusicInfoLibrary:
+    """
+    音乐库各类别目录下music_info.json的读写，响度和声学特征分析器共用
+    子类需要设置self.music_dir
+    """
+    music_dir: str
+
+    def _info_file(self, category: str) -> str:
+        return os.path.join(self.music_dir, category, 'music_info.json')
+
+    def _load_info(self, category: str) -> List[Dict]:
+        info_file = self._info_file(category)
+        if not os.path.exists(info_file):
+            return []
+        with open(info_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _save_info(self, category: str, music_list: List[Dict]):
+        info_file = self._info_file(category)
+        temp_file = f"{info_file}.tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(music_list, f, ensure_ascii=False, indent=2)
+        os.replace(temp_file, info_file)
+
+    def list_categories(self) -> List[str]:
+        """音乐库中的类别目录"""
+        if not os.path.isdir(self.music_dir):
+            return []
+        return sorted(
+            name for name in os.listdir(self.music_dir)
+            if os.path.isdir(os.path.join(self.music_dir, name))
+        )
+
+    def _collect(self, category: str) -> List[Dict]:
+        """读取类别的music_info.json，目录中有文件但没有记录的曲目补上基本信息"""
+        category_dir = os.path.join(self.music_dir, category)
+        music_list = self._load_info(category)
+        known = set()
+        for music in music_list:
+            if music.get('file_path'):
+                music['file_path'] = normalize_path(music['file_path'])
+                known.add(music['file_path'])
+        for file in sorted(os.listdir(category_dir)):
+            path = normalize_path(os.path.join(category_dir, file))
+            if file.lower().endswith(AUDIO_EXTENSIONS) and path not in known:
+                name = os.path.splitext(file)[0]
+                music_list.append({'id': name, 'title': name, 'category': category, 'file_path': path})
+        return music_list
\ No newline at end of file
@@ -0,0 +1,147 @@
+import os
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from audio_qc import AudioQCAnalyzer, to_db
+from block_renderer import read_file_blocks
+from config.music_info import MusicInfoLibrary, normalize_path
+
+def bed_gain_db(loudness: Dict, target_lufs: float, max_peak_dbtp: float = -1.0,
+                min_gain: float = -40.0, max_gain: float = 12.0) -> float:
+    """
+    根据预先测量的响度计算把背景音乐调整到target_lufs所需的增益（dB）
+    提升增益时不让真峰值超过max_peak_dbtp
+    """
+    lufs = loudness.get('integrated_lufs')
+    if lufs is None:
+        return min_gain
+    gain = target_lufs - lufs
+    peak = loudness.get('true_peak_dbtp')
+    if peak is not None:
+        gain = min(gain, max_peak_dbtp - peak)
+    return round(min(max(gain, min_gain), max_gain), 2)
+
+
+class MusicLoudnessAnalyzer(MusicInfoLibrary):
+    """
+    音乐库响度预测量: 每首曲目只测量一次综合响度和峰值
+    结果写入各类别目录下的music_info.json和MusicManager中BackgroundMusic.metadata['loudness']，
+    混音时直接按预先测量的结果计算增益，单集渲染中不再做响度分析
+    """
+    def __init__(self, music_dir: str = "assets/music", target_lufs: float = -34.0, max_workers: int = 4):
+        self.music_dir = music_dir
+        self.target_lufs = target_lufs
+        self.max_workers = max_workers
+        self.logger = logging.getLogger(__name__)
+
+    def measure(self, path: str) -> Dict:
+        """流式解码并测量一首曲目的综合响度、真峰值和采样峰值"""
+        frame_rate, channels, blocks = read_file_blocks(path)
+        analyzer = AudioQCAnalyzer(frame_rate, channels)
+        for block in blocks:
+            analyzer.process_block(block)
+
+        lufs = analyzer.integrated_loudness()
+        stat = os.stat(path)
+        loudness = {
+            "integrated_lufs": round(lufs, 2) if lufs != float('-inf') else None,
+            "true_peak_dbtp": to_db(analyzer.true_peak),
+            "sample_peak_dbfs": to_db(analyzer.sample_peak),
+            "duration": round(analyzer.total_frames / frame_rate, 3),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "measured_at": datetime.now().isoformat()
+        }
+        loudness["bed_gain_db"] = bed_gain_db(loudness, self.target_lufs)
+        return loudness
+
+    def _is_current(self, loudness: Optional[Dict], path: str) -> bool:
+        """文件未变化时沿用已有的测量结果"""
+        if not loudness:
+            return False
+        stat = os.stat(path)
+        return loudness.get("size") == stat.st_size and loudness.get("mtime") == stat.st_mtime
+
+    def analyze_category(self, category: str, force: bool = False) -> List[Dict]:
+        """
+        测量一个类别下的所有曲目，结果写回music_info.json
+        目录中有文件但music_info.json没有记录的曲目会补上基本信息
+        """
+        music_list = self._collect(category)
+
+        pending = [
+            music for music in music_list
+            if music.get('file_path') and os.path.exists(music['file_path'])
+            and (force or not self._is_current(music.get('loudness'), music['file_path']))
+        ]
+
+        def measure(music):
+            try:
+                return music, self.measure(music['file_path'])
+            except Exception as e:
+                self.logger.error(f"响度测量失败: {music['file_path']} ({str(e)})")
+                return music, None
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for music, loudness in executor.map(measure, pending):
+                if loudness:
+                    music['loudness'] = loudness
+                    self.logger.info(
+                        f"{music['file_path']}: {loudness['integrated_lufs']} LUFS, "
+                        f"真峰值 {loudness['true_peak_dbtp']} dBTP, 增益 {loudness['bed_gain_db']} dB"
+                    )
+
+        if music_list:
+            self._save_info(category, music_list)
+        self.logger.info(f"类别 {category}: 测量 {len(pending)} 首，共 {len(music_list)} 首")
+        return music_list
+
+    def analyze_library(self, force: bool = False, music_manager=None) -> Dict[str, List[Dict]]:
+        """测量整个音乐库，并同步到MusicManager的metadata"""
+        results = {
+            category: self.analyze_category(category, force)
+            for category in self.list_categories()
+        }
+        if music_manager is not None:
+            self.update_music_manager(music_manager, results)
+        return results
+
+    def update_music_manager(self, music_manager, results: Dict[str, List[Dict]]):
+        """按文件路径把测量结果写入BackgroundMusic.metadata['loudness']"""
+        by_path = {
+            music['file_path']: music['loudness']
+            for music_list in results.values()
+            for music in music_list
+            if music.get('loudness')
+        }
+        updated = 0
+        for music in music_manager.music_library.values():
+            loudness = by_path.get(normalize_path(music.path))
+            if loudness:
+                music.metadata = dict(music.metadata or {}, loudness=loudness)
+                updated += 1
+        if updated:
+            music_manager._save_config()
+        self.logger.info(f"已更新 {updated} 首背景音乐的响度信息")
+
+
+def load_loudness_index(music_dir: str = "assets/music") -> Dict[str, Dict]:
+    """读取音乐库中所有music_info.json的响度测量结果，返回 {文件路径: 响度信息}"""
+    index = {}
+    if not os.path.isdir(music_dir):
+        return index
+    for category in os.listdir(music_dir):
+        info_file = os.path.join(music_dir, category, 'music_info.json')
+        if not os.path.exists(info_file):
+            continue
+        try:
+            with open(info_file, 'r', encoding='utf-8') as f:
+                music_list = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for music in music_list:
+            if music.get('file_path') and music.get('loudness'):
+                index[normalize_path(music['file_path'])] = music['loudness']
+    return index
\ No newline at end of file
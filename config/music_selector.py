@@ -0,0 +1,149 @@
+import os
+import json
+import bisect
+import random
+import logging
+from datetime import datetime
+from typing import Dict, List
+from audio_probe import get_probe
+from config.music_info import normalize_path, AUDIO_EXTENSIONS
+
+class MusicSelector:
+    """
+    按时长选择背景音乐
+
+    每个类别维护一份按时长排序的索引，优先选择刚好覆盖所需时长的最短曲目；
+    没有单曲能覆盖时，用多首曲目交叉淡化拼接，尽量减少循环和多余的解码。
+    最近N集用过的曲目会被跳过（候选不足时放宽）。
+    """
+    def __init__(self, music_dir: str = "assets/music", history_path: str = "data/music_history.json",
+                 avoid_recent: int = 5, crossfade_ms: int = 3000, fallback_dir: str = "assets"):
+        self.music_dir = music_dir
+        self.history_path = history_path
+        self.avoid_recent = avoid_recent
+        self.crossfade_ms = crossfade_ms
+        self.fallback_dir = fallback_dir
+        self.logger = logging.getLogger(__name__)
+        self.indexes: Dict[str, List] = {}
+
+    def _load_tracks(self, category: str) -> List[Dict]:
+        """读取类别下的曲目信息，music_info.json没有时长的曲目读取文件头补全"""
+        category_dir = os.path.join(self.music_dir, category)
+        tracks = []
+        info_file = os.path.join(category_dir, 'music_info.json')
+        if os.path.exists(info_file):
+            with open(info_file, 'r', encoding='utf-8') as f:
+                for music in json.load(f):
+                    if music.get('file_path'):
+                        tracks.append(dict(music, file_path=normalize_path(music['file_path'])))
+
+        # 没有music_info.json时直接使用类别目录下的文件，类别目录也为空时使用assets目录下的音乐文件
+        for directory in (category_dir, self.fallback_dir):
+            if tracks:
+                break
+            if os.path.isdir(directory):
+                tracks = [
+                    {'id': os.path.splitext(file)[0], 'file_path': normalize_path(os.path.join(directory, file))}
+                    for file in sorted(os.listdir(directory))
+                    if file.lower().endswith(AUDIO_EXTENSIONS)
+                ]
+
+        probe = get_probe()
+        available = []
+        for track in tracks:
+            if not os.path.exists(track['file_path']):
+                continue
+            duration = (track.get('loudness') or {}).get('duration')
+            if not duration:
+                try:
+                    duration = probe.probe(track['file_path'], save=False)['duration']
+                except Exception as e:
+                    self.logger.warning(f"无法读取背景音乐时长: {track['file_path']} ({str(e)})")
+                    continue
+            track['duration'] = float(duration)
+            available.append(track)
+        probe.save()
+        return available
+
+    def get_index(self, category: str) -> List:
+        """类别的时长索引: 按时长升序排列的 (时长, 曲目信息) 列表"""
+        if category not in self.indexes:
+            tracks = self._load_tracks(category)
+            self.indexes[category] = sorted(((track['duration'], track) for track in tracks), key=lambda item: item[0])
+        return self.indexes[category]
+
+    def _load_history(self) -> List[Dict]:
+        if not os.path.exists(self.history_path):
+            return []
+        try:
+            with open(self.history_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return []
+
+    def recent_tracks(self) -> set:
+        """最近avoid_recent集用过的曲目路径"""
+        if self.avoid_recent <= 0:
+            return set()
+        return {
+            path
+            for entry in self._load_history()[-self.avoid_recent:]
+            for path in entry.get('tracks', [])
+        }
+
+    def record(self, episode: str, tracks: List[Dict]):
+        """记录本集使用的曲目，只保留最近的记录"""
+        history = self._load_history()
+        history.append({
+            'episode': episode,
+            'tracks': [track['file_path'] for track in tracks],
+            'used_at': datetime.now().isoformat()
+        })
+        history = history[-max(self.avoid_recent * 4, 20):]
+        os.makedirs(os.path.dirname(self.history_path) or '.', exist_ok=True)
+        temp_path = f"{self.history_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(history, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.history_path)
+
+    def select(self, category: str, needed_seconds: float) -> List[Dict]:
+        """
+        选择覆盖needed_seconds的曲目序列
+        返回: 曲目信息列表（按播放顺序），每首之间按crossfade_ms交叉淡化；音乐库为空时返回空列表
+        """
+        index = self.get_index(category)
+        if not index:
+            return []
+
+        recent = self.recent_tracks()
+        candidates = [item for item in index if item[1]['file_path'] not in recent]
+        if not candidates:
+            self.logger.info("可选背景音乐都在最近使用过，放宽限制")
+            candidates = index
+        durations = [duration for duration, _ in candidates]
+
+        # 单曲覆盖: 时长不短于需要的最短曲目，浪费最少；浪费相近（15%以内）的几首中随机挑选以保持变化
+        position = bisect.bisect_left(durations, needed_seconds)
+        if position < len(candidates):
+            limit = durations[position] + max(needed_seconds * 0.15, 1.0)
+            end = bisect.bisect_right(durations, limit, lo=position)
+            return [random.choice(candidates[position:end])[1]]
+
+        # 多首拼接: 从最长的开始取，剩余时长能被某一首覆盖时取刚好覆盖的最短曲目
+        crossfade = self.crossfade_ms / 1000
+        remaining = list(candidates)
+        sequence = []
+        covered = 0.0
+        while remaining and covered < needed_seconds:
+            missing = needed_seconds - covered + (crossfade if sequence else 0.0)
+            remaining_durations = [duration for duration, _ in remaining]
+            position = bisect.bisect_left(remaining_durations, missing)
+            if position >= len(remaining):
+                position = len(remaining) - 1
+            duration, track = remaining.pop(position)
+            covered += duration - (crossfade if sequence else 0.0)
+            sequence.append(track)
+
+        if covered < needed_seconds:
+            self.logger.info(f"音乐库总时长不足 {needed_seconds:.0f} 秒，将循环播放所选曲目")
+        return sequence
\ No newline at end of file
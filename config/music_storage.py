@@ -5,6 +5,8 @@ from datetime import datetime
 import hashlib
 import logging
 from pathlib import Path
+from audio_probe import get_probe
+from config.music_fingerprint import get_fingerprint_index, fingerprint
 
 class MusicStorage:
     """音乐存储管理器"""
@@ -38,12 +40,30 @@ class MusicStorage:
         return os.path.splitext(file_path)[1].lower()
     
     def upload_music(self, source_path: str, category: str, music_id: str) -> Optional[str]:
-        """上传音乐文件"""
+        """
+        上传音乐文件
+        先按音频指纹检查是否与音乐库中已有的曲目重复（不同编码、不同ID的同一首歌），重复时不再保存，直接返回已有文件路径
+        """
         try:
             # 验证文件格式
             if self._get_file_extension(source_path) not in ['.mp3', '.wav', '.ogg']:
                 raise ValueError("不支持的音乐文件格式")
             
+            # 指纹查重；无法解码时跳过查重，照常保存
+            fingerprints = get_fingerprint_index()
+            try:
+                hashes, offsets = fingerprint(source_path)
+            except Exception as e:
+                self.logger.warning(f"无法计算音频指纹，跳过查重: {source_path} ({str(e)})")
+                hashes = offsets = None
+            duplicate = fingerprints.match(hashes, offsets) if hashes is not None else None
+            if duplicate and os.path.exists(duplicate['path']):
+                self.logger.info(
+                    f"音乐与已有文件重复，跳过保存: {source_path} -> {duplicate['path']} "
+                    f"({duplicate['matches']} 个地标一致)"
+                )
+                return duplicate['path']
+            
             # 创建目标目录
             target_dir = os.path.join(self.base_dir, category)
             os.makedirs(target_dir, exist_ok=True)
@@ -61,6 +81,11 @@ class MusicStorage:
             backup_path = os.path.join(self.backup_dir, f"{file_hash}{self._get_file_extension(source_path)}")
             shutil.copy2(target_path, backup_path)
             
+            # 加入指纹索引
+            if hashes is not None:
+                fingerprints.add(f"{category}/{music_id}", target_path, hashes, offsets)
+                fingerprints.save()
+            
             self.logger.info(f"音乐文件上传成功: {target_path}")
             return target_path
             
@@ -113,16 +138,34 @@ class MusicStorage:
         except Exception as e:
             self.logger.error(f"清理临时文件失败: {str(e)}")
     
+    def scan_library(self) -> dict:
+        """扫描音乐库，读取文件头得到每个文件的时长、码率等信息（结果有缓存，不需要解码）"""
+        paths = [
+            os.path.join(root, file)
+            for root, _, files in os.walk(self.base_dir)
+            for file in files
+            if self._get_file_extension(file) in ['.mp3', '.wav', '.ogg']
+        ]
+        results = get_probe().probe_many(paths)
+        self.logger.info(f"音乐库扫描完成: {len(results)}/{len(paths)} 个文件")
+        return results
+    
     def get_file_info(self, file_path: str) -> dict:
         """获取文件信息"""
         try:
             stat = os.stat(file_path)
-            return {
+            info = {
                 "size": stat.st_size,
                 "created_at": datetime.fromtimestamp(stat.st_ctime).isoformat(),
                 "modified_at": datetime.fromtimestamp(stat.st_mtime).isoformat(),
                 "hash": self._generate_file_hash(file_path)
             }
+            try:
+                probe = get_probe().probe(file_path)
+                info.update({key: probe[key] for key in ("duration", "bitrate", "sample_rate", "channels")})
+            except Exception as e:
+                self.logger.warning(f"读取音频头信息失败: {str(e)}")
+            return info
         except Exception as e:
             self.logger.error(f"获取文件信息失败: {str(e)}")
             return {}
\ No newline at end of file
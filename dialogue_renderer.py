@@ -0,0 +1,157 @@
+import re
+import numpy as np
+from pydub import AudioSegment
+from logger import logger
+from subtitles import strip_stage_directions
+
+# 匹配 "主持人：……"、"**嘉宾**: ……"、"【主持人】：……" 等说话人前缀
+SPEAKER_PATTERN = re.compile(r'^\s*[\*【\[]*\s*([^\s\*【】\[\]：:]{1,12})\s*[\*】\]]*\s*[：:]\s*(.*)$')
+
+class DialogueRenderer:
+    """多说话人对话渲染器"""
+
+    def __init__(self, synthesizer, voices, gap_ms=250, overlap_ms=0, pan=0.3, trim_func=None):
+        """
+        synthesizer: SpeechSynthesizer 实例
+        voices: 说话人声音配置列表，按说话人出场顺序分配
+        gap_ms: 同一说话人连续两段之间的间隔
+        overlap_ms: 换人时与上一段的重叠时长（模拟抢话），0表示不重叠
+        pan: 立体声声像宽度（0-1），第一位说话人偏左，第二位偏右
+        trim_func: 可选的静音裁剪函数，签名为 f(AudioSegment) -> (AudioSegment, 移除秒数)
+        """
+        self.synthesizer = synthesizer
+        self.voices = voices
+        self.gap_ms = gap_ms
+        self.overlap_ms = overlap_ms
+        self.pan = pan
+        self.trim_func = trim_func
+
+    @staticmethod
+    def parse_turns(script):
+        """
+        解析对话脚本中的说话人轮次
+        返回: [(说话人, 文本), ...]，没有说话人前缀的行并入上一轮
+        """
+        turns = []
+        for line in script.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+
+            match = SPEAKER_PATTERN.match(line)
+            if match:
+                speaker, text = match.group(1), match.group(2)
+                turns.append([speaker, text])
+            elif turns:
+                turns[-1][1] += line
+
+        result = []
+        for speaker, text in turns:
+            text = strip_stage_directions(text).strip()
+            if text:
+                result.append((speaker, text))
+        return result
+
+    @staticmethod
+    def is_dialogue(turns):
+        """至少两位说话人才按对话渲染"""
+        return len({speaker for speaker, _ in turns}) >= 2
+
+    def _pan_gains(self, index, speaker_count):
+        """等功率声像，返回 (左声道增益, 右声道增益)"""
+        if speaker_count < 2:
+            position = 0.0
+        else:
+            position = self.pan * (2 * index / (speaker_count - 1) - 1)
+        angle = (position + 1) * np.pi / 4
+        return np.cos(angle), np.sin(angle)
+
+    def iter_render(self, turns):
+        """
+        按顺序逐轮产出已声像处理的立体声片段，供渐进式渲染使用（不支持重叠）
+        产出: (说话人, 文本, 立体声AudioSegment, 裁剪掉的静音秒数)
+        """
+        speakers = list(dict.fromkeys(speaker for speaker, _ in turns))
+        speaker_voice = {
+            speaker: self.voices[i % len(self.voices)]
+            for i, speaker in enumerate(speakers)
+        }
+
+        segments = self.synthesizer.iter_synthesize(
+            (text, speaker_voice[speaker]) for speaker, text in turns
+        )
+        for (speaker, text), segment in zip(turns, segments):
+            removed = 0.0
+            if self.trim_func:
+                segment, removed = self.trim_func(segment)
+            left, right = self._pan_gains(speakers.index(speaker), len(speakers))
+            mono = segment.set_channels(1)
+            stereo = AudioSegment.from_mono_audiosegments(
+                mono.apply_gain(20 * np.log10(max(left, 1e-6))),
+                mono.apply_gain(20 * np.log10(max(right, 1e-6)))
+            )
+            yield speaker, text, stereo, removed
+
+    def render(self, turns):
+        """
+        并行合成所有轮次并排布到时间轴上
+        返回: (立体声AudioSegment, [{'speaker', 'text', 'start', 'end'}, ...], 裁剪掉的静音秒数)
+        时间轴单位为毫秒
+        """
+        speakers = list(dict.fromkeys(speaker for speaker, _ in turns))
+        speaker_voice = {
+            speaker: self.voices[i % len(self.voices)]
+            for i, speaker in enumerate(speakers)
+        }
+
+        segments = self.synthesizer.synthesize_many(
+            (text, speaker_voice[speaker]) for speaker, text in turns
+        )
+
+        frame_rate = segments[0].frame_rate
+        arrays = []
+        removed = 0.0
+        for segment in segments:
+            if self.trim_func:
+                segment, segment_removed = self.trim_func(segment)
+                removed += segment_removed
+            segment = segment.set_frame_rate(frame_rate).set_channels(1)
+            samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+            arrays.append(samples / float(1 << (8 * segment.sample_width - 1)))
+
+        # 先计算每一轮在时间轴上的位置，再一次性分配输出缓冲区
+        gap = int(frame_rate * self.gap_ms / 1000)
+        overlap = int(frame_rate * self.overlap_ms / 1000)
+        offsets = []
+        cursor = 0
+        previous_speaker = None
+        for (speaker, _), samples in zip(turns, arrays):
+            if previous_speaker is None:
+                start = 0
+            elif speaker != previous_speaker and overlap > 0:
+                start = max(0, cursor - overlap)
+            else:
+                start = cursor + gap
+            offsets.append(start)
+            cursor = start + len(samples)
+            previous_speaker = speaker
+
+        total = max(offset + len(samples) for offset, samples in zip(offsets, arrays))
+        mixed = np.zeros((total, 2), dtype=np.float32)
+        timeline = []
+        for (speaker, text), offset, samples in zip(turns, offsets, arrays):
+            left, right = self._pan_gains(speakers.index(speaker), len(speakers))
+            mixed[offset:offset + len(samples), 0] += samples * left
+            mixed[offset:offset + len(samples), 1] += samples * right
+            timeline.append({
+                'speaker': speaker,
+                'text': text,
+                'start': offset * 1000 / frame_rate,
+                'end': (offset + len(samples)) * 1000 / frame_rate
+            })
+
+        pcm = np.clip(mixed * 32768, -32768, 32767).astype(np.int16)
+        audio = AudioSegment(data=pcm.tobytes(), sample_width=2, frame_rate=frame_rate, channels=2)
+
+        logger.info(f"对话渲染完成: {len(turns)} 轮, {len(speakers)} 位说话人, 时长 {len(audio) / 1000:.2f}秒")
+        return audio, timeline, removed
@@ -0,0 +1,278 @@
+import os
+import hashlib
+import sqlite3
+from datetime import datetime
+from slugify import slugify
+
+def file_sha256(path, chunk_size=1024 * 1024):
+    """流式计算文件的SHA-256，每次只读取一个块"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(chunk_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class EpisodeCatalog:
+    """
+    节目目录（SQLite）
+    每个节目(show)每一季(season)有独立的计数器，集号在单个事务中递增分配，
+    多个进程或worker同时发布也不会拿到相同的集号。
+    同一内容（按标题和脚本的哈希）重复登记时返回已有的集，不会占用新集号。
+    另外记录每集的音频版本和各平台的节目ID，按slug、话题和日期建立索引。
+    各平台上传过的音频按内容哈希记录，相同的音频不再重复上传。
+    """
+
+    def __init__(self, db_path="data/episodes.db"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS episode_counters (
+                show TEXT NOT NULL,
+                season INTEGER NOT NULL,
+                last_episode INTEGER NOT NULL,
+                PRIMARY KEY (show, season)
+            );
+            CREATE TABLE IF NOT EXISTS episodes (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                show TEXT NOT NULL,
+                season INTEGER NOT NULL,
+                episode INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                slug TEXT NOT NULL,
+                topic TEXT,
+                style TEXT,
+                content_hash TEXT NOT NULL,
+                date TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                UNIQUE (show, season, episode),
+                UNIQUE (show, content_hash)
+            );
+            CREATE TABLE IF NOT EXISTS episode_renditions (
+                episode_id INTEGER NOT NULL REFERENCES episodes (id) ON DELETE CASCADE,
+                path TEXT NOT NULL,
+                format TEXT,
+                bitrate INTEGER,
+                duration REAL,
+                size INTEGER,
+                sha256 TEXT,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (episode_id, path)
+            );
+            CREATE TABLE IF NOT EXISTS episode_platforms (
+                episode_id INTEGER NOT NULL REFERENCES episodes (id) ON DELETE CASCADE,
+                platform TEXT NOT NULL,
+                platform_episode_id TEXT,
+                url TEXT,
+                published_at TEXT NOT NULL,
+                PRIMARY KEY (episode_id, platform)
+            );
+            CREATE TABLE IF NOT EXISTS platform_uploads (
+                platform TEXT NOT NULL,
+                audio_sha256 TEXT NOT NULL,
+                episode_id INTEGER NOT NULL REFERENCES episodes (id) ON DELETE CASCADE,
+                platform_episode_id TEXT,
+                url TEXT,
+                title TEXT,
+                description TEXT,
+                uploaded_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (platform, audio_sha256)
+            );
+            CREATE INDEX IF NOT EXISTS idx_platform_uploads_audio ON platform_uploads (audio_sha256);
+            CREATE INDEX IF NOT EXISTS idx_episodes_slug ON episodes (slug);
+            CREATE INDEX IF NOT EXISTS idx_episodes_topic ON episodes (topic);
+            CREATE INDEX IF NOT EXISTS idx_episodes_date ON episodes (date);
+        """)
+        # 旧版本的目录没有音频哈希列
+        columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(episode_renditions)")}
+        if 'sha256' not in columns:
+            self.connection.execute("ALTER TABLE episode_renditions ADD COLUMN sha256 TEXT")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_episode_renditions_sha256 ON episode_renditions (sha256)")
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def content_hash(content):
+        """内容哈希: 标题和脚本去掉首尾空白后的SHA-256"""
+        digest = hashlib.sha256()
+        digest.update(content.get('title', '').strip().encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(content.get('script', '').strip().encode('utf-8'))
+        return digest.hexdigest()
+
+    def _transaction(self, callback):
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = callback()
+            self.connection.execute("COMMIT")
+            return result
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+    def register(self, content, show="zaka", season=1):
+        """
+        登记一集并分配集号，返回该集的记录
+        同一内容已登记过时直接返回原记录（重试发布时集号不变）
+        """
+        content_hash = self.content_hash(content)
+
+        def register():
+            existing = self.connection.execute(
+                "SELECT * FROM episodes WHERE show = ? AND content_hash = ?", (show, content_hash)
+            ).fetchone()
+            if existing:
+                return existing['id']
+            # 计数器的递增和集的插入在同一个事务中，失败时集号不会被跳过
+            episode = self.connection.execute(
+                """
+                INSERT INTO episode_counters (show, season, last_episode) VALUES (?, ?, 1)
+                ON CONFLICT (show, season) DO UPDATE SET last_episode = last_episode + 1
+                RETURNING last_episode
+                """,
+                (show, season)
+            ).fetchone()[0]
+            now = datetime.now()
+            return self.connection.execute(
+                """
+                INSERT INTO episodes (show, season, episode, title, slug, topic, style, content_hash, date, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (show, season, episode, content['title'], slugify(content['title']),
+                 content.get('topic'), content.get('style'), content_hash,
+                 now.strftime("%Y-%m-%d"), now.isoformat())
+            ).lastrowid
+
+        return self.get(self._transaction(register))
+
+    def add_rendition(self, episode_id, audio_info):
+        """记录一集的一个音频版本（同一路径重复记录时更新）"""
+        path = os.path.abspath(audio_info['path'])
+        self.connection.execute(
+            """
+            INSERT INTO episode_renditions (episode_id, path, format, bitrate, duration, size, sha256, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (episode_id, path) DO UPDATE SET
+                format = excluded.format, bitrate = excluded.bitrate,
+                duration = excluded.duration, size = excluded.size, sha256 = excluded.sha256
+            """,
+            (episode_id, path, os.path.splitext(path)[1].lstrip('.').lower() or None,
+             audio_info.get('bitrate'), audio_info.get('duration'),
+             os.path.getsize(path) if os.path.exists(path) else None,
+             audio_info.get('sha256'), datetime.now().isoformat())
+        )
+
+    def record_platform(self, episode_id, platform, result):
+        """记录某一集在平台上的节目ID和链接"""
+        self.connection.execute(
+            """
+            INSERT INTO episode_platforms (episode_id, platform, platform_episode_id, url, published_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (episode_id, platform) DO UPDATE SET
+                platform_episode_id = excluded.platform_episode_id, url = excluded.url,
+                published_at = excluded.published_at
+            """,
+            (episode_id, platform, result.get('episode_id'), result.get('episode_url'),
+             result.get('publish_date') or datetime.now().isoformat())
+        )
+
+    def record_upload(self, episode_id, platform, audio_sha256, result, content):
+        """记录音频已上传到平台，以及平台上当前的标题和简介"""
+        now = datetime.now().isoformat()
+        self.connection.execute(
+            """
+            INSERT INTO platform_uploads
+                (platform, audio_sha256, episode_id, platform_episode_id, url, title, description, uploaded_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (platform, audio_sha256) DO UPDATE SET
+                platform_episode_id = excluded.platform_episode_id, url = excluded.url,
+                title = excluded.title, description = excluded.description, updated_at = excluded.updated_at
+            """,
+            (platform, audio_sha256, episode_id, result.get('episode_id'), result.get('episode_url'),
+             content.get('title'), content.get('description'), now, now)
+        )
+
+    def uploads_for_audio(self, audio_sha256):
+        """该音频已上传过的平台 {平台: 上传记录}"""
+        return {
+            row['platform']: dict(row) for row in self.connection.execute(
+                "SELECT * FROM platform_uploads WHERE audio_sha256 = ?", (audio_sha256,)
+            )
+        }
+
+    def episode_for_audio(self, audio_sha256):
+        """按音频哈希查找所属的集，没有时返回None"""
+        row = self.connection.execute(
+            """
+            SELECT episode_id FROM platform_uploads WHERE audio_sha256 = ?
+            UNION ALL
+            SELECT episode_id FROM episode_renditions WHERE sha256 = ?
+            LIMIT 1
+            """,
+            (audio_sha256, audio_sha256)
+        ).fetchone()
+        return self.get(row['episode_id']) if row else None
+
+    def update_content(self, episode_id, content):
+        """只更新了标题或简介时同步目录中的标题、slug和内容哈希（与其他集冲突时保留原哈希）"""
+        self.connection.execute(
+            "UPDATE episodes SET title = ?, slug = ? WHERE id = ?",
+            (content['title'], slugify(content['title']), episode_id)
+        )
+        self.connection.execute(
+            "UPDATE OR IGNORE episodes SET content_hash = ? WHERE id = ?",
+            (self.content_hash(content), episode_id)
+        )
+
+    def _episode(self, row):
+        if row is None:
+            return None
+        episode = dict(row)
+        episode['renditions'] = [
+            dict(rendition) for rendition in self.connection.execute(
+                "SELECT path, format, bitrate, duration, size, created_at FROM episode_renditions WHERE episode_id = ?",
+                (row['id'],)
+            )
+        ]
+        episode['platforms'] = {
+            platform['platform']: dict(platform) for platform in self.connection.execute(
+                "SELECT platform, platform_episode_id, url, published_at FROM episode_platforms WHERE episode_id = ?",
+                (row['id'],)
+            )
+        }
+        return episode
+
+    def _episodes(self, where, params, limit):
+        rows = self.connection.execute(
+            f"SELECT * FROM episodes WHERE {where} ORDER BY date DESC, id DESC LIMIT ?", list(params) + [limit]
+        ).fetchall()
+        return [self._episode(row) for row in rows]
+
+    def get(self, episode_id):
+        return self._episode(self.connection.execute("SELECT * FROM episodes WHERE id = ?", (episode_id,)).fetchone())
+
+    def find_by_content(self, content, show="zaka"):
+        """按内容哈希查找，没有登记时返回None"""
+        return self._episode(self.connection.execute(
+            "SELECT * FROM episodes WHERE show = ? AND content_hash = ?", (show, self.content_hash(content))
+        ).fetchone())
+
+    def find_by_slug(self, slug, limit=20):
+        return self._episodes("slug = ?", (slug,), limit)
+
+    def find_by_topic(self, topic, limit=20):
+        return self._episodes("topic = ?", (topic,), limit)
+
+    def find_by_date(self, date_from=None, date_to=None, limit=100):
+        """按日期范围查找，日期格式 'YYYY-MM-DD'（含）"""
+        return self._episodes("date >= ? AND date <= ?", (date_from or "0000-00-00", date_to or "9999-99-99"), limit)
+
+    def published_platforms(self, content, show="zaka"):
+        """该内容已经成功发布过的平台 {平台: 记录}，没有登记时返回空字典"""
+        episode = self.find_by_content(content, show)
+        return episode['platforms'] if episode else {}
\ No newline at end of file
@@ -10,10 +10,20 @@ class AudioGenerationError(PodcastError):
     """音频生成错误"""
     pass
 
+class AudioProbeError(PodcastError):
+    """音频文件头无法识别或已损坏"""
+    pass
+
 class PublishingError(PodcastError):
     """发布错误"""
     pass
 
+class QualityCheckError(PodcastError):
+    """音频质检未通过"""
+    def __init__(self, message, report=None):
+        super().__init__(message)
+        self.report = report
+
 class ConfigurationError(PodcastError):
     """配置错误"""
     pass
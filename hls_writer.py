@@ -0,0 +1,61 @@
+import os
+from logger import logger
+from block_renderer import StreamingEncoder
+
+class HLSSegmentWriter:
+    """
+    HLS分段输出端: 渲染过程中持续写出固定时长的AAC分段，并增量更新EVENT类型的播放列表
+    渲染开始几秒后即可边生成边播放，结束时播放列表写入 #EXT-X-ENDLIST
+    整条流由同一个ffmpeg编码器连续编码，分段之间没有编码器预热造成的空隙
+    """
+
+    def __init__(self, output_dir, frame_rate, channels, segment_seconds=6, bitrate=None, playlist_name='playlist.m3u8'):
+        """
+        output_dir: 分段和播放列表所在目录
+        segment_seconds: 每个分段的时长（秒）
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.frame_rate = frame_rate
+        self.segment_seconds = segment_seconds
+        self.playlist_path = os.path.join(output_dir, playlist_name)
+        self.total_frames = 0
+
+        self.encoder = StreamingEncoder(
+            self.playlist_path,
+            frame_rate,
+            channels,
+            'hls',
+            bitrate,
+            extra_args=[
+                '-hls_time', str(segment_seconds),
+                '-hls_list_size', '0',
+                '-hls_playlist_type', 'event',
+                '-hls_flags', 'temp_file+independent_segments',
+                '-hls_segment_filename', os.path.join(output_dir, 'segment_%05d.ts')
+            ]
+        )
+        logger.info(f"HLS分段输出: {self.playlist_path} (每段 {segment_seconds} 秒)")
+
+    def process_block(self, block):
+        """写入一个 (帧数, 声道数) 的float32块"""
+        self.encoder.write(block)
+        self.total_frames += len(block)
+
+    def segment_count(self):
+        """当前已写入播放列表的分段数"""
+        if not os.path.exists(self.playlist_path):
+            return 0
+        with open(self.playlist_path, encoding='utf-8') as f:
+            return sum(1 for line in f if line.startswith('#EXTINF'))
+
+    def abort(self):
+        """渲染出错时终止编码进程"""
+        self.encoder.abort()
+
+    def finalize(self):
+        """结束编码，返回 {'hls_playlist': 播放列表路径, 'hls_segments': 分段数}"""
+        self.encoder.close()
+        segments = self.segment_count()
+        logger.info(f"HLS分段输出完成: {segments} 段, 时长 {self.total_frames / self.frame_rate:.1f}秒")
+        return {'hls_playlist': self.playlist_path, 'hls_segments': segments}
\ No newline at end of file
@@ -0,0 +1,177 @@
+import os
+import json
+from collections import deque, defaultdict
+from logger import logger
+
+# 默认分类词典 {分类: {关键词: 权重}}，可用 KEYWORD_DICT_PATH 指向的JSON文件补充或覆盖
+CATEGORY_KEYWORDS = {
+    "business": {
+        "商业": 3, "财经": 3, "创业": 3, "投资": 3, "融资": 2, "股票": 2, "基金": 2, "经济": 2,
+        "市场": 1, "公司": 1, "企业": 1, "营收": 2, "利润": 2, "估值": 2, "上市": 2, "消费": 1,
+        "品牌": 1, "营销": 2, "管理": 1, "职场": 2, "商业模式": 3, "产业": 1, "金融": 2, "理财": 2
+    },
+    "technology": {
+        "科技": 3, "技术": 3, "数码": 3, "人工智能": 3, "AI": 2, "大模型": 3, "芯片": 2, "算法": 2,
+        "互联网": 2, "编程": 2, "软件": 2, "硬件": 2, "手机": 1, "机器人": 2, "自动驾驶": 2, "云计算": 2,
+        "数据": 1, "开源": 2, "程序员": 2, "元宇宙": 2, "区块链": 2, "新能源": 1, "电动车": 1
+    },
+    "education": {
+        "教育": 3, "学习": 3, "知识": 3, "考试": 2, "高考": 2, "大学": 2, "学校": 1, "老师": 1,
+        "学生": 1, "读书": 2, "课程": 2, "留学": 2, "考研": 2, "培训": 1, "科普": 2, "方法论": 1
+    },
+    "arts": {
+        "故事": 3, "文学": 3, "小说": 2, "诗歌": 2, "电影": 2, "音乐": 2, "艺术": 2, "历史": 2,
+        "文化": 1, "书评": 2, "影评": 2, "戏剧": 2, "绘画": 2, "设计": 1, "作家": 2, "传记": 2
+    },
+    "health": {
+        "生活": 3, "健康": 3, "运动": 2, "健身": 2, "饮食": 2, "睡眠": 2, "心理": 2, "情绪": 2,
+        "医疗": 2, "疾病": 2, "减肥": 2, "养生": 2, "焦虑": 2, "冥想": 2, "旅行": 1, "美食": 1
+    },
+    "society": {
+        "社会": 3, "新闻": 2, "时事": 2, "政策": 2, "城市": 1, "人口": 2, "就业": 2, "婚姻": 2,
+        "家庭": 1, "年轻人": 1, "环境": 1, "公益": 2, "法律": 2, "女性": 1, "代际": 1, "乡村": 1
+    }
+}
+
+# 各字段的权重，风格和话题比正文里的一次出现更能说明分类
+FIELD_WEIGHTS = {"style": 3.0, "topic": 3.0, "title": 2.0, "description": 1.5, "script": 1.0}
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick自动机: 关键词在构造时编译一次，之后对文本只做一次线性扫描，
+    耗时与文本长度（加匹配数）成正比，与关键词数量无关
+    """
+
+    def __init__(self, keywords):
+        self.keywords = []
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword in keywords:
+            self._add(keyword)
+        self._build()
+
+    def _add(self, keyword):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(len(self.keywords))
+        self.keywords.append(keyword)
+
+    def _build(self):
+        """广度优先计算失败指针，并把失败链上的输出合并到每个状态"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def scan(self, text):
+        """扫描文本，逐个返回 (结束位置, 关键词序号)，匹配可重叠"""
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for index in output[state]:
+                yield position, index
+
+def _is_word_char(char):
+    return char.isascii() and char.isalnum()
+
+class KeywordClassifier:
+    """
+    基于关键词的分类和标签
+    所有分类的关键词编译进同一个自动机，每个字段扫描一次，按 关键词权重 × 字段权重 累计分类得分；
+    命中的关键词按同样的得分排序作为标签。英文关键词不区分大小写，且只匹配完整的单词。
+    """
+
+    def __init__(self, categories=None, field_weights=None):
+        self.categories = categories or CATEGORY_KEYWORDS
+        self.field_weights = field_weights or FIELD_WEIGHTS
+        # 同一个词可能属于多个分类
+        self.entries = defaultdict(list)
+        for category, keywords in self.categories.items():
+            for keyword, weight in keywords.items():
+                self.entries[keyword.lower()].append((category, float(weight)))
+        self.terms = {keyword.lower(): keyword for keywords in self.categories.values() for keyword in keywords}
+        self.automaton = KeywordAutomaton(self.entries.keys())
+        # 以英文字母或数字开头/结尾的关键词需要检查单词边界（AI不应匹配said）
+        self.bounded = [_is_word_char(keyword[0]) or _is_word_char(keyword[-1]) for keyword in self.automaton.keywords]
+
+    @classmethod
+    def from_file(cls, path):
+        """从JSON词典加载 {分类: {关键词: 权重}}，与默认词典合并"""
+        categories = {category: dict(keywords) for category, keywords in CATEGORY_KEYWORDS.items()}
+        with open(path, 'r', encoding='utf-8') as f:
+            for category, keywords in json.load(f).items():
+                categories.setdefault(category, {}).update(keywords)
+        return cls(categories)
+
+    def _hits(self, content):
+        """{关键词: 加权得分}"""
+        hits = defaultdict(float)
+        keywords = self.automaton.keywords
+        for field, field_weight in self.field_weights.items():
+            text = content.get(field)
+            if not text or not isinstance(text, str):
+                continue
+            text = text.lower()
+            for end, index in self.automaton.scan(text):
+                keyword = keywords[index]
+                if self.bounded[index]:
+                    start = end - len(keyword) + 1
+                    if (start > 0 and _is_word_char(text[start - 1])) or \
+                            (end + 1 < len(text) and _is_word_char(text[end + 1])):
+                        continue
+                hits[keyword] += field_weight
+        return hits
+
+    def classify(self, content, top_tags=5):
+        """
+        content: dict 包含style、topic、title、description、script
+        返回: dict {'categories': [(分类, 得分占比)] 按得分降序, 'tags': [关键词]}
+        """
+        hits = self._hits(content)
+        scores = defaultdict(float)
+        tag_scores = {}
+        for keyword, count in hits.items():
+            for category, weight in self.entries[keyword]:
+                scores[category] += weight * count
+            tag_scores[keyword] = count * max(weight for _, weight in self.entries[keyword])
+
+        total = sum(scores.values())
+        categories = sorted(
+            ((category, round(score / total, 3)) for category, score in scores.items()),
+            key=lambda item: item[1], reverse=True
+        ) if total else []
+        tags = [self.terms[keyword] for keyword, _ in sorted(tag_scores.items(), key=lambda item: item[1], reverse=True)]
+        return {"categories": categories, "tags": tags[:top_tags]}
+
+_default_classifier = None
+
+def get_keyword_classifier(dict_path=None):
+    """全局分类器实例（自动机只编译一次），dict_path为补充词典"""
+    global _default_classifier
+    if _default_classifier is None:
+        if dict_path and os.path.exists(dict_path):
+            _default_classifier = KeywordClassifier.from_file(dict_path)
+            logger.info(f"已加载关键词词典: {dict_path}")
+        else:
+            _default_classifier = KeywordClassifier()
+    return _default_classifier
\ No newline at end of file
@@ -0,0 +1,219 @@
+import time
+import queue
+import base64
+import threading
+import http.client
+import numpy as np
+from urllib.parse import urlparse, unquote
+from logger import logger
+from exceptions import AudioGenerationError
+from block_renderer import StreamingEncoder
+
+class LiveStreamer:
+    """
+    直播输出端: 把渲染出的PCM块按实时速率编码，以HTTP分块传输推送到Icecast兼容的服务器
+
+    渲染线程通过process_block把块放入有界的抖动缓冲区，缓冲区满时阻塞，渲染始终只领先实时播放
+    固定的几秒，内存占用有上限。发送线程按墙钟时间逐块取出送入ffmpeg，另一个线程把编码结果
+    原样转发给服务器。到点时缓冲区为空即记为一次欠载（underrun），此时补静音保证直播流连续。
+    """
+
+    def __init__(self, url, frame_rate, channels, bitrate='128k', block_ms=1000,
+                 buffer_ms=5000, prebuffer_ms=2000, name=None, description=None):
+        """
+        url: 推流地址，例如 http://source:密码@localhost:8000/live.mp3
+        buffer_ms: 抖动缓冲区上限，渲染最多领先实时播放这么多
+        prebuffer_ms: 开始推流前预先缓冲的时长
+        name/description: 写入 Ice-Name / Ice-Description 请求头
+        """
+        self.url = url
+        self.frame_rate = frame_rate
+        self.channels = channels
+        self.bitrate = bitrate
+        self.block_ms = block_ms
+        self.prebuffer_blocks = max(1, int(np.ceil(prebuffer_ms / block_ms)))
+        self.buffer = queue.Queue(maxsize=max(self.prebuffer_blocks, int(np.ceil(buffer_ms / block_ms))))
+
+        # 渲染块的长度不一定等于block_ms，按固定长度重新切块后再放入缓冲区
+        self.block_frames = max(1, int(frame_rate * block_ms / 1000))
+        self.pending = np.zeros((0, channels), dtype=np.float32)
+
+        self.underruns = 0
+        self.underrun_ms = 0.0
+        self.sent_bytes = 0
+        self.sent_frames = 0
+        self.max_lag_ms = 0.0
+        self.error = None
+        self.started = threading.Event()
+        self.closed = False
+
+        self.connection = self._connect(name, description)
+        self.encoder = StreamingEncoder('pipe:1', frame_rate, channels, 'mp3', bitrate)
+        self.pump_thread = threading.Thread(target=self._pump, name='live-pump', daemon=True)
+        self.send_thread = threading.Thread(target=self._send, name='live-send', daemon=True)
+        self.pump_thread.start()
+        self.send_thread.start()
+        parsed = urlparse(url)
+        logger.info(f"开始直播推流: {parsed.hostname}:{parsed.port or 80}{parsed.path} (缓冲 {buffer_ms} 毫秒)")
+
+    def _connect(self, name, description):
+        """建立到服务器的PUT连接，发送请求头，之后的请求体以分块传输发送"""
+        parsed = urlparse(self.url)
+        connection_class = http.client.HTTPSConnection if parsed.scheme == 'https' else http.client.HTTPConnection
+        connection = connection_class(parsed.hostname, parsed.port or (443 if parsed.scheme == 'https' else 80), timeout=30)
+
+        connection.putrequest('PUT', parsed.path or '/', skip_accept_encoding=True)
+        if parsed.username:
+            credentials = f"{unquote(parsed.username)}:{unquote(parsed.password or '')}"
+            connection.putheader('Authorization', 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii'))
+        connection.putheader('Content-Type', 'audio/mpeg')
+        connection.putheader('Transfer-Encoding', 'chunked')
+        connection.putheader('Ice-Public', '0')
+        connection.putheader('Ice-Audio-Info', f"samplerate={self.frame_rate};channels={self.channels}")
+        # 中文标题按UTF-8字节发送，Icecast原样保存
+        if name:
+            connection.putheader('Ice-Name', name.encode('utf-8'))
+        if description:
+            connection.putheader('Ice-Description', description.replace('\n', ' ')[:200].encode('utf-8'))
+        try:
+            connection.endheaders()
+        except OSError as e:
+            raise AudioGenerationError(f"无法连接直播服务器: {str(e)}")
+        return connection
+
+    def process_block(self, block):
+        """渲染线程调用: 按固定块长放入抖动缓冲区，缓冲区满时阻塞"""
+        self._raise_if_failed()
+        self.pending = np.concatenate([self.pending, block])
+        while len(self.pending) >= self.block_frames:
+            self._enqueue(self.pending[:self.block_frames])
+            self.pending = self.pending[self.block_frames:]
+
+    def _enqueue(self, block):
+        while True:
+            self._raise_if_failed()
+            try:
+                self.buffer.put(block, timeout=1)
+                break
+            except queue.Full:
+                continue
+        if self.buffer.qsize() >= self.prebuffer_blocks:
+            self.started.set()
+
+    def _raise_if_failed(self):
+        if self.error:
+            raise AudioGenerationError(f"直播推流失败: {self.error}")
+
+    def _send(self):
+        """发送线程: 按实时速率从缓冲区取块写入编码器，缓冲区为空时补静音"""
+        silence = np.zeros((self.block_frames, self.channels), dtype=np.float32)
+        try:
+            self.started.wait()
+            clock = time.monotonic()
+            while True:
+                try:
+                    block = self.buffer.get_nowait()
+                except queue.Empty:
+                    if self.closed:
+                        break
+                    # 渲染没跟上实时播放
+                    self.underruns += 1
+                    self.underrun_ms += self.block_ms
+                    logger.warning(f"直播缓冲区欠载，补 {self.block_ms} 毫秒静音 (累计 {self.underruns} 次)")
+                    block = silence
+                if block is None:
+                    break
+
+                self.encoder.write(block)
+                self.sent_frames += len(block)
+
+                # 按墙钟时间对齐，落后时不补偿睡眠
+                clock += len(block) / self.frame_rate
+                lag = time.monotonic() - clock
+                self.max_lag_ms = max(self.max_lag_ms, lag * 1000)
+                if lag < 0:
+                    time.sleep(-lag)
+        except Exception as e:
+            self.error = self.error or str(e)
+        finally:
+            if self.encoder.process.stdin and not self.encoder.process.stdin.closed:
+                try:
+                    self.encoder.process.stdin.close()
+                except OSError:
+                    pass
+
+    def _pump(self):
+        """转发线程: 把编码器输出作为HTTP分块发送给服务器"""
+        try:
+            while True:
+                data = self.encoder.process.stdout.read1(16384)
+                if not data:
+                    break
+                self.connection.send(b'%x\r\n' % len(data) + data + b'\r\n')
+                self.sent_bytes += len(data)
+            self.connection.send(b'0\r\n\r\n')
+        except Exception as e:
+            self.error = self.error or self._response_error() or str(e)
+            self.encoder.process.kill()
+
+    def _response_error(self):
+        """连接被服务器断开时读取响应状态（例如认证失败返回401）"""
+        try:
+            response = self.connection.getresponse()
+        except (OSError, http.client.HTTPException):
+            return None
+        if response.status >= 400:
+            return f"服务器返回 {response.status} {response.reason}"
+        return None
+
+    def abort(self):
+        """渲染出错时停止推流"""
+        self.error = self.error or '渲染中止'
+        self.closed = True
+        self.started.set()
+        self.encoder.abort()
+        self.connection.close()
+
+    def finalize(self):
+        """推送剩余数据并等待播放完毕，返回 {'live': 推流统计}"""
+        if len(self.pending):
+            self._enqueue(self.pending)
+            self.pending = self.pending[:0]
+        self._enqueue(None)
+        self.closed = True
+        self.started.set()
+
+        self.send_thread.join()
+        self.pump_thread.join()
+        try:
+            self.encoder.close()
+        except AudioGenerationError as e:
+            self.error = self.error or str(e)
+
+        status = None
+        try:
+            response = self.connection.getresponse()
+            status = response.status
+            if status >= 400:
+                self.error = self.error or f"服务器返回 {status} {response.reason}"
+        except (OSError, http.client.HTTPException) as e:
+            logger.warning(f"读取直播服务器响应失败: {str(e)}")
+        finally:
+            self.connection.close()
+
+        self._raise_if_failed()
+
+        report = {
+            'url': urlparse(self.url).hostname,
+            'status': status,
+            'sent_bytes': self.sent_bytes,
+            'duration': self.sent_frames / self.frame_rate,
+            'underruns': self.underruns,
+            'underrun_ms': self.underrun_ms,
+            'max_lag_ms': round(self.max_lag_ms, 1)
+        }
+        if self.underruns:
+            logger.warning(f"直播结束，欠载 {self.underruns} 次，共 {self.underrun_ms / 1000:.1f} 秒静音")
+        else:
+            logger.info(f"直播结束，共推送 {self.sent_bytes / 1024:.0f} KB，无欠载")
+        return {'live': report}
\ No newline at end of file
@@ -1,6 +1,8 @@
 import os
 import sys
 import argparse
+import asyncio
+from datetime import datetime
 from dotenv import load_dotenv
 
 # 添加 ffmpeg 路径到系统 PATH
@@ -17,7 +19,9 @@ else:
 from podcast_generator import PodcastGenerator
 from audio_processor import AudioProcessor
 from podcast_publisher import PodcastPublisher
+from publish_queue import PublishOutbox, PublishWorker
 from podcast_templates import PodcastTemplates
+from audio_probe import probe_audio
 from config import Config
 from logger import logger
 from exceptions import PodcastError
@@ -27,8 +31,8 @@ def parse_arguments():
     parser = argparse.ArgumentParser(description='Zaka播客自动生成系统')
     
     # 模式选择
-    parser.add_argument('--mode', type=str, default='auto', choices=['auto', 'content', 'audio', 'publish'],
-                        help='运行模式: auto(完整流程), content(只生成内容), audio(只生成音频), publish(只发布)')
+    parser.add_argument('--mode', type=str, default='auto', choices=['auto', 'content', 'audio', 'publish', 'preview', 'live', 'worker'],
+                        help='运行模式: auto(完整流程), content(只生成内容), audio(只生成音频), publish(只发布), preview(生成试听音频), live(直播推流), worker(处理发布队列)')
     
     # 风格和主题参数
     parser.add_argument('--style', type=str, default=None,
@@ -44,9 +48,31 @@ def parse_arguments():
     parser.add_argument('--audio-file', type=str, default=None,
                         help='音频文件路径（用于直接发布现有音频）')
     
+    # 试听参数
+    parser.add_argument('--preview-seconds', type=int, default=60,
+                        help='试听音频时长（秒），用于preview模式')
+    
+    # 渐进式输出参数
+    parser.add_argument('--segmented', action='store_true',
+                        help='边渲染边输出HLS分段和播放列表，渲染开始几秒后即可播放')
+    parser.add_argument('--segment-seconds', type=int, default=None,
+                        help='HLS分段时长（秒），默认使用配置值')
+    
+    # 直播参数
+    parser.add_argument('--live-url', type=str, default=None,
+                        help='直播推流地址，例如 http://source:密码@localhost:8000/live.mp3，默认使用配置值')
+    
     # 平台参数
     parser.add_argument('--platforms', type=str, default='all',
-                        help='要发布的平台，用逗号分隔，例如：xiaoyuzhou,lizhi')
+                        help='要发布的平台，用逗号分隔，例如：xiaoyuzhou,lizhi，默认发布到所有已配置API密钥的平台')
+    parser.add_argument('--queue', action='store_true',
+                        help='把发布任务写入队列后立即返回，由 --mode worker 进程上传（默认入队后在本进程上传并等待结果）')
+    parser.add_argument('--schedule', action='store_true',
+                        help='定时发布: 入队到下一个发布时间点（RELEASE_SLOTS），支持草稿的平台提前上传')
+    parser.add_argument('--release-at', type=str, default=None,
+                        help='定时发布的时间，格式 "YYYY-MM-DD HH:MM"（隐含--schedule）')
+    parser.add_argument('--drain', action='store_true',
+                        help='worker模式: 处理完队列中所有任务后退出（默认持续运行）')
     
     # 其他选项
     parser.add_argument('--list-styles', action='store_true',
@@ -55,6 +81,8 @@ def parse_arguments():
                         help='列出所有参考的热门播客')
     parser.add_argument('--list-topics', action='store_true',
                         help='列出热门话题')
+    parser.add_argument('--list-history', action='store_true',
+                        help='列出最近的发布记录（可配合--platforms筛选平台）')
     
     return parser.parse_args()
 
@@ -82,6 +110,29 @@ def list_trending_topics():
         print(f"- {topic}")
     print()
 
+def list_publish_history(platforms='all', limit=20):
+    """列出最近的发布记录"""
+    from publish_history import PublishHistory
+    
+    history = PublishHistory(Config().publish_history_path)
+    try:
+        platform = None if platforms == 'all' else platforms.split(',')[0]
+        records = history.query(platform=platform, limit=limit)
+        summary = history.summary()
+    finally:
+        history.close()
+    
+    print("\n=== 最近的发布记录 ===")
+    for record in records:
+        status = "成功" if record['status'] == 'success' else f"失败: {record['error']}"
+        print(f"- {record['timestamp'][:19]} [{record['platform']}] {record['title']} ({status})")
+        if record['episode_url']:
+            print(f"  链接: {record['episode_url']}")
+    print("\n=== 各平台统计 ===")
+    for name, counts in summary.items():
+        print(f"- {name}: 成功 {counts['success']} 次，失败 {counts['failed']} 次")
+    print()
+
 def load_content_from_file(file_path):
     """从文件加载播客内容"""
     import json
@@ -115,6 +166,39 @@ def save_content_to_file(content):
         logger.error(f"保存内容到文件时出错: {str(e)}")
         return None
 
+def build_worker(config, publisher):
+    """创建发布队列worker（--mode worker 和生成后直接发布共用）"""
+    return PublishWorker(
+        PublishOutbox(config.publish_queue_path),
+        publisher,
+        concurrency=config.publish_concurrency,
+        backoff_base=config.publish_backoff_base,
+        backoff_max=config.publish_backoff_max,
+        breaker_threshold=config.breaker_failure_threshold,
+        breaker_reset=config.breaker_reset_seconds,
+        rate_limits={
+            platform: getattr(config, f"{platform}_uploads_per_hour")
+            for platform in publisher.supported_platforms
+        },
+        bucket_burst=config.upload_bucket_burst
+    )
+
+def load_audio_info(audio_file):
+    """读取已有音频文件的信息（只读文件头得到时长和码率，不需要解码）"""
+    if not os.path.exists(audio_file):
+        raise PodcastError(f"音频文件不存在: {audio_file}")
+    logger.info(f"使用现有音频文件: {audio_file}")
+    probe = probe_audio(audio_file)
+    audio_info = {
+        'path': audio_file,
+        'filename': os.path.basename(audio_file),
+        'duration': probe['duration'],
+        'size': os.path.getsize(audio_file) / (1024 * 1024),  # MB
+        'bitrate': probe['bitrate']
+    }
+    logger.info(f"时长: {audio_info['duration']:.2f}秒, 码率: {probe['bitrate']}kbps")
+    return audio_info
+
 def main():
     """主程序入口"""
     try:
@@ -134,6 +218,10 @@ def main():
             list_trending_topics()
             return
         
+        if args.list_history:
+            list_publish_history(args.platforms)
+            return
+        
         # 加载配置
         config = Config()
         
@@ -142,8 +230,14 @@ def main():
         audio_processor = AudioProcessor()
         publisher = PodcastPublisher()
         
+        # 处理发布队列
+        if args.mode == 'worker':
+            worker = build_worker(config, publisher)
+            asyncio.run(worker.run(drain=args.drain))
+            return
+        
         # 根据模式执行相应功能
-        if args.mode == 'auto' or args.mode == 'content':
+        if args.mode in ('auto', 'content', 'preview', 'live'):
             # 生成播客内容
             if args.content_file:
                 # 从文件加载内容
@@ -184,21 +278,35 @@ def main():
                 logger.info("内容生成完成，程序结束")
                 return
         
+        # 生成试听音频
+        if args.mode == 'preview':
+            logger.info(f"开始生成 {args.preview_seconds} 秒试听音频...")
+            preview_info = audio_processor.generate_preview(podcast_content, seconds=args.preview_seconds)
+            logger.info(f"试听音频生成完成: {preview_info['path']}")
+            logger.info(f"时长: {preview_info['duration']:.2f}秒, 大小: {preview_info['size']:.2f}MB")
+            return
+        
+        # 直播推流
+        if args.mode == 'live':
+            logger.info("开始直播推流...")
+            live_info = audio_processor.generate_live(podcast_content, url=args.live_url)
+            live = live_info['live']
+            logger.info(f"直播完成: 时长 {live['duration']:.1f}秒, 欠载 {live['underruns']} 次, 存档 {live_info['path']}")
+            return
+        
         # 生成音频
         if args.mode == 'auto' or args.mode == 'audio':
             if args.audio_file:
                 # 使用现有音频文件
-                logger.info(f"使用现有音频文件: {args.audio_file}")
-                audio_info = {
-                    'path': args.audio_file,
-                    'filename': os.path.basename(args.audio_file),
-                    'duration': 0,  # 需要计算
-                    'size': os.path.getsize(args.audio_file) / (1024 * 1024)  # MB
-                }
+                audio_info = load_audio_info(args.audio_file)
             else:
                 # 生成新音频
                 logger.info("开始生成音频...")
-                audio_info = audio_processor.generate_audio(podcast_content)
+                if args.segmented:
+                    audio_info = audio_processor.generate_segmented(podcast_content, segment_seconds=args.segment_seconds)
+                    logger.info(f"HLS播放列表: {audio_info['hls_playlist']}")
+                else:
+                    audio_info = audio_processor.generate_audio(podcast_content)
                 logger.info(f"音频生成完成: {audio_info['filename']}")
                 logger.info(f"时长: {audio_info['duration']:.2f}秒, 大小: {audio_info['size']:.2f}MB")
             
@@ -211,18 +319,56 @@ def main():
         if args.mode == 'auto' or args.mode == 'publish':
             logger.info("开始发布到播客平台...")
             
+            # 只发布时使用已有的内容和音频文件
+            if args.mode == 'publish':
+                if not args.content_file or not args.audio_file:
+                    raise PodcastError("发布模式需要同时指定 --content-file 和 --audio-file")
+                logger.info(f"从文件加载内容: {args.content_file}")
+                podcast_content = load_content_from_file(args.content_file)
+                audio_info = load_audio_info(args.audio_file)
+            
             # 确定要发布的平台
-            platforms = args.platforms.split(',') if args.platforms != 'all' else ['xiaoyuzhou']
+            platforms = args.platforms.split(',') if args.platforms != 'all' else None
+            
+            # 定时发布: 入队到指定时间或下一个发布时间点
+            if args.schedule or args.release_at:
+                if args.release_at:
+                    try:
+                        release_at = datetime.strptime(args.release_at, "%Y-%m-%d %H:%M")
+                    except ValueError:
+                        raise PodcastError(f"发布时间格式错误: {args.release_at}，应为 YYYY-MM-DD HH:MM")
+                else:
+                    release_at = publisher.next_release_slot()
+                job_ids = publisher.enqueue(audio_info, podcast_content, platforms, release_at=release_at)
+                logger.info(f"已加入定时发布队列 {len(job_ids)} 个任务，{release_at:%Y-%m-%d %H:%M} 发布，"
+                            f"运行 python main.py --mode worker 处理")
+                return
             
-            # 发布并获取结果
-            publish_results = publisher.publish(audio_info, podcast_content)
+            # 只入队，不等待上传
+            if args.queue:
+                job_ids = publisher.enqueue(audio_info, podcast_content, platforms)
+                logger.info(f"已加入发布队列 {len(job_ids)} 个任务，运行 python main.py --mode worker 上传")
+                return
+            
+            # 先写入持久化队列再由本进程的worker上传，进程中断时任务不会丢失，
+            # 重新运行 python main.py --mode worker 即可继续
+            job_ids = publisher.enqueue(audio_info, podcast_content, platforms)
+            if not job_ids:
+                return
+            worker = build_worker(config, publisher)
+            asyncio.run(worker.run(job_ids=job_ids))
             
             # 显示发布结果
-            for platform, result in publish_results.items():
-                if result.get('success', False):
-                    logger.info(f"发布到 {platform} 成功: {result.get('episode_url', '')}")
+            outbox = PublishOutbox(config.publish_queue_path)
+            try:
+                jobs = [outbox.get(job_id) for job_id in job_ids]
+            finally:
+                outbox.close()
+            for job in jobs:
+                if job['state'] == 'done':
+                    logger.info(f"发布到 {job['platform']} 成功: {(job['result'] or {}).get('episode_url', '')}")
                 else:
-                    logger.error(f"发布到 {platform} 失败: {result.get('error', 'Unknown error')}")
+                    logger.error(f"发布到 {job['platform']} 失败: {job['last_error'] or 'Unknown error'}")
     
     except PodcastError as e:
         logger.error(f"程序出错: {str(e)}")
@@ -0,0 +1,153 @@
+import os
+import time
+import hashlib
+import sqlite3
+from email.utils import formatdate
+from xml.sax.saxutils import escape, quoteattr
+
+ITUNES_NS = "http://www.itunes.com/dtds/podcast-1.0.dtd"
+PODCAST_NS = "https://podcastindex.org/namespace/1.0"
+
+def feed_etag(body):
+    """强ETag: 内容的SHA-256（同样的字节总是得到同样的ETag）"""
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def _format_duration(seconds):
+    seconds = int(round(seconds or 0))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+class PodcastFeed:
+    """
+    自托管RSS订阅源（RSS 2.0 + iTunes + Podcast命名空间）
+    每集的<item>在发布时渲染一次并保存在SQLite中，之后只做字节拼接；
+    新增或更新一集只渲染这一集，其余条目原样复用。
+    写出feed.xml时文件修改时间设为lastBuildDate，scripts/serve_feed.py 据此和内容哈希
+    生成Last-Modified和强ETag，响应条件请求（304 Not Modified）。
+    """
+
+    def __init__(self, feed_dir="data/feed", base_url="http://localhost:8200", title="Zaka播客",
+                 description="", author="", language="zh-cn", image_url="", max_items=300):
+        self.feed_dir = feed_dir
+        self.base_url = base_url.rstrip('/')
+        self.title = title
+        self.description = description
+        self.author = author
+        self.language = language
+        self.image_url = image_url
+        self.max_items = max_items
+        self.feed_path = os.path.join(feed_dir, "feed.xml")
+        os.makedirs(feed_dir, exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(feed_dir, "items.db"), timeout=30, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS feed_items (
+                guid TEXT PRIMARY KEY,
+                pub_date REAL NOT NULL,
+                xml TEXT NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_feed_items_pub_date ON feed_items (pub_date)")
+
+    def close(self):
+        self.connection.close()
+
+    def audio_url(self, filename):
+        return f"{self.base_url}/audio/{filename}"
+
+    def _header(self, last_build):
+        parts = [
+            '<?xml version="1.0" encoding="UTF-8"?>\n',
+            f'<rss version="2.0" xmlns:itunes="{ITUNES_NS}" xmlns:podcast="{PODCAST_NS}">\n',
+            '<channel>\n',
+            f'<title>{escape(self.title)}</title>\n',
+            f'<link>{escape(self.base_url)}</link>\n',
+            f'<description>{escape(self.description or self.title)}</description>\n',
+            f'<language>{escape(self.language)}</language>\n',
+            f'<lastBuildDate>{formatdate(last_build, usegmt=True)}</lastBuildDate>\n',
+            f'<itunes:author>{escape(self.author)}</itunes:author>\n',
+            '<itunes:explicit>false</itunes:explicit>\n',
+        ]
+        if self.image_url:
+            parts.append(f'<itunes:image href={quoteattr(self.image_url)}/>\n')
+        return "".join(parts)
+
+    def render_item(self, guid, content, audio_info, season=None, episode=None, pub_date=None):
+        """渲染一集的<item>"""
+        pub_date = pub_date or time.time()
+        path = audio_info['path']
+        length = os.path.getsize(path) if os.path.exists(path) else int((audio_info.get('size') or 0) * 1024 * 1024)
+        description = content.get('description', '')
+        parts = [
+            '<item>\n',
+            f'<title>{escape(content["title"])}</title>\n',
+            f'<description>{escape(description)}</description>\n',
+            f'<guid isPermaLink="false">{escape(guid)}</guid>\n',
+            f'<pubDate>{formatdate(pub_date, usegmt=True)}</pubDate>\n',
+            f'<enclosure url={quoteattr(self.audio_url(os.path.basename(path)))} length="{length}" type="audio/mpeg"/>\n',
+            f'<itunes:duration>{_format_duration(audio_info.get("duration"))}</itunes:duration>\n',
+            f'<itunes:summary>{escape(description)}</itunes:summary>\n',
+        ]
+        if season:
+            parts.append(f'<itunes:season>{int(season)}</itunes:season>\n')
+            parts.append(f'<podcast:season>{int(season)}</podcast:season>\n')
+        if episode:
+            parts.append(f'<itunes:episode>{int(episode)}</itunes:episode>\n')
+            parts.append(f'<podcast:episode>{int(episode)}</podcast:episode>\n')
+        parts.append('</item>\n')
+        return "".join(parts)
+
+    def add_item(self, guid, content, audio_info, season=None, episode=None, pub_date=None):
+        """
+        新增或替换一集（相同guid替换，例如只更新了标题）并写出feed.xml
+        返回: dict 新的 {etag, last_modified, size, items}
+        """
+        def add():
+            existing = self.connection.execute("SELECT pub_date FROM feed_items WHERE guid = ?", (guid,)).fetchone()
+            # 更新信息时保留原来的发布时间，条目顺序不变
+            item_date = existing[0] if existing else (pub_date or time.time())
+            self.connection.execute(
+                """
+                INSERT INTO feed_items (guid, pub_date, xml) VALUES (?, ?, ?)
+                ON CONFLICT (guid) DO UPDATE SET xml = excluded.xml
+                """,
+                (guid, item_date, self.render_item(guid, content, audio_info, season, episode, item_date))
+            )
+        return self._update(add)
+
+    def remove_item(self, guid):
+        return self._update(lambda: self.connection.execute("DELETE FROM feed_items WHERE guid = ?", (guid,)))
+
+    def write(self):
+        return self._update(lambda: None)
+
+    def _update(self, change):
+        """修改条目并写出feed.xml；整个过程持有写锁，多个发布进程的写出不会互相覆盖"""
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            change()
+            validators = self._write()
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return validators
+
+    def _write(self):
+        """拼接已渲染的条目写出feed.xml（原子替换），返回新的验证器"""
+        now = int(time.time())
+        items = self.connection.execute(
+            "SELECT xml FROM feed_items ORDER BY pub_date DESC LIMIT ?", (self.max_items,)
+        ).fetchall()
+        body = "".join([self._header(now)] + [row[0] for row in items] + ['</channel>\n</rss>\n']).encode('utf-8')
+
+        temp_path = f"{self.feed_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(body)
+        os.utime(temp_path, (now, now))
+        os.replace(temp_path, self.feed_path)
+        return {
+            "etag": feed_etag(body),
+            "last_modified": formatdate(now, usegmt=True),
+            "size": len(body),
+            "items": len(items)
+        }
\ No newline at end of file
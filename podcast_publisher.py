@@ -1,14 +1,17 @@
-import requests
-import os
-import json
-import time
-from datetime import datetime
-import aiohttp
+from datetime import datetime, timedelta
 import asyncio
 from slugify import slugify
 from logger import logger
-from exceptions import PublishingError, APIError
+from exceptions import PodcastError, QualityCheckError
 from config import Config
+from audio_qc import AudioQCAnalyzer
+from audio_probe import probe_audio
+from publish_engine import PlatformClient, PublishEngine, PLATFORM_NAMES
+from publish_queue import PublishOutbox
+from publish_history import PublishHistory
+from episode_catalog import EpisodeCatalog, file_sha256
+from podcast_feed import PodcastFeed
+from keyword_classifier import get_keyword_classifier
 
 class PodcastPublisher:
     def __init__(self):
@@ -25,198 +28,373 @@ class PodcastPublisher:
         # 支持的平台列表
         self.supported_platforms = ["xiaoyuzhou", "lizhi", "ximalaya", "qingting"]
     
-    def publish(self, audio_info, content):
+    def publish(self, audio_info, content, platforms=None):
         """
         发布播客到各个平台
         audio_info: dict 音频文件信息
         content: dict 包含标题、脚本和描述
+        platforms: list 要发布的平台，None表示所有已配置API密钥的平台
         返回: dict 包含发布结果
         """
-        results = {}
+        return asyncio.run(self.publish_async(audio_info, content, platforms))
+    
+    async def publish_async(self, audio_info, content, platforms=None):
+        """并发发布到选中的平台（供已在事件循环中的调用方使用）"""
+        # 上传前检查音频质量，未通过直接失败，不浪费上传带宽和平台配额
+        self._check_audio_quality(audio_info)
         
-        # 小宇宙平台发布
-        if self.xiaoyuzhou_api_key:
-            try:
-                result = self._publish_to_xiaoyuzhou(audio_info, content)
-                results["xiaoyuzhou"] = result
-                logger.info(f"成功发布到小宇宙平台: {result.get('episode_id', '')}")
-            except Exception as e:
-                logger.error(f"小宇宙平台发布失败: {str(e)}")
-                results["xiaoyuzhou"] = {"success": False, "error": str(e)}
+        results = {}
+        clients = []
+        # 流式计算音频哈希在线程中进行，不阻塞事件循环
+        selected, existing = await asyncio.to_thread(
+            self._pending_platforms, audio_info, content, self._select_platforms(platforms), results
+        )
+        for platform in selected:
+            if not self._is_configured(platform):
+                logger.warning(f"{PLATFORM_NAMES[platform]}平台未配置API密钥或地址，跳过")
+                results[platform] = {"success": False, "platform": platform, "error": "未配置API密钥或地址"}
+                continue
+            clients.append(self.build_client(platform))
         
-        # 其他平台发布（可以异步处理）
-        other_platforms_results = self._publish_to_other_platforms(audio_info, content)
-        results.update(other_platforms_results)
+        if clients:
+            # 元数据只生成一次，各平台使用相同的集号和发布时间
+            metadata = self._build_metadata(content, audio_info.get('sha256'))
+            async with PublishEngine(clients) as engine:
+                results.update(await engine.publish(audio_info['path'], metadata, existing))
         
         # 记录发布结果
         self._log_publish_results(audio_info, content, results)
         
         return results
     
-    def _publish_to_xiaoyuzhou(self, audio_info, content):
-        """发布到小宇宙平台"""
-        try:
-            logger.info("开始发布到小宇宙平台")
-            
-            # 准备请求数据
-            audio_path = audio_info['path']
-            
-            # 小宇宙平台发布所需元数据
-            metadata = {
-                "title": content['title'],
-                "description": content['description'],
-                "slug": slugify(content['title']),
-                "publish_date": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
-                "category": self._determine_category(content),
-                "tags": self._generate_tags(content),
-                "explicit": False,  # 是否包含成人内容
-                "season": 1,  # 季数
-                "episode": self._get_next_episode_number()  # 集数
-            }
-            
-            # 构建API请求
-            headers = {
-                "Authorization": f"Bearer {self.xiaoyuzhou_api_key}",
-                "Accept": "application/json"
+    def enqueue(self, audio_info, content, platforms=None, release_at=None):
+        """
+        把发布任务写入持久化队列后立即返回，由 --mode worker 进程上传
+        release_at: datetime 定时发布时间，None表示尽快发布
+        返回: list 新建的任务ID
+        """
+        self._check_audio_quality(audio_info)
+        
+        selected = []
+        # 音频和元数据都没变的平台不入队；只改了标题或简介的由worker更新元数据
+        remaining, existing = self._pending_platforms(audio_info, content, self._select_platforms(platforms), {})
+        for platform in remaining:
+            if self._is_configured(platform):
+                selected.append(platform)
+            else:
+                logger.warning(f"{PLATFORM_NAMES[platform]}平台未配置API密钥或地址，跳过")
+        if not selected:
+            logger.warning("没有可发布的平台")
+            return []
+        
+        metadata = self._build_metadata(content, audio_info.get('sha256'))
+        schedule = {}
+        if release_at is not None:
+            metadata['publish_date'] = release_at.strftime("%Y-%m-%dT%H:%M:%S")
+            # 支持草稿的平台提前上传（已有相同音频、只需更新元数据的平台到点再更新）
+            schedule = {
+                'release_at': release_at.timestamp(),
+                'drafts': [platform for platform in selected
+                           if getattr(self.config, f"{platform}_drafts", False) and platform not in existing],
+                'upload_at': self._upload_start(release_at).timestamp()
             }
-            
-            # 准备表单数据和文件
-            with open(audio_path, 'rb') as audio_file:
-                files = {
-                    "audio": (os.path.basename(audio_path), audio_file, "audio/mpeg")
-                }
-                
-                # 使用重试机制
-                for attempt in range(self.max_retries):
-                    try:
-                        response = requests.post(
-                            f"{self.xiaoyuzhou_api_url}/episodes",
-                            headers=headers,
-                            data=metadata,
-                            files=files,
-                            timeout=self.timeout
-                        )
-                        
-                        if response.status_code == 200 or response.status_code == 201:
-                            result = response.json()
-                            return {
-                                "success": True,
-                                "platform": "xiaoyuzhou",
-                                "episode_id": result.get("id", ""),
-                                "episode_url": result.get("url", ""),
-                                "publish_date": metadata["publish_date"]
-                            }
-                        else:
-                            error_message = f"API错误: {response.status_code} - {response.text}"
-                            logger.error(error_message)
-                            
-                            # 如果是最后一次尝试，则抛出异常
-                            if attempt == self.max_retries - 1:
-                                raise APIError(error_message, response.status_code, response.text)
-                            
-                            # 否则等待后重试
-                            time.sleep(2)
-                    except requests.RequestException as e:
-                        if attempt == self.max_retries - 1:
-                            raise PublishingError(f"请求失败: {str(e)}")
-                        time.sleep(2)
-        
-        except Exception as e:
-            logger.error(f"发布到小宇宙平台时出错: {str(e)}")
-            raise PublishingError(f"发布到小宇宙平台失败: {str(e)}")
-    
-    def _publish_to_other_platforms(self, audio_info, content):
-        """发布到其他播客平台"""
-        results = {}
         
-        # 这里可以实现其他平台的发布逻辑
-        # 例如，荔枝FM、喜马拉雅、蜻蜓FM等
+        outbox = PublishOutbox(self.config.publish_queue_path)
+        try:
+            job_ids = outbox.enqueue(audio_info, content, metadata, selected,
+                                     max_attempts=self.config.publish_max_attempts, **schedule)
+        finally:
+            outbox.close()
+        if release_at is not None:
+            logger.info(f"已加入定时发布队列: {audio_info['filename']} -> {', '.join(selected)}，"
+                        f"{release_at:%Y-%m-%d %H:%M} 发布 (任务 {job_ids})")
+        else:
+            logger.info(f"已加入发布队列: {audio_info['filename']} -> {', '.join(selected)} (任务 {job_ids})")
+        return job_ids
+    
+    def next_release_slot(self, now=None):
+        """下一个发布时间点（RELEASE_SLOTS，例如每天07:00）"""
+        now = now or datetime.now()
+        candidates = []
+        for slot in self.config.release_slots:
+            hour, minute = (int(part) for part in slot.split(':'))
+            candidate = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            if candidate <= now:
+                candidate += timedelta(days=1)
+            candidates.append(candidate)
+        if not candidates:
+            raise PodcastError("未配置发布时间点 RELEASE_SLOTS")
+        return min(candidates)
+    
+    def _upload_start(self, release_at, now=None):
+        """
+        草稿最早开始上传的时间: 配置了空闲时段(UPLOAD_IDLE_HOURS)时推迟到下一个空闲时段，
+        但至少在发布前 UPLOAD_LEAD_SECONDS 开始；否则立即上传（仍受令牌桶限速）
+        """
+        now = now or datetime.now()
+        if not self.config.upload_idle_hours:
+            return now
+        start_hour, end_hour = (int(part) for part in self.config.upload_idle_hours.split('-'))
+        hour = now.hour
+        in_window = start_hour <= hour < end_hour if start_hour <= end_hour else (hour >= start_hour or hour < end_hour)
+        if in_window:
+            return now
+        window = now.replace(hour=start_hour, minute=0, second=0, microsecond=0)
+        if window <= now:
+            window += timedelta(days=1)
+        latest = release_at - timedelta(seconds=self.config.upload_lead_seconds)
+        return window if window <= latest else now
+    
+    def build_client(self, platform, max_retries=None):
+        """创建平台客户端"""
+        return PlatformClient(
+            platform,
+            getattr(self.config, f"{platform}_api_key"),
+            getattr(self.config, f"{platform}_api_url"),
+            max_retries=max_retries or self.max_retries,
+            timeout=self.timeout,
+            pool_size=self.config.publish_pool_size,
+            keepalive=self.config.publish_keepalive,
+            chunk_size=self.config.upload_chunk_size,
+            manifest_dir=self.config.upload_manifest_dir
+        )
+    
+    def _is_configured(self, platform):
+        return bool(getattr(self.config, f"{platform}_api_key", None) and getattr(self.config, f"{platform}_api_url", None))
+    
+    def _select_platforms(self, platforms):
+        """解析要发布的平台，未指定时使用所有已配置API密钥的平台"""
+        if not platforms:
+            return [
+                platform for platform in self.supported_platforms
+                if getattr(self.config, f"{platform}_api_key", None)
+            ]
         
-        logger.info("其他播客平台发布功能待实现")
+        selected = []
+        for platform in platforms:
+            platform = platform.strip().lower()
+            if platform not in self.supported_platforms:
+                logger.warning(f"不支持的平台: {platform}，可选: {', '.join(self.supported_platforms)}")
+            elif platform not in selected:
+                selected.append(platform)
+        return selected
+    
+    def _catalog(self):
+        return EpisodeCatalog(self.config.episode_catalog_path)
+    
+    def _unpublished_platforms(self, content, platforms, results):
+        """过滤掉该内容已经成功发布过的平台，已发布的平台直接返回目录中的记录"""
+        catalog = self._catalog()
+        try:
+            published = catalog.published_platforms(content, self.config.podcast_show)
+        finally:
+            catalog.close()
         
-        return results
+        remaining = []
+        for platform in platforms:
+            record = published.get(platform)
+            if record:
+                logger.info(f"该集已发布到{PLATFORM_NAMES[platform]}平台，跳过: {record['url'] or record['platform_episode_id']}")
+                results[platform] = self._skipped_result(platform, record['platform_episode_id'], record['url'], record['published_at'])
+            else:
+                remaining.append(platform)
+        return remaining
     
-    def _determine_category(self, content):
-        """根据内容确定播客分类"""
-        # 基于内容关键词判断分类
-        style = content.get('style', '').lower()
-        topic = content.get('topic', '').lower()
-        
-        # 分类映射
-        if "商业" in style or "财经" in style or "创业" in topic or "投资" in topic:
-            return "business"
-        elif "科技" in style or "技术" in topic or "数码" in topic:
-            return "technology"
-        elif "教育" in topic or "学习" in topic or "知识" in style:
-            return "education"
-        elif "故事" in style or "文学" in topic:
-            return "arts"
-        elif "生活" in style or "健康" in topic:
-            return "health"
-        else:
-            return "society"  # 默认分类
+    def _pending_platforms(self, audio_info, content, platforms, results):
+        """
+        需要上传或更新元数据的平台
+        先按音频哈希检查: 已有相同音频的平台只比较标题和简介，只改了简介也会更新元数据；
+        其余平台再按标题和脚本跳过已经发布过的内容
+        返回: (需要处理的平台列表, {平台: 平台节目ID} 只需更新元数据的平台)
+        """
+        remaining, existing = self.plan_uploads(audio_info, content, platforms, results)
+        unpublished = self._unpublished_platforms(
+            content, [platform for platform in remaining if platform not in existing], results
+        )
+        return [platform for platform in remaining if platform in existing or platform in unpublished], existing
     
-    def _generate_tags(self, content):
-        """生成内容标签"""
+    def plan_uploads(self, audio_info, content, platforms, results):
+        """
+        按音频内容哈希检查各平台的上传记录
+        音频和标题、简介都没变的平台直接跳过；只改了标题或简介的平台只更新元数据
+        返回: (需要处理的平台列表, {平台: 平台节目ID} 只需更新元数据的平台)
+        """
+        if not platforms:
+            return [], {}
+        # 哈希只计算一次，随audio_info保存（入队时一并写入任务）
+        if not audio_info.get('sha256'):
+            audio_info['sha256'] = file_sha256(audio_info['path'])
+        catalog = self._catalog()
+        try:
+            uploads = catalog.uploads_for_audio(audio_info['sha256'])
+        finally:
+            catalog.close()
+        
+        remaining = []
+        existing = {}
+        for platform in platforms:
+            record = uploads.get(platform)
+            if record is None:
+                remaining.append(platform)
+            elif record['title'] == content.get('title') and record['description'] == content.get('description'):
+                logger.info(f"相同的音频已上传到{PLATFORM_NAMES[platform]}平台且信息未变，跳过: {record['url'] or record['platform_episode_id']}")
+                results[platform] = self._skipped_result(platform, record['platform_episode_id'], record['url'], record['updated_at'])
+            else:
+                remaining.append(platform)
+                existing[platform] = record['platform_episode_id']
+        return remaining, existing
+    
+    @staticmethod
+    def _skipped_result(platform, episode_id, episode_url, publish_date):
+        return {
+            "success": True,
+            "platform": platform,
+            "episode_id": episode_id,
+            "episode_url": episode_url,
+            "publish_date": publish_date,
+            "skipped": True
+        }
+    
+    def _check_audio_quality(self, audio_info):
+        """检查音频质检结果，生成阶段没有质检时流式分析一次文件"""
+        if not self.config.qc_enabled:
+            return
+        
+        report = audio_info.get('qc')
+        if report is None:
+            logger.info(f"音频缺少质检结果，开始分析: {audio_info['path']}")
+            report = AudioQCAnalyzer.analyze_file(
+                audio_info['path'],
+                thresholds=self.config.qc_thresholds,
+                spectral_flatness=self.config.qc_spectral_flatness
+            )
+            audio_info['qc'] = report
+        
+        if not report.get('passed', False):
+            raise QualityCheckError(f"音频质检未通过，取消发布: {'; '.join(report.get('failures', []))}", report)
+    
+    def _build_metadata(self, content, audio_sha256=None):
+        """各平台发布所需的元数据，集号从节目目录中原子分配（音频已登记过时沿用原集号）"""
+        catalog = self._catalog()
+        try:
+            episode = (audio_sha256 and catalog.episode_for_audio(audio_sha256)) or \
+                catalog.register(content, self.config.podcast_show, self.config.podcast_season)
+        finally:
+            catalog.close()
+        
+        classification = self._classify(content)
+        return {
+            "title": content['title'],
+            "description": content['description'],
+            "slug": slugify(content['title']),
+            "publish_date": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+            "category": self._determine_category(content, classification),
+            "tags": self._generate_tags(content, classification),
+            "explicit": False,  # 是否包含成人内容
+            "season": episode['season'],  # 季数
+            "episode": episode['episode']  # 集数
+        }
+    
+    def _classify(self, content):
+        """关键词分类结果（一次生成元数据内只扫描一次）"""
+        return get_keyword_classifier(self.config.keyword_dict_path).classify(content, top_tags=5)
+    
+    def _determine_category(self, content, classification=None):
+        """根据风格、话题、标题和全文的关键词确定播客分类"""
+        classification = classification or self._classify(content)
+        if classification['categories']:
+            return classification['categories'][0][0]
+        return "society"  # 默认分类
+    
+    def _generate_tags(self, content, classification=None):
+        """生成内容标签: 风格 + 命中最多的关键词 + 自定义标签"""
+        classification = classification or self._classify(content)
         tags = []
         
         # 添加风格标签
-        if 'style' in content:
+        if content.get('style'):
             tags.append(content['style'])
         
-        # 添加主题标签
-        if 'topic' in content:
-            # 将主题分割为关键词
-            keywords = content['topic'].split()
-            tags.extend(keywords[:3])  # 最多取3个关键词
+        # 添加关键词标签
+        tags.extend(classification['tags'])
         
         # 添加自定义标签
         custom_tags = ["播客", "AI生成", "zaka播客"]
         tags.extend(custom_tags)
         
-        # 去重并限制数量
-        unique_tags = list(set(tags))
+        # 按顺序去重并限制数量
+        unique_tags = list(dict.fromkeys(tags))
         return unique_tags[:5]  # 最多5个标签
     
-    def _get_next_episode_number(self):
-        """获取下一集编号"""
-        # 这里可以实现从数据库或文件读取当前最大集号
-        # 简单起见，这里使用当前日期作为集号
-        return int(datetime.now().strftime("%Y%m%d"))
+    def record_publish_result(self, audio_info, content, platform, result):
+        """记录队列中单个平台任务的最终结果"""
+        self._log_publish_results(audio_info, content, {platform: result})
     
     def _log_publish_results(self, audio_info, content, results):
         """记录发布结果"""
-        # 准备日志数据
-        log_data = {
-            "timestamp": datetime.now().isoformat(),
-            "title": content['title'],
-            "audio_info": {
-                "filename": audio_info['filename'],
-                "duration": audio_info['duration'],
-                "size": audio_info['size']
-            },
-            "publish_results": results
-        }
+        # 目录中已有记录而跳过的平台不重复记录
+        results = {platform: result for platform, result in results.items() if not result.get('skipped')}
+        if not results:
+            return
         
-        # 写入日志文件
-        log_file = os.path.join("logs", "publish_history.json")
+        # 没有时长或码率时读取文件头补全（不解码）
+        probe = {}
+        if not audio_info.get('duration') or not audio_info.get('bitrate'):
+            try:
+                probe = probe_audio(audio_info['path'])
+            except (OSError, PodcastError) as e:
+                logger.warning(f"无法读取音频信息: {str(e)}")
         
-        # 确保日志目录存在
-        os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        audio_info = dict(
+            audio_info,
+            duration=audio_info.get('duration') or probe.get('duration', 0),
+            bitrate=audio_info.get('bitrate') or probe.get('bitrate')
+        )
         
-        # 读取现有日志（如果存在）
-        existing_logs = []
-        if os.path.exists(log_file):
-            try:
-                with open(log_file, 'r', encoding='utf-8') as f:
-                    existing_logs = json.load(f)
-            except:
-                # 如果读取失败，使用空列表
-                logger.warning("无法读取现有发布日志，将创建新日志文件")
-        
-        # 添加新日志
-        existing_logs.append(log_data)
-        
-        # 写入文件
-        with open(log_file, 'w', encoding='utf-8') as f:
-            json.dump(existing_logs, f, ensure_ascii=False, indent=2) 
\ No newline at end of file
+        # 追加到发布历史（不读取、不重写已有记录）
+        history = PublishHistory(self.config.publish_history_path)
+        try:
+            history.record(audio_info, content, results)
+        finally:
+            history.close()
+        
+        # 在节目目录中记录音频版本、各平台的节目ID和已上传的音频
+        audio_sha256 = audio_info.get('sha256')
+        catalog = self._catalog()
+        try:
+            episode = (audio_sha256 and catalog.episode_for_audio(audio_sha256)) or \
+                catalog.register(content, self.config.podcast_show, self.config.podcast_season)
+            catalog.add_rendition(episode['id'], audio_info)
+            if any(result.get('updated') for result in results.values()):
+                catalog.update_content(episode['id'], content)
+            for platform, result in results.items():
+                if result.get('success'):
+                    catalog.record_platform(episode['id'], platform, result)
+                    if audio_sha256:
+                        catalog.record_upload(episode['id'], platform, audio_sha256, result, content)
+        finally:
+            catalog.close()
+        
+        if self.config.feed_enabled and any(result.get('success') for result in results.values()):
+            self._update_feed(episode, content, audio_info)
+    
+    def _update_feed(self, episode, content, audio_info):
+        """把这一集写入自托管RSS，其余条目不重新渲染"""
+        feed = PodcastFeed(
+            self.config.feed_dir,
+            base_url=self.config.feed_base_url,
+            title=self.config.feed_title,
+            description=self.config.feed_description,
+            author=self.config.feed_author,
+            language=self.config.feed_language,
+            image_url=self.config.feed_image_url,
+            max_items=self.config.feed_max_items
+        )
+        try:
+            guid = f"{episode['show']}-s{episode['season']}e{episode['episode']}"
+            validators = feed.add_item(guid, content, audio_info, episode['season'], episode['episode'])
+            logger.info(f"RSS已更新: {guid} ({validators['items']} 集, ETag {validators['etag']})")
+        except OSError as e:
+            logger.error(f"更新RSS失败: {str(e)}")
+        finally:
+            feed.close()
\ No newline at end of file
@@ -5,6 +5,19 @@
 """
 
 class PodcastTemplates:
+    # 默认音效链，风格中的 "effects" 可以按阶段覆盖
+    # title: 标题语音, voice: 主体语音, master: 混入背景音乐之后的整体处理
+    DEFAULT_EFFECTS = {
+        "title": [
+            {"type": "gain", "db": 3},
+            {"type": "fade_in", "ms": 300}
+        ],
+        "voice": [
+            {"type": "normalize", "target_dbfs": -15.0}
+        ],
+        "master": []
+    }
+    
     # 热门播客风格类型
     PODCAST_STYLES = {
         "知识型": {
@@ -32,6 +45,13 @@ class PodcastTemplates:
         "故事型": {
             "description": "讲述引人入胜的故事，类似《故事FM》、《一千零一夜》风格",
             "tone": "温暖、私密、沉浸式",
+            "effects": {
+                "voice": [
+                    {"type": "eq", "kind": "lowshelf", "freq": 200, "db": 2},
+                    {"type": "compressor", "threshold_db": -24, "ratio": 2.5, "attack_ms": 20, "release_ms": 200},
+                    {"type": "normalize", "target_dbfs": -16.0}
+                ]
+            },
             "structure": [
                 "悬念开场",
                 "主角介绍",
@@ -56,6 +76,13 @@ class PodcastTemplates:
         "对话型": {
             "description": "模拟访谈对话，类似《十三邀》、《变形记》风格",
             "tone": "轻松、幽默、思辨",
+            "multi_speaker": True,
+            "effects": {
+                "voice": [
+                    {"type": "compressor", "threshold_db": -22, "ratio": 3, "attack_ms": 10, "release_ms": 150},
+                    {"type": "normalize", "target_dbfs": -15.0}
+                ]
+            },
             "structure": [
                 "嘉宾介绍",
                 "热场话题",
@@ -74,6 +101,7 @@ class PodcastTemplates:
             4. 对话要有张力和交锋点
             5. 语言风格要自然、幽默、富有个性
             6. 通过对话展现{topic}的多个维度和观点
+            7. 每段发言单独成行，并以“主持人：”或“嘉宾：”开头
             """
         },
         
@@ -126,6 +154,17 @@ class PodcastTemplates:
         "科技新知": {
             "description": "解读前沿科技和数码产品，类似《硅谷101》、《极客电台》风格",
             "tone": "前沿、专业、通俗易懂",
+            "effects": {
+                "title": [
+                    {"type": "gain", "db": 4},
+                    {"type": "fade_in", "ms": 150}
+                ],
+                "voice": [
+                    {"type": "eq", "kind": "highpass", "freq": 80},
+                    {"type": "eq", "kind": "peaking", "freq": 3000, "q": 1.0, "db": 2},
+                    {"type": "normalize", "target_dbfs": -14.0}
+                ]
+            },
             "structure": [
                 "科技新闻导入",
                 "技术原理解析",
@@ -201,6 +240,21 @@ class PodcastTemplates:
             }
         return None
     
+    @staticmethod
+    def is_multi_speaker(style_name):
+        """判断指定风格是否按多说话人渲染"""
+        style = PodcastTemplates.PODCAST_STYLES.get(style_name, {})
+        return style.get("multi_speaker", False)
+    
+    @staticmethod
+    def get_effects(style_name, stage):
+        """获取指定风格在某个处理阶段的音效链配置"""
+        style = PodcastTemplates.PODCAST_STYLES.get(style_name, {})
+        effects = style.get("effects", {})
+        if stage in effects:
+            return effects[stage]
+        return PodcastTemplates.DEFAULT_EFFECTS.get(stage, [])
+    
     @staticmethod
     def get_trending_topics():
         """获取当前热门话题"""
@@ -0,0 +1,230 @@
+import os
+import asyncio
+import contextlib
+import aiohttp
+from logger import logger
+from exceptions import PublishingError, APIError
+from chunked_upload import ChunkedUploader
+
+# 平台显示名称
+PLATFORM_NAMES = {
+    "xiaoyuzhou": "小宇宙",
+    "lizhi": "荔枝FM",
+    "ximalaya": "喜马拉雅",
+    "qingting": "蜻蜓FM"
+}
+
+def is_retryable(error):
+    """客户端错误（认证失败、参数错误等）重试也不会成功；限流、超时和服务端错误可以重试"""
+    if isinstance(error, APIError) and error.status_code is not None:
+        return error.status_code >= 500 or error.status_code in (408, 429)
+    return True
+
+class PlatformClient:
+    """
+    单个平台的发布客户端
+    每个平台持有一个aiohttp会话，连接池保持长连接，同一平台的多次请求复用TCP/TLS连接
+    """
+
+    # 创建节目的接口路径和音频文件的表单字段名
+    episodes_path = "/episodes"
+    file_field = "audio"
+    # 两次重试之间的等待（秒）
+    retry_delay = 2
+
+    def __init__(self, name, api_key, api_url, max_retries=3, timeout=30, pool_size=4, keepalive=60,
+                 chunk_size=0, manifest_dir="data/uploads"):
+        """
+        chunk_size: 文件大于该值时使用分块断点续传，0表示始终整体上传
+        manifest_dir: 分块上传进度清单目录
+        """
+        self.name = name
+        self.display_name = PLATFORM_NAMES.get(name, name)
+        self.api_key = api_key
+        self.api_url = api_url.rstrip('/')
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.chunk_size = chunk_size
+        self.manifest_dir = manifest_dir
+        self.session = None
+
+    async def open(self):
+        """在事件循环中创建会话（aiohttp会话必须在运行中的事件循环内创建）"""
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Accept": "application/json"
+                },
+                # 上传大文件时不限制总时长，只限制连接和两次读写之间的间隔
+                timeout=aiohttp.ClientTimeout(total=None, connect=self.timeout, sock_read=self.timeout)
+            )
+        return self
+
+    async def close(self):
+        if self.session is not None and not self.session.closed:
+            await self.session.close()
+
+    def _form(self, audio_path, metadata, audio_file):
+        """构造multipart表单，音频文件以文件对象流式发送，不整体读入内存"""
+        form = aiohttp.FormData()
+        for key, value in metadata.items():
+            if isinstance(value, (list, tuple)):
+                value = ",".join(str(item) for item in value)
+            elif isinstance(value, bool):
+                value = "true" if value else "false"
+            form.add_field(key, str(value))
+        form.add_field(self.file_field, audio_file, filename=os.path.basename(audio_path), content_type="audio/mpeg")
+        return form
+
+    def _result(self, data, metadata):
+        """把平台响应转换为统一的发布结果"""
+        return {
+            "success": True,
+            "platform": self.name,
+            "episode_id": str(data.get("id", "")),
+            "episode_url": data.get("url", ""),
+            "publish_date": metadata["publish_date"]
+        }
+
+    async def _request_with_retry(self, method, url, ok_statuses=(200, 201), **kwargs):
+        """
+        发送请求，失败时最多尝试max_retries次（至少一次），返回响应JSON
+        data可以是可调用对象: 每次尝试调用 data(stack) 重新构造请求体（例如重新打开音频文件），
+        打开的文件登记到stack，请求结束后关闭
+        不可重试的错误（认证失败、参数错误、404等4xx）立即抛出APIError；重试用尽时抛出最后一次的错误
+        """
+        attempts = max(1, self.max_retries)
+        for attempt in range(attempts):
+            with contextlib.ExitStack() as stack:
+                request_kwargs = dict(kwargs)
+                if callable(request_kwargs.get("data")):
+                    request_kwargs["data"] = request_kwargs["data"](stack)
+                try:
+                    async with self.session.request(method, url, **request_kwargs) as response:
+                        if response.status in ok_statuses:
+                            if response.status == 204:
+                                return {}
+                            return await response.json(content_type=None) or {}
+                        text = await response.text()
+                        error = APIError(f"API错误: {response.status} - {text[:500]}", response.status, text)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    error = PublishingError(f"请求失败: {str(e) or type(e).__name__}")
+            if not is_retryable(error) or attempt == attempts - 1:
+                raise error
+            logger.warning(f"{self.display_name} {str(error)}，{self.retry_delay} 秒后重试")
+            await asyncio.sleep(self.retry_delay)
+
+    async def publish(self, audio_path, metadata, episode_id=None):
+        """
+        上传音频并创建节目，失败时按max_retries重试；大文件分块断点续传
+        episode_id: 平台上已有相同音频的节目时只更新元数据，节目已不存在时重新上传
+        """
+        await self.open()
+        if episode_id:
+            try:
+                return await self.update_metadata(episode_id, metadata)
+            except APIError as e:
+                if e.status_code != 404:
+                    raise
+                logger.warning(f"{self.display_name}平台上的节目 {episode_id} 已不存在，重新上传")
+        
+        if self.chunk_size and os.path.getsize(audio_path) > self.chunk_size:
+            return await self._publish_chunked(audio_path, metadata)
+        
+        def form(stack):
+            # 每次重试重新打开文件，从头发送
+            return self._form(audio_path, metadata, stack.enter_context(open(audio_path, 'rb')))
+        
+        data = await self._request_with_retry("POST", f"{self.api_url}{self.episodes_path}", data=form)
+        return self._result(data, metadata)
+
+    async def update_metadata(self, episode_id, metadata):
+        """只更新平台上已有节目的元数据（标题、简介等），不重新上传音频"""
+        await self.open()
+        data = await self._request_with_retry(
+            "PATCH", f"{self.api_url}{self.episodes_path}/{episode_id}", ok_statuses=(200, 201, 204), json=metadata
+        )
+        result = self._result(dict({"id": episode_id}, **data), metadata)
+        result["updated"] = True
+        return result
+
+    async def release(self, episode_id, metadata):
+        """发布已上传的草稿（轻量请求，不传输音频）"""
+        await self.open()
+        data = await self._request_with_retry(
+            "POST", f"{self.api_url}{self.episodes_path}/{episode_id}/publish",
+            json={"publish_date": metadata["publish_date"]}
+        )
+        return self._result(dict({"id": episode_id}, **data), metadata)
+
+    async def _publish_chunked(self, audio_path, metadata):
+        """分块上传音频后用upload_id创建节目"""
+        uploader = ChunkedUploader(
+            self.session, self.api_url, self.name,
+            chunk_size=self.chunk_size,
+            manifest_dir=self.manifest_dir,
+            max_retries=self.max_retries,
+            retry_delay=self.retry_delay
+        )
+        upload_id = await uploader.upload(audio_path)
+        
+        data = await self._request_with_retry(
+            "POST", f"{self.api_url}{self.episodes_path}", json=dict(metadata, upload_id=upload_id)
+        )
+        # 清单保留到节目创建成功，创建失败时重试不需要重新上传
+        uploader.discard(audio_path)
+        return self._result(data, metadata)
+
+
+class PublishEngine:
+    """
+    并发发布引擎: 同时向所有选中的平台上传，总耗时取决于最慢的平台而不是各平台之和
+    一个平台失败不影响其他平台，结果按平台汇总
+    """
+
+    def __init__(self, clients):
+        self.clients = {client.name: client for client in clients}
+
+    async def __aenter__(self):
+        for client in self.clients.values():
+            await client.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        await asyncio.gather(*(client.close() for client in self.clients.values()), return_exceptions=True)
+
+    async def _publish_one(self, client, audio_path, metadata, episode_id=None):
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        if episode_id:
+            logger.info(f"音频已在{client.display_name}平台上，只更新元数据: {episode_id}")
+        else:
+            logger.info(f"开始发布到{client.display_name}平台")
+        try:
+            result = await client.publish(audio_path, metadata, episode_id)
+            logger.info(f"成功发布到{client.display_name}平台: {result.get('episode_id', '')}")
+        except Exception as e:
+            logger.error(f"{client.display_name}平台发布失败: {str(e)}")
+            result = {"success": False, "platform": client.name, "error": str(e)}
+        result["elapsed"] = round(loop.time() - started, 2)
+        return client.name, result
+
+    async def publish(self, audio_path, metadata, existing=None):
+        """
+        并发发布到所有平台，返回 {平台: 结果}
+        existing: dict {平台: 平台节目ID}，这些平台已有相同音频，只更新元数据
+        """
+        existing = existing or {}
+        results = await asyncio.gather(*(
+            self._publish_one(client, audio_path, metadata, existing.get(client.name))
+            for client in self.clients.values()
+        ))
+        return dict(results)
\ No newline at end of file
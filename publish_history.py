@@ -0,0 +1,200 @@
+import os
+import json
+import uuid
+import sqlite3
+from datetime import datetime
+from slugify import slugify
+from logger import logger
+
+class PublishHistory:
+    """
+    发布历史（SQLite）
+    每次发布的每个平台结果追加一行，写入是单条事务内的插入，与历史条数无关；
+    SQLite的文件锁保证多个发布进程同时写入不会损坏（Windows上同样有效）。
+    按日期、slug、平台和状态建立索引，几万集的历史也能快速查询。
+    """
+
+    def __init__(self, db_path="data/publish_history.db", legacy_path=os.path.join("logs", "publish_history.json")):
+        self.db_path = db_path
+        self.legacy_path = legacy_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS publish_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                publish_id TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                date TEXT NOT NULL,
+                title TEXT NOT NULL,
+                slug TEXT NOT NULL,
+                filename TEXT,
+                duration REAL,
+                size REAL,
+                bitrate INTEGER,
+                platform TEXT NOT NULL,
+                status TEXT NOT NULL,
+                episode_id TEXT,
+                episode_url TEXT,
+                error TEXT,
+                result TEXT
+            )
+        """)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS publish_history_meta (key TEXT PRIMARY KEY, value TEXT)")
+        for column in ("date", "slug", "platform", "status"):
+            self.connection.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_publish_history_{column} ON publish_history ({column}, timestamp)"
+            )
+        self._migrate_legacy()
+
+    def close(self):
+        self.connection.close()
+
+    def _rows(self, audio_info, content, results, timestamp):
+        publish_id = uuid.uuid4().hex
+        rows = [
+            (
+                publish_id, timestamp, timestamp[:10], content['title'], slugify(content['title']),
+                audio_info.get('filename'), audio_info.get('duration'), audio_info.get('size'), audio_info.get('bitrate'),
+                platform, "success" if result.get('success') else "failed",
+                result.get('episode_id'), result.get('episode_url'), result.get('error'),
+                json.dumps(result, ensure_ascii=False)
+            )
+            for platform, result in results.items()
+        ]
+        return publish_id, rows
+
+    def _insert(self, rows):
+        self.connection.executemany(
+            """
+            INSERT INTO publish_history
+                (publish_id, timestamp, date, title, slug, filename, duration, size, bitrate,
+                 platform, status, episode_id, episode_url, error, result)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            rows
+        )
+
+    def record(self, audio_info, content, results, timestamp=None):
+        """
+        追加一次发布的结果
+        audio_info: dict 包含filename、duration、size、bitrate
+        results: dict {平台: 结果}
+        返回: str 本次发布的publish_id
+        """
+        publish_id, rows = self._rows(audio_info, content, results, timestamp or datetime.now().isoformat())
+        if rows:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert(rows)
+                self.connection.execute("COMMIT")
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+        return publish_id
+
+    def query(self, date_from=None, date_to=None, slug=None, platform=None, status=None, limit=100, offset=0):
+        """
+        查询发布记录，按时间倒序
+        date_from/date_to: 'YYYY-MM-DD'（含）
+        status: 'success' 或 'failed'
+        """
+        conditions = []
+        params = []
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        if slug:
+            conditions.append("slug = ?")
+            params.append(slug)
+        if platform:
+            conditions.append("platform = ?")
+            params.append(platform)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.connection.execute(
+            f"SELECT * FROM publish_history {where} ORDER BY timestamp DESC, id DESC LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        records = []
+        for row in rows:
+            record = dict(row)
+            record['result'] = json.loads(record['result']) if record['result'] else {}
+            records.append(record)
+        return records
+
+    def summary(self, date_from=None, date_to=None):
+        """按平台统计成功和失败次数 {平台: {'success': n, 'failed': n}}"""
+        conditions = []
+        params = []
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        summary = {}
+        for row in self.connection.execute(
+            f"SELECT platform, status, COUNT(*) AS count FROM publish_history {where} GROUP BY platform, status",
+            params
+        ):
+            summary.setdefault(row['platform'], {'success': 0, 'failed': 0})[row['status']] = row['count']
+        return summary
+
+    def last_published(self, slug, platform):
+        """某一集在某个平台最近一次成功发布的记录，没有时返回None"""
+        records = self.query(slug=slug, platform=platform, status="success", limit=1)
+        return records[0] if records else None
+
+    def _migrate_legacy(self):
+        """
+        把旧的 logs/publish_history.json 导入数据库，导入后重命名为 .migrated
+        导入和完成标记在同一个事务中，多个进程同时启动时只会导入一次
+        """
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
+        try:
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"无法读取旧的发布日志，跳过导入: {str(e)}")
+            return
+
+        imported = 0
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            marker = self.connection.execute(
+                "SELECT value FROM publish_history_meta WHERE key = 'legacy_migrated'"
+            ).fetchone()
+            if marker is None:
+                for entry in entries:
+                    try:
+                        _, rows = self._rows(entry.get('audio_info', {}), entry,
+                                             entry.get('publish_results', {}), entry['timestamp'])
+                    except (KeyError, TypeError, AttributeError) as e:
+                        logger.warning(f"跳过无法导入的发布记录: {str(e)}")
+                        continue
+                    self._insert(rows)
+                    imported += 1
+                self.connection.execute(
+                    "INSERT INTO publish_history_meta (key, value) VALUES ('legacy_migrated', ?)",
+                    (datetime.now().isoformat(),)
+                )
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+
+        try:
+            os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+        except OSError as e:
+            logger.warning(f"重命名旧的发布日志失败: {str(e)}")
+        if imported:
+            logger.info(f"已导入旧的发布日志 {imported} 条: {self.legacy_path}")
\ No newline at end of file
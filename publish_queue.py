@@ -0,0 +1,540 @@
+import os
+import json
+import time
+import uuid
+import random
+import sqlite3
+import asyncio
+from logger import logger
+from publish_engine import PLATFORM_NAMES, is_retryable
+
+# 任务状态
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# 任务阶段: 上传（定时任务上传为草稿）和到点发布草稿
+UPLOAD = "upload"
+RELEASE = "release"
+
+class PublishOutbox:
+    """
+    持久化发布队列（SQLite发件箱）
+    每个 (节目, 平台) 一条任务，记录状态、尝试次数、下次重试时间和租约。
+    生成流程只负责入队，由独立的worker进程取出上传；进程崩溃时任务不会丢失，
+    租约过期的running任务会被重新领取。
+    定时任务带有发布时间(release_at): 支持草稿的平台先上传草稿，然后转入release阶段，
+    到发布时间才调用发布接口；不支持草稿的平台到发布时间才上传。
+    """
+
+    def __init__(self, db_path="data/publish_queue.db"):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        self.connection = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS publish_jobs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                episode_key TEXT NOT NULL,
+                platform TEXT NOT NULL,
+                audio_info TEXT NOT NULL,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                locked_by TEXT,
+                lease_until REAL,
+                last_error TEXT,
+                result TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                phase TEXT NOT NULL DEFAULT 'upload',
+                draft INTEGER NOT NULL DEFAULT 0,
+                release_at REAL,
+                UNIQUE (episode_key, platform)
+            )
+        """)
+        # 旧版本的队列没有定时发布相关的列
+        columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(publish_jobs)")}
+        for column, definition in (("phase", "TEXT NOT NULL DEFAULT 'upload'"),
+                                   ("draft", "INTEGER NOT NULL DEFAULT 0"),
+                                   ("release_at", "REAL")):
+            if column not in columns:
+                self.connection.execute(f"ALTER TABLE publish_jobs ADD COLUMN {column} {definition}")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS idx_publish_jobs_ready ON publish_jobs (platform, state, next_attempt_at)"
+        )
+        # 每个平台的上传令牌桶，多个worker进程共享
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                platform TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def _job(row):
+        if row is None:
+            return None
+        job = dict(row)
+        for key in ("audio_info", "content", "metadata", "result"):
+            if job.get(key):
+                job[key] = json.loads(job[key])
+        return job
+
+    def enqueue(self, audio_info, content, metadata, platforms, max_attempts=8,
+                release_at=None, drafts=(), upload_at=None):
+        """
+        为每个平台添加一条发布任务，返回任务ID列表
+        同一节目同一平台已有未完成的任务时忽略（按音频路径识别节目），已结束的任务重新排队
+        release_at: 定时发布的时间戳，None表示立即发布
+        drafts: 提前上传草稿的平台，其余平台到release_at才上传
+        upload_at: 草稿最早开始上传的时间戳，默认立即
+        """
+        now = time.time()
+        episode_key = os.path.abspath(audio_info['path'])
+        job_ids = []
+        for platform in platforms:
+            draft = release_at is not None and platform in drafts
+            if release_at is None:
+                next_attempt_at = now
+            elif draft:
+                next_attempt_at = min(upload_at or now, release_at)
+            else:
+                next_attempt_at = release_at
+            # 已结束（完成或失败）的任务按新的内容重新排队，例如只改了标题后再次发布
+            row = self.connection.execute(
+                """
+                INSERT INTO publish_jobs
+                    (episode_key, platform, audio_info, content, metadata, max_attempts, next_attempt_at,
+                     created_at, updated_at, draft, release_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (episode_key, platform) DO UPDATE SET
+                    audio_info = excluded.audio_info, content = excluded.content, metadata = excluded.metadata,
+                    state = 'pending', phase = 'upload', attempts = 0, max_attempts = excluded.max_attempts,
+                    next_attempt_at = excluded.next_attempt_at, last_error = NULL, result = NULL,
+                    draft = excluded.draft, release_at = excluded.release_at, updated_at = excluded.updated_at
+                WHERE publish_jobs.state IN ('done', 'failed')
+                RETURNING id
+                """,
+                (episode_key, platform, json.dumps(audio_info, ensure_ascii=False),
+                 json.dumps(content, ensure_ascii=False), json.dumps(metadata, ensure_ascii=False),
+                 max_attempts, next_attempt_at, now, now, int(draft), release_at)
+            ).fetchone()
+            if row is not None:
+                job_ids.append(row["id"])
+            else:
+                logger.info(f"{PLATFORM_NAMES.get(platform, platform)}平台的发布任务已在队列中: {audio_info['filename']}")
+        return job_ids
+
+    def claim(self, platform, worker_id, lease_seconds, phase=None):
+        """
+        原子地领取一条到期的任务（pending且到了重试时间，或running但租约已过期）
+        phase: 只领取该阶段的任务，None表示不限
+        返回任务字典，没有可领取的任务时返回None
+        """
+        now = time.time()
+        row = self.connection.execute(
+            f"""
+            UPDATE publish_jobs
+            SET state = 'running', locked_by = ?, lease_until = ?, attempts = attempts + 1, updated_at = ?
+            WHERE id = (
+                SELECT id FROM publish_jobs
+                WHERE platform = ?
+                  AND ((state = 'pending' AND next_attempt_at <= ?) OR (state = 'running' AND lease_until < ?))
+                  {"AND phase = ?" if phase else ""}
+                ORDER BY next_attempt_at
+                LIMIT 1
+            )
+            RETURNING *
+            """,
+            (worker_id, now + lease_seconds, now, platform, now, now) + ((phase,) if phase else ())
+        ).fetchone()
+        return self._job(row)
+
+    def renew(self, job_id, worker_id, lease_seconds):
+        """续租，上传时间较长的任务不会被其他worker重新领取"""
+        self.connection.execute(
+            "UPDATE publish_jobs SET lease_until = ? WHERE id = ? AND locked_by = ? AND state = 'running'",
+            (time.time() + lease_seconds, job_id, worker_id)
+        )
+
+    def complete(self, job_id, result):
+        self.connection.execute(
+            """
+            UPDATE publish_jobs
+            SET state = 'done', result = ?, last_error = NULL, locked_by = NULL, lease_until = NULL, updated_at = ?
+            WHERE id = ?
+            """,
+            (json.dumps(result, ensure_ascii=False), time.time(), job_id)
+        )
+
+    def stage_release(self, job_id, result):
+        """草稿已上传: 转入release阶段，到发布时间再领取（尝试次数清零）"""
+        self.connection.execute(
+            """
+            UPDATE publish_jobs
+            SET state = 'pending', phase = 'release', attempts = 0, result = ?, last_error = NULL,
+                next_attempt_at = COALESCE(release_at, ?), locked_by = NULL, lease_until = NULL, updated_at = ?
+            WHERE id = ?
+            """,
+            (json.dumps(result, ensure_ascii=False), time.time(), time.time(), job_id)
+        )
+
+    def take_token(self, platform, per_hour, burst=2):
+        """
+        从平台的令牌桶取一个上传令牌，取到返回True
+        令牌按 per_hour/3600 每秒的速度补充，最多积累burst个；per_hour<=0表示不限速
+        """
+        if per_hour <= 0:
+            return True
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.connection.execute(
+                "SELECT tokens, updated_at FROM rate_buckets WHERE platform = ?", (platform,)
+            ).fetchone()
+            tokens = burst if row is None else min(burst, row["tokens"] + (now - row["updated_at"]) * per_hour / 3600)
+            taken = tokens >= 1
+            self.connection.execute(
+                """
+                INSERT INTO rate_buckets (platform, tokens, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT (platform) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+                """,
+                (platform, tokens - 1 if taken else tokens, now)
+            )
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return taken
+
+    def return_token(self, platform, burst=2):
+        """取了令牌但没有可上传的任务时归还"""
+        self.connection.execute(
+            "UPDATE rate_buckets SET tokens = MIN(tokens + 1, ?) WHERE platform = ?", (burst, platform)
+        )
+
+    def retry(self, job_id, error, delay):
+        """放回队列，delay秒后重试"""
+        now = time.time()
+        self.connection.execute(
+            """
+            UPDATE publish_jobs
+            SET state = 'pending', last_error = ?, next_attempt_at = ?, locked_by = NULL, lease_until = NULL, updated_at = ?
+            WHERE id = ?
+            """,
+            (error, now + delay, now, job_id)
+        )
+
+    def release(self, job_id):
+        """熔断等原因未实际执行，退回尝试次数并立即放回队列"""
+        self.connection.execute(
+            """
+            UPDATE publish_jobs
+            SET state = 'pending', attempts = MAX(attempts - 1, 0), locked_by = NULL, lease_until = NULL, updated_at = ?
+            WHERE id = ?
+            """,
+            (time.time(), job_id)
+        )
+
+    def fail(self, job_id, error):
+        """不再重试"""
+        self.connection.execute(
+            """
+            UPDATE publish_jobs
+            SET state = 'failed', last_error = ?, locked_by = NULL, lease_until = NULL, updated_at = ?
+            WHERE id = ?
+            """,
+            (error, time.time(), job_id)
+        )
+
+    def requeue_failed(self, platform=None):
+        """把失败的任务重新放回队列（尝试次数清零），返回任务数"""
+        now = time.time()
+        query = "UPDATE publish_jobs SET state = 'pending', attempts = 0, next_attempt_at = ?, updated_at = ? WHERE state = 'failed'"
+        params = [now, now]
+        if platform:
+            query += " AND platform = ?"
+            params.append(platform)
+        return self.connection.execute(query, params).rowcount
+
+    def get(self, job_id):
+        return self._job(self.connection.execute("SELECT * FROM publish_jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def platforms(self):
+        """队列中有未完成任务的平台"""
+        rows = self.connection.execute(
+            "SELECT DISTINCT platform FROM publish_jobs WHERE state IN ('pending', 'running')"
+        ).fetchall()
+        return [row["platform"] for row in rows]
+
+    def next_due(self, after=None):
+        """最早一条待执行任务的时间（after: 只看该时间之后到期的任务），没有时返回None"""
+        row = self.connection.execute(
+            """
+            SELECT MIN(due) AS due FROM (
+                SELECT CASE WHEN state = 'pending' THEN next_attempt_at ELSE lease_until END AS due
+                FROM publish_jobs WHERE state IN ('pending', 'running')
+            ) WHERE due > ?
+            """,
+            (after if after is not None else float('-inf'),)
+        ).fetchone()
+        return row["due"]
+
+    def stats(self):
+        """按平台和状态统计任务数 {平台: {状态: 数量}}"""
+        stats = {}
+        for row in self.connection.execute(
+            "SELECT platform, state, COUNT(*) AS count FROM publish_jobs GROUP BY platform, state"
+        ):
+            stats.setdefault(row["platform"], {})[row["state"]] = row["count"]
+        return stats
+
+
+class CircuitBreaker:
+    """
+    平台熔断器: 连续失败达到阈值后打开，reset_seconds内不再向该平台发请求；
+    之后进入半开状态只放行一个请求试探，成功则关闭，失败则重新打开
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=300):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """是否允许发起请求；半开状态下同时只允许一个试探请求"""
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+
+class PublishWorker:
+    """
+    发布队列worker: 从发件箱领取任务上传
+    - 每个平台一个长连接客户端和一个并发上限
+    - 失败按指数退避加随机抖动重试，达到最大尝试次数后标记失败
+    - 每个平台一个熔断器，平台持续故障时暂停领取该平台的任务，不影响其他平台
+    - 每个平台一个上传令牌桶，限制每小时的上传次数；到点发布草稿的请求不消耗令牌
+    """
+
+    def __init__(self, outbox, publisher, concurrency=2, backoff_base=5.0, backoff_max=1800.0,
+                 breaker_threshold=5, breaker_reset=300.0, lease_seconds=120.0, poll_seconds=2.0,
+                 rate_limits=None, bucket_burst=2):
+        """
+        rate_limits: dict {平台: 每小时上传次数}，未列出或<=0表示不限速
+        bucket_burst: 令牌桶容量，空闲后最多连续上传的次数
+        """
+        self.outbox = outbox
+        self.publisher = publisher
+        self.concurrency = concurrency
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.rate_limits = rate_limits or {}
+        self.bucket_burst = bucket_burst
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.clients = {}
+        self.breakers = {}
+        self.running = {}
+        self.processed = 0
+
+    def backoff(self, attempts):
+        """指数退避加抖动: 上限内的 base*2^(n-1)，实际等待在其一半到全部之间随机"""
+        delay = min(self.backoff_max, self.backoff_base * 2 ** max(attempts - 1, 0))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def _client(self, platform):
+        if platform not in self.clients:
+            # 重试由队列负责，客户端每次只尝试一次
+            self.clients[platform] = self.publisher.build_client(platform, max_retries=1)
+        return self.clients[platform]
+
+    def _breaker(self, platform):
+        if platform not in self.breakers:
+            self.breakers[platform] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        return self.breakers[platform]
+
+    async def _keep_lease(self, job_id):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            self.outbox.renew(job_id, self.worker_id, self.lease_seconds)
+
+    async def _process(self, job):
+        platform = job["platform"]
+        name = PLATFORM_NAMES.get(platform, platform)
+        breaker = self._breaker(platform)
+        lease = asyncio.create_task(self._keep_lease(job["id"]))
+        try:
+            client = self._client(platform)
+            if job["phase"] == RELEASE:
+                # 草稿已上传，到点只调用发布接口
+                episode_id = job["result"]["episode_id"]
+                logger.info(f"发布任务 #{job['id']} 到达发布时间，发布{name}平台的草稿: {episode_id}")
+                result = await client.release(episode_id, job["metadata"])
+                await self._finish(job, result)
+                return
+            
+            # 入队后相同音频可能已被其他任务上传，按音频哈希再检查一次
+            skipped = {}
+            _, existing = await asyncio.to_thread(self.publisher.plan_uploads, job["audio_info"], job["content"], [platform], skipped)
+            if platform in skipped:
+                result = skipped[platform]
+            elif job["draft"] and platform not in existing:
+                logger.info(f"发布任务 #{job['id']} 开始上传草稿到{name}平台 (第 {job['attempts']} 次): {job['audio_info']['filename']}")
+                result = await client.publish(job["audio_info"]["path"], dict(job["metadata"], draft=True))
+                breaker.record_success()
+                self.outbox.stage_release(job["id"], result)
+                logger.info(f"发布任务 #{job['id']} 草稿已上传到{name}平台，"
+                            f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(job['release_at']))} 发布")
+                return
+            else:
+                if platform in existing:
+                    logger.info(f"发布任务 #{job['id']} 音频已在{name}平台上，只更新元数据: {existing[platform]}")
+                else:
+                    logger.info(f"发布任务 #{job['id']} 开始上传到{name}平台 (第 {job['attempts']} 次): {job['audio_info']['filename']}")
+                result = await client.publish(job["audio_info"]["path"], job["metadata"], existing.get(platform))
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            retryable = is_retryable(e)
+            # 认证失败、参数错误等说明平台本身可用，不计入熔断
+            if retryable:
+                was_closed = breaker.opened_at is None
+                breaker.record_failure()
+                if was_closed and breaker.state == "open":
+                    logger.warning(f"{name}平台连续失败 {breaker.failures} 次，熔断 {self.breaker_reset:.0f} 秒")
+            else:
+                breaker.record_success()
+            if not retryable or job["attempts"] >= job["max_attempts"]:
+                logger.error(f"发布任务 #{job['id']} ({name}) 失败，不再重试: {error}")
+                self.outbox.fail(job["id"], error)
+                self.publisher.record_publish_result(job["audio_info"], job["content"], platform,
+                                                     {"success": False, "platform": platform, "error": error})
+            else:
+                delay = self.backoff(job["attempts"])
+                logger.warning(f"发布任务 #{job['id']} ({name}) 失败，{delay:.0f} 秒后重试: {error}")
+                self.outbox.retry(job["id"], error, delay)
+        else:
+            await self._finish(job, result)
+        finally:
+            lease.cancel()
+            self.processed += 1
+    
+    async def _finish(self, job, result):
+        platform = job["platform"]
+        self._breaker(platform).record_success()
+        self.outbox.complete(job["id"], result)
+        self.publisher.record_publish_result(job["audio_info"], job["content"], platform, result)
+        logger.info(f"发布任务 #{job['id']} 完成: {PLATFORM_NAMES.get(platform, platform)} {result.get('episode_url', '')}")
+
+    def _claim(self, platform):
+        """先领取到点的草稿发布任务（不限速），再凭令牌领取上传任务"""
+        job = self.outbox.claim(platform, self.worker_id, self.lease_seconds, phase=RELEASE)
+        if job is not None:
+            return job
+        rate = self.rate_limits.get(platform, 0)
+        if not self.outbox.take_token(platform, rate, self.bucket_burst):
+            return None
+        job = self.outbox.claim(platform, self.worker_id, self.lease_seconds, phase=UPLOAD)
+        if job is None and rate > 0:
+            self.outbox.return_token(platform, self.bucket_burst)
+        return job
+
+    def _dispatch(self):
+        """为每个有空闲并发、熔断器允许的平台领取任务，返回本轮启动的任务数"""
+        started = 0
+        for platform in self.outbox.platforms():
+            if platform not in self.publisher.supported_platforms:
+                continue
+            tasks = self.running.setdefault(platform, set())
+            while len(tasks) < self.concurrency:
+                breaker = self._breaker(platform)
+                if not breaker.allow():
+                    break
+                job = self._claim(platform)
+                if job is None:
+                    # 半开试探名额没有用上，归还
+                    breaker.probing = False
+                    break
+                task = asyncio.create_task(self._process(job))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                started += 1
+                if breaker.state == "half_open":
+                    break
+        return started
+
+    def _finished(self, job_ids):
+        return all(self.outbox.get(job_id)["state"] in (DONE, FAILED) for job_id in job_ids)
+
+    async def run(self, drain=False, job_ids=None):
+        """
+        持续处理队列；drain为True时处理完当前所有未完成任务（含退避等待中的任务）后退出
+        job_ids: 这些任务都完成或失败后退出（生成后直接发布时等待本集的任务）
+        """
+        logger.info(f"发布worker已启动 ({self.worker_id})，每个平台并发 {self.concurrency}")
+        try:
+            while True:
+                started = self._dispatch()
+                active = any(self.running.values())
+                if drain and not started and not active and self.outbox.next_due() is None:
+                    break
+                if job_ids and not started and not active and self._finished(job_ids):
+                    break
+                if started:
+                    await asyncio.sleep(0)
+                    continue
+                # 下一个任务（例如定时发布）在轮询间隔内到期时，按到期时间醒来；
+                # 已到期却没领到的任务（限速、并发已满或熔断）按正常间隔轮询
+                now = time.time()
+                due = self.outbox.next_due(after=now)
+                timeout = self.poll_seconds if due is None else min(self.poll_seconds, due - now)
+                # 有上传进行中时，任一任务结束就醒来领取下一条
+                pending = [task for tasks in self.running.values() for task in tasks]
+                if pending:
+                    await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                else:
+                    await asyncio.sleep(timeout)
+        finally:
+            pending = [task for tasks in self.running.values() for task in tasks]
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+            await asyncio.gather(*(client.close() for client in self.clients.values()), return_exceptions=True)
+            logger.info(f"发布worker已停止，共执行 {self.processed} 次上传，队列状态: {self.outbox.stats()}")
\ No newline at end of file
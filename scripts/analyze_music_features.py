@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+import argparse
+import logging
+from dotenv import load_dotenv
+from config import Config
+from config.music_features import MusicFeatureAnalyzer
+
+def setup_logging():
+    """设置日志"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+def main():
+    """主函数"""
+    # 加载环境变量
+    load_dotenv()
+    
+    parser = argparse.ArgumentParser(description='音乐库声学特征分析工具（按BPM、能量、音色、调性标注情绪）')
+    parser.add_argument('--category', type=str, default=None,
+                       help='只分析指定类别，默认分析整个音乐库')
+    parser.add_argument('--music-dir', type=str, default='assets/music',
+                       help='音乐库目录')
+    parser.add_argument('--force', action='store_true',
+                       help='忽略缓存重新分析所有曲目')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='并行分析的进程数，默认使用全部CPU核')
+    parser.add_argument('--max-seconds', type=float, default=120.0,
+                       help='每首曲目最多分析的时长（秒）')
+    
+    args = parser.parse_args()
+    
+    # 设置日志
+    setup_logging()
+    logger = logging.getLogger(__name__)
+    
+    config = Config()
+    analyzer = MusicFeatureAnalyzer(args.music_dir, config.feature_cache_path,
+                                    args.workers or config.feature_workers, args.max_seconds)
+    
+    try:
+        categories = [args.category] if args.category else None
+        results = analyzer.analyze_library(args.force, music_manager=config.music_manager, categories=categories)
+        
+        total = sum(len(music_list) for music_list in results.values())
+        logger.info(f"分析完成: {len(results)} 个类别, {total} 首曲目")
+    
+    except Exception as e:
+        logger.error(f"特征分析失败: {str(e)}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+import argparse
+import logging
+from dotenv import load_dotenv
+from config import Config
+from config.music_loudness import MusicLoudnessAnalyzer
+
+def setup_logging():
+    """设置日志"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+def main():
+    """主函数"""
+    # 加载环境变量
+    load_dotenv()
+    
+    parser = argparse.ArgumentParser(description='音乐库响度预测量工具')
+    parser.add_argument('--category', type=str, default=None,
+                       help='只测量指定类别，默认测量整个音乐库')
+    parser.add_argument('--music-dir', type=str, default='assets/music',
+                       help='音乐库目录')
+    parser.add_argument('--force', action='store_true',
+                       help='重新测量所有曲目（默认跳过未变化的文件）')
+    parser.add_argument('--workers', type=int, default=4,
+                       help='并行测量的线程数')
+    
+    args = parser.parse_args()
+    
+    # 设置日志
+    setup_logging()
+    logger = logging.getLogger(__name__)
+    
+    config = Config()
+    analyzer = MusicLoudnessAnalyzer(args.music_dir, config.bed_target_lufs, args.workers)
+    
+    try:
+        if args.category:
+            results = {args.category: analyzer.analyze_category(args.category, args.force)}
+            analyzer.update_music_manager(config.music_manager, results)
+        else:
+            results = analyzer.analyze_library(args.force, music_manager=config.music_manager)
+        
+        total = sum(len(music_list) for music_list in results.values())
+        logger.info(f"测量完成: {len(results)} 个类别, {total} 首曲目, 目标响度 {config.bed_target_lufs} LUFS")
+    
+    except Exception as e:
+        logger.error(f"响度测量失败: {str(e)}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
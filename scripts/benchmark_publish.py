@@ -0,0 +1,212 @@
+#!/usr/bin/env python
+"""
+发布吞吐量压测: 对本地模拟平台（或指定地址）并发发布N集，统计吞吐和重试开销
+
+用法:
+    # 内置模拟服务器，注入延迟、限速和故障
+    python scripts/benchmark_publish.py --episodes 20 --concurrency 4 --size-mb 8 \\
+        --latency 0.1 --bandwidth 4096 --error-rate 0.05 --throttle-rate 0.05 --disconnect-rate 0.02 --seed 1
+    # 对已运行的 scripts/mock_platform_server.py 压测
+    python scripts/benchmark_publish.py --url http://localhost:8100 --episodes 20
+
+发布走与 PodcastPublisher 相同的 PlatformClient/PublishEngine（连接池、重试、分块续传），
+不做质检、不写发布历史和节目目录。
+"""
+import os
+import sys
+import json
+import shutil
+import asyncio
+import argparse
+import logging
+import tempfile
+from datetime import datetime
+from aiohttp import web
+from dotenv import load_dotenv
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+from publish_engine import PlatformClient, PublishEngine
+from scripts.mock_platform_server import create_app, add_fault_arguments, faults_from_args, PLATFORM_KEY
+
+logger = logging.getLogger('benchmark_publish')
+
+def setup_logging(verbose=False):
+    """设置日志"""
+    logging.basicConfig(
+        level=logging.INFO if verbose else logging.WARNING,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    logger.setLevel(logging.INFO)
+
+def _percentile(values, ratio):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(ratio * (len(values) - 1))))]
+
+def _prepare_files(work_dir, episodes, size):
+    """生成一个随机内容的音频文件，其余各集用硬链接（分块续传清单按路径区分，互不干扰）"""
+    first = os.path.join(work_dir, "episode_0001.mp3")
+    with open(first, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            block = min(remaining, 1024 * 1024)
+            f.write(os.urandom(block))
+            remaining -= block
+    paths = [first]
+    for index in range(2, episodes + 1):
+        path = os.path.join(work_dir, f"episode_{index:04d}.mp3")
+        try:
+            os.link(first, path)
+        except OSError:
+            shutil.copyfile(first, path)
+        paths.append(path)
+    return paths
+
+async def run_benchmark(args, base_url, mock=None):
+    """并发发布并汇总结果"""
+    config = Config()
+    work_dir = tempfile.mkdtemp(prefix="publish_bench_")
+    size = int(args.size_mb * 1024 * 1024)
+    try:
+        paths = _prepare_files(work_dir, args.episodes, size)
+        clients = [
+            PlatformClient(
+                platform, args.api_key, f"{base_url}/{platform}",
+                max_retries=args.max_retries,
+                timeout=config.timeout,
+                pool_size=config.publish_pool_size,
+                keepalive=config.publish_keepalive,
+                chunk_size=args.chunk_size,
+                manifest_dir=os.path.join(work_dir, "manifests")
+            )
+            for platform in args.platforms.split(',')
+        ]
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def publish(engine, index, path):
+            metadata = {
+                "title": f"压测第{index}集",
+                "description": "publish benchmark",
+                "publish_date": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"),
+                "season": 1,
+                "episode": index
+            }
+            async with semaphore:
+                return await engine.publish(path, metadata)
+
+        loop = asyncio.get_running_loop()
+        async with PublishEngine(clients) as engine:
+            started = loop.time()
+            episodes = await asyncio.gather(*(
+                publish(engine, index, path) for index, path in enumerate(paths, 1)
+            ))
+            elapsed = loop.time() - started
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = [result for episode in episodes for result in episode.values()]
+    succeeded = [result for result in results if result.get("success")]
+    latencies = [result["elapsed"] for result in succeeded]
+    payload = size * len(succeeded)
+    report = {
+        "episodes": args.episodes,
+        "platforms": len(clients),
+        "concurrency": args.concurrency,
+        "size_bytes": size,
+        "chunk_size": args.chunk_size,
+        "elapsed_seconds": round(elapsed, 2),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "episodes_per_minute": round(len(succeeded) / elapsed * 60, 2) if elapsed else 0.0,
+        "goodput_bytes_per_second": round(payload / elapsed) if elapsed else 0,
+        "latency_p50": round(_percentile(latencies, 0.5), 2),
+        "latency_p95": round(_percentile(latencies, 0.95), 2),
+        "errors": sorted({result.get("error", "") for result in results if not result.get("success")})
+    }
+    if mock is not None:
+        # 服务器侧统计: 实际收到的字节和请求数，超出有效数据的部分就是重试开销
+        requests = sum(mock.requests.values())
+        report.update({
+            "wire_bytes": mock.received_bytes,
+            "wire_bytes_per_second": round(mock.received_bytes / elapsed) if elapsed else 0,
+            "retry_bytes_overhead": round(mock.received_bytes / payload - 1, 3) if payload else None,
+            "requests": requests,
+            "requests_per_publish": round(requests / len(succeeded), 2) if succeeded else None,
+            "injected_faults": dict(mock.injected)
+        })
+    return report
+
+async def benchmark(args):
+    if args.url:
+        return await run_benchmark(args, args.url.rstrip('/'))
+
+    # 内置模拟服务器，监听随机端口
+    storage = tempfile.mkdtemp(prefix="publish_bench_storage_")
+    app = create_app(storage, args.api_key, faults_from_args(args))
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await run_benchmark(args, f"http://127.0.0.1:{port}", app[PLATFORM_KEY])
+    finally:
+        await runner.cleanup()
+        shutil.rmtree(storage, ignore_errors=True)
+
+def print_report(report):
+    print("\n=== 发布压测结果 ===")
+    print(f"集数: {report['episodes']} x {report['platforms']} 个平台，并发 {report['concurrency']}，"
+          f"每集 {report['size_bytes'] / 1024 / 1024:.1f} MB")
+    print(f"耗时: {report['elapsed_seconds']} 秒，成功 {report['succeeded']}，失败 {report['failed']}")
+    print(f"吞吐: {report['episodes_per_minute']} 集/分钟，有效数据 {report['goodput_bytes_per_second'] / 1024:.0f} KB/s")
+    print(f"单次发布耗时: p50 {report['latency_p50']} 秒，p95 {report['latency_p95']} 秒")
+    if 'wire_bytes' in report:
+        print(f"服务器收到: {report['wire_bytes_per_second'] / 1024:.0f} KB/s，"
+              f"重试多传 {report['retry_bytes_overhead']:.1%}，每次发布 {report['requests_per_publish']} 个请求")
+        print(f"注入的故障: {report['injected_faults']}")
+    for error in report['errors']:
+        print(f"错误: {error}")
+    print()
+
+def main():
+    """主函数"""
+    # 加载环境变量
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description='发布吞吐量压测（本地模拟平台，可注入延迟、限速和故障）')
+    parser.add_argument('--episodes', type=int, default=10,
+                       help='发布的集数')
+    parser.add_argument('--concurrency', type=int, default=4,
+                       help='同时发布的集数')
+    parser.add_argument('--size-mb', type=float, default=5,
+                       help='每集音频大小（MB）')
+    parser.add_argument('--platforms', type=str, default='xiaoyuzhou',
+                       help='发布的平台，多个用逗号分隔')
+    parser.add_argument('--chunk-size', type=int, default=0,
+                       help='分块上传的分块大小（字节），0表示整体上传')
+    parser.add_argument('--max-retries', type=int, default=3,
+                       help='每个平台的最大尝试次数')
+    parser.add_argument('--url', type=str, default=None,
+                       help='已运行的模拟服务器地址，留空时启动内置服务器')
+    parser.add_argument('--api-key', type=str, default='benchmark',
+                       help='API密钥')
+    parser.add_argument('--output', type=str, default=None,
+                       help='把结果写入JSON文件，便于比较不同版本')
+    parser.add_argument('--verbose', action='store_true',
+                       help='输出每次发布的日志')
+    add_fault_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging(args.verbose)
+
+    report = asyncio.run(benchmark(args))
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"结果已保存到: {args.output}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
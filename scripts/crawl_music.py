@@ -2,7 +2,10 @@
 import argparse
 import logging
 from dotenv import load_dotenv
+from config import Config
 from config.music_crawler import MusicCrawler
+from config.music_features import MusicFeatureAnalyzer
+from config.music_info import normalize_path
 
 def setup_logging():
     """设置日志"""
@@ -26,6 +29,8 @@ def main():
                        help='爬取数量限制')
     parser.add_argument('--save-dir', type=str, default='assets/music',
                        help='保存目录')
+    parser.add_argument('--skip-analysis', action='store_true',
+                       help='跳过声学特征分析（情绪标签只按标题关键词粗略判断）')
     
     args = parser.parse_args()
     
@@ -48,6 +53,21 @@ def main():
         # 保存音乐信息
         if music_list:
             crawler.save_music_info(music_list, args.category)
+            
+            # 按声学特征标注情绪
+            if not args.skip_analysis:
+                config = Config()
+                analyzer = MusicFeatureAnalyzer(args.save_dir, config.feature_cache_path, config.feature_workers)
+                analyzed = {
+                    music['file_path']: music
+                    for music in analyzer.analyze_category(args.category)
+                }
+                for music in music_list:
+                    music['mood'] = analyzed.get(normalize_path(music['file_path']), music)['mood']
+                analyzer.update_music_manager(config.music_manager, {
+                    path: music['features'] for path, music in analyzed.items() if music.get('features')
+                })
+            
             logger.info(f"成功爬取 {len(music_list)} 首音乐")
             for music in music_list:
                 logger.info(f"- {music['title']} by {music['artist']} ({music['mood']})")
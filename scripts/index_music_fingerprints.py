@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+import argparse
+import logging
+from dotenv import load_dotenv
+from config import Config
+from config.music_fingerprint import FingerprintIndex
+
+def setup_logging():
+    """设置日志"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+def main():
+    """主函数"""
+    # 加载环境变量
+    load_dotenv()
+    
+    parser = argparse.ArgumentParser(description='音乐指纹索引工具（建立索引并报告重复的音乐）')
+    parser.add_argument('--music-dir', type=str, default='assets/music',
+                       help='音乐库目录')
+    parser.add_argument('--rebuild', action='store_true',
+                       help='清空索引后重新建立')
+    
+    args = parser.parse_args()
+    
+    # 设置日志
+    setup_logging()
+    logger = logging.getLogger(__name__)
+    
+    config = Config()
+    index = FingerprintIndex(config.fingerprint_index_path)
+    
+    try:
+        if args.rebuild:
+            for track_id in list(index.tracks):
+                index.remove(track_id)
+        
+        duplicates = index.index_library(args.music_dir)
+        logger.info(f"索引完成: 共 {len(index.tracks)} 首曲目, 发现 {len(duplicates)} 组重复")
+        for path, existing in duplicates:
+            logger.info(f"- {path} 与 {existing} 重复")
+    
+    except Exception as e:
+        logger.error(f"建立指纹索引失败: {str(e)}")
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,348 @@
+#!/usr/bin/env python
+"""
+本地播客平台模拟服务器，实现发布接口和分块断点续传协议，用于在没有平台账号时测试发布流程
+
+用法:
+    python scripts/mock_platform_server.py --port 8100 --storage mock_uploads
+    XIAOYUZHOU_API_URL=http://localhost:8100/xiaoyuzhou XIAOYUZHOU_API_KEY=test python main.py --mode publish ...
+
+接口（每个平台一个路径前缀，例如 /xiaoyuzhou）:
+    POST /{平台}/episodes          multipart整体上传（audio字段），或JSON中带upload_id引用已完成的分块上传
+    PATCH /{平台}/episodes/{id}    只更新节目元数据（JSON）
+    POST /{平台}/episodes/{id}/publish  发布草稿（创建节目时 draft=true 的节目先保存为草稿）
+    POST /{平台}/uploads           创建上传会话
+    GET  /{平台}/uploads/{id}      查询已确认的字节数
+    PUT  /{平台}/uploads/{id}      按Content-Range追加分块
+
+故障注入（用于测试重试和压测，见 scripts/benchmark_publish.py）:
+    python scripts/mock_platform_server.py --latency 0.2 --bandwidth 2048 --error-rate 0.05 \
+        --throttle-rate 0.05 --disconnect-rate 0.02 --seed 1
+"""
+import os
+import re
+import uuid
+import random
+import asyncio
+import argparse
+import itertools
+import contextvars
+from collections import Counter
+from datetime import datetime
+import logging
+from aiohttp import web
+
+logger = logging.getLogger('mock_platform_server')
+
+CONTENT_RANGE = re.compile(r'bytes (\d+)-(\d+)/(\d+)')
+# 当前请求注入的断开位置（字节），每个请求在自己的上下文中处理
+DISCONNECT_AT = contextvars.ContextVar('disconnect_at', default=None)
+
+def setup_logging():
+    """设置日志"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+class FaultInjector:
+    """
+    故障注入配置
+    latency/jitter: 每个请求的固定延迟和随机附加延迟（秒）
+    bandwidth: 每个连接接收音频的速度上限（KB/s，0表示不限）
+    error_rate/throttle_rate: 上传请求返回503/429的概率
+    disconnect_rate: 上传请求在接收到一部分数据后断开连接的概率
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, bandwidth=0, error_rate=0.0, throttle_rate=0.0,
+                 disconnect_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth = bandwidth * 1024
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.disconnect_rate = disconnect_rate
+        self.random = random.Random(seed)
+
+    def delay(self):
+        return self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0)
+
+    def pick(self):
+        """为一个上传请求抽取故障类型: 'error'、'throttle'、'disconnect' 或 None"""
+        roll = self.random.random()
+        for fault, rate in (("error", self.error_rate), ("throttle", self.throttle_rate),
+                            ("disconnect", self.disconnect_rate)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+
+class MockPlatform:
+    """模拟平台: 上传会话和节目都保存在内存中，音频写入storage目录"""
+
+    def __init__(self, storage, api_key=None, faults=None):
+        self.storage = storage
+        self.api_key = api_key
+        self.faults = faults or FaultInjector()
+        self.uploads = {}
+        self.episodes = {}
+        # 集ID在请求开始时分配，并发上传时不会重复
+        self.episode_ids = itertools.count(1)
+        self.received_bytes = 0
+        self.requests = Counter()
+        self.injected = Counter()
+        os.makedirs(storage, exist_ok=True)
+
+    @web.middleware
+    async def auth(self, request, handler):
+        if self.api_key and request.headers.get('Authorization') != f"Bearer {self.api_key}":
+            return web.json_response({'error': 'unauthorized'}, status=401)
+        return await handler(request)
+
+    @web.middleware
+    async def inject(self, request, handler):
+        """按配置注入延迟、5xx、429和中途断开（只对携带音频的请求注入错误）"""
+        self.requests[request.method] += 1
+        delay = self.faults.delay()
+        if delay:
+            await asyncio.sleep(delay)
+        disconnect_at = None
+        if request.method in ('POST', 'PUT') and request.content_type != 'application/json':
+            fault = self.faults.pick()
+            if fault == "error":
+                self.injected[fault] += 1
+                return web.json_response({'error': 'injected server error'}, status=503)
+            if fault == "throttle":
+                self.injected[fault] += 1
+                return web.json_response({'error': 'rate limited'}, status=429, headers={'Retry-After': '1'})
+            if fault == "disconnect":
+                # 在请求体的随机位置断开
+                disconnect_at = int((request.content_length or 131072) * self.faults.random.uniform(0.1, 0.9))
+        token = DISCONNECT_AT.set(disconnect_at)
+        try:
+            return await handler(request)
+        finally:
+            DISCONNECT_AT.reset(token)
+
+    async def _receive(self, request, chunks, sink):
+        """
+        接收请求体: 按带宽上限控速，到达注入的断开位置时关闭连接
+        返回收到的字节数，连接被断开时返回None
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        disconnect_at = DISCONNECT_AT.get()
+        received = 0
+        async for data in chunks:
+            if disconnect_at is not None and received + len(data) >= disconnect_at:
+                self.injected['disconnect'] += 1
+                self.received_bytes += disconnect_at - received
+                request.transport.close()
+                return None
+            sink(data, received)
+            received += len(data)
+            self.received_bytes += len(data)
+            if self.faults.bandwidth:
+                wait = started + received / self.faults.bandwidth - loop.time()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+        return received
+
+    @staticmethod
+    async def _part_chunks(part):
+        while True:
+            data = await part.read_chunk(65536)
+            if not data:
+                break
+            yield data
+
+    def _file_path(self, platform, upload_id):
+        return os.path.join(self.storage, f"{platform}_{upload_id}.part")
+
+    async def create_upload(self, request):
+        platform = request.match_info['platform']
+        body = await request.json()
+        if not isinstance(body.get('size'), int) or body['size'] <= 0:
+            return web.json_response({'error': 'size required'}, status=400)
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {
+            'platform': platform,
+            'filename': body.get('filename', 'audio.mp3'),
+            'size': body['size'],
+            'offset': 0
+        }
+        open(self._file_path(platform, upload_id), 'wb').close()
+        logger.info(f"[{platform}] 创建上传会话 {upload_id}: {body.get('filename')} ({body['size']} 字节)")
+        return web.json_response({'upload_id': upload_id, 'offset': 0}, status=201)
+
+    async def upload_status(self, request):
+        upload = self.uploads.get(request.match_info['upload_id'])
+        if not upload:
+            return web.json_response({'error': 'not found'}, status=404)
+        return web.json_response({'offset': upload['offset'], 'size': upload['size'],
+                                  'complete': upload['offset'] >= upload['size']})
+
+    async def put_chunk(self, request):
+        upload_id = request.match_info['upload_id']
+        upload = self.uploads.get(upload_id)
+        if not upload:
+            return web.json_response({'error': 'not found'}, status=404)
+        match = CONTENT_RANGE.fullmatch(request.headers.get('Content-Range', ''))
+        if not match:
+            return web.json_response({'error': 'Content-Range required'}, status=400)
+        start, end, total = (int(value) for value in match.groups())
+        if total != upload['size'] or end < start or end >= total:
+            return web.json_response({'error': 'invalid range'}, status=416)
+        if start != upload['offset']:
+            return web.json_response({'error': 'offset mismatch', 'offset': upload['offset']}, status=409)
+
+        # 边接收边写盘，只有完整收到的分块才推进偏移
+        path = self._file_path(upload['platform'], upload_id)
+        expected = end - start + 1
+        with open(path, 'r+b') as f:
+            f.seek(start)
+            received = await self._receive(
+                request, request.content.iter_chunked(65536),
+                lambda data, offset: f.write(data[:max(expected - offset, 0)])
+            )
+            if received is None:
+                return web.Response(status=499)
+            f.truncate(start + min(received, expected))
+        if received != expected:
+            return web.json_response({'error': 'incomplete chunk', 'offset': upload['offset']}, status=400)
+
+        upload['offset'] = end + 1
+        return web.json_response({'offset': upload['offset']})
+
+    async def create_episode(self, request):
+        platform = request.match_info['platform']
+        episode_id = f"{platform}-{next(self.episode_ids)}"
+
+        if request.content_type == 'application/json':
+            metadata = await request.json()
+            upload = self.uploads.get(metadata.get('upload_id'))
+            if not upload:
+                return web.json_response({'error': 'unknown upload_id'}, status=400)
+            if upload['offset'] < upload['size']:
+                return web.json_response({'error': 'upload incomplete', 'offset': upload['offset']}, status=409)
+            audio_path = self._file_path(platform, metadata['upload_id'])
+        else:
+            metadata = {}
+            audio_path = os.path.join(self.storage, f"{episode_id}.mp3")
+            reader = await request.multipart()
+            async for part in reader:
+                if part.filename:
+                    with open(audio_path, 'wb') as f:
+                        received = await self._receive(request, self._part_chunks(part), lambda data, offset: f.write(data))
+                    if received is None:
+                        os.remove(audio_path)
+                        return web.Response(status=499)
+                else:
+                    metadata[part.name] = await part.text()
+
+        draft = metadata.get('draft') in (True, 'true')
+        self.episodes[episode_id] = dict(metadata, audio_path=audio_path, status='draft' if draft else 'published')
+        logger.info(f"[{platform}] 创建{'草稿' if draft else '节目'} {episode_id}: {metadata.get('title')} ({os.path.getsize(audio_path)} 字节)")
+        return web.json_response({
+            'id': episode_id,
+            'url': f"http://{request.host}/{platform}/episodes/{episode_id}"
+        }, status=201)
+
+    async def update_episode(self, request):
+        platform = request.match_info['platform']
+        episode_id = request.match_info['episode_id']
+        episode = self.episodes.get(episode_id)
+        if not episode:
+            return web.json_response({'error': 'not found'}, status=404)
+        episode.update(await request.json())
+        logger.info(f"[{platform}] 更新节目信息 {episode_id}: {episode.get('title')}")
+        return web.json_response({
+            'id': episode_id,
+            'url': f"http://{request.host}/{platform}/episodes/{episode_id}"
+        })
+
+    async def publish_episode(self, request):
+        platform = request.match_info['platform']
+        episode_id = request.match_info['episode_id']
+        episode = self.episodes.get(episode_id)
+        if not episode:
+            return web.json_response({'error': 'not found'}, status=404)
+        episode['status'] = 'published'
+        episode['published_at'] = datetime.now().isoformat()
+        logger.info(f"[{platform}] 发布草稿 {episode_id}: {episode.get('title')}")
+        return web.json_response({
+            'id': episode_id,
+            'url': f"http://{request.host}/{platform}/episodes/{episode_id}"
+        })
+
+
+# 应用中保存的模拟平台实例，测试和压测通过 app[PLATFORM_KEY] 读取统计
+PLATFORM_KEY = web.AppKey('platform', MockPlatform)
+
+
+def create_app(storage='mock_uploads', api_key=None, faults=None):
+    """创建模拟服务器应用（也可在测试和压测中直接使用）"""
+    platform = MockPlatform(storage, api_key, faults)
+    app = web.Application(middlewares=[platform.auth, platform.inject], client_max_size=1024 ** 3)
+    app[PLATFORM_KEY] = platform
+    app.router.add_post('/{platform}/episodes', platform.create_episode)
+    app.router.add_patch('/{platform}/episodes/{episode_id}', platform.update_episode)
+    app.router.add_post('/{platform}/episodes/{episode_id}/publish', platform.publish_episode)
+    app.router.add_post('/{platform}/uploads', platform.create_upload)
+    app.router.add_get('/{platform}/uploads/{upload_id}', platform.upload_status)
+    app.router.add_put('/{platform}/uploads/{upload_id}', platform.put_chunk)
+    return app
+
+
+def add_fault_arguments(parser):
+    """故障注入参数（压测脚本共用）"""
+    parser.add_argument('--latency', type=float, default=0.0,
+                       help='每个请求的固定延迟（秒）')
+    parser.add_argument('--jitter', type=float, default=0.0,
+                       help='每个请求的随机附加延迟上限（秒）')
+    parser.add_argument('--bandwidth', type=int, default=0,
+                       help='每个连接的接收速度上限（KB/s），0表示不限')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                       help='上传请求返回503的概率')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                       help='上传请求返回429的概率')
+    parser.add_argument('--disconnect-rate', type=float, default=0.0,
+                       help='上传请求中途断开连接的概率')
+    parser.add_argument('--seed', type=int, default=None,
+                       help='随机种子，固定后故障序列可复现')
+
+
+def faults_from_args(args):
+    return FaultInjector(
+        latency=args.latency,
+        jitter=args.jitter,
+        bandwidth=args.bandwidth,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        disconnect_rate=args.disconnect_rate,
+        seed=args.seed
+    )
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='本地播客平台模拟服务器（发布接口和分块断点续传）')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                       help='监听地址')
+    parser.add_argument('--port', type=int, default=8100,
+                       help='监听端口')
+    parser.add_argument('--storage', type=str, default='mock_uploads',
+                       help='收到的音频保存目录')
+    parser.add_argument('--api-key', type=str, default=None,
+                       help='要求的API密钥，留空表示不校验')
+    add_fault_arguments(parser)
+
+    args = parser.parse_args()
+    setup_logging()
+
+    logger.info(f"平台模拟服务器已启动: http://{args.host}:{args.port}/{{平台}}")
+    web.run_app(create_app(args.storage, args.api_key, faults_from_args(args)),
+                host=args.host, port=args.port, print=None)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
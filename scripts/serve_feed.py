@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+"""
+自托管RSS订阅服务器，支持条件请求
+
+用法:
+    python scripts/serve_feed.py --port 8200
+    curl -I http://localhost:8200/feed.xml
+
+订阅源由发布流程增量写入（FEED_ENABLED=true），本服务只读取 feed.xml:
+    GET/HEAD /feed.xml      If-None-Match 与强ETag相同，或 If-Modified-Since 不早于最后更新时间时返回304
+    GET/HEAD /audio/{文件}  音频文件（支持Range）
+"""
+import os
+import argparse
+import logging
+from email.utils import formatdate, parsedate_to_datetime
+from aiohttp import web
+
+from config import Config
+from podcast_feed import feed_etag
+
+logger = logging.getLogger('serve_feed')
+
+def setup_logging():
+    """设置日志"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+
+class FeedServer:
+    """
+    feed.xml的内容和验证器缓存在内存中，文件的修改时间或大小变化时才重新读取，
+    未变化时每个请求只做一次stat、不读文件也不计算哈希，304响应没有正文
+    """
+
+    def __init__(self, feed_path, audio_dir, max_age=300):
+        self.feed_path = feed_path
+        self.audio_dir = os.path.abspath(audio_dir)
+        self.max_age = max_age
+        self.signature = None
+        self.body = b''
+        self.etag = None
+        self.last_modified = None
+        self.mtime = 0
+
+    def _load(self):
+        stat = os.stat(self.feed_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        if signature != self.signature:
+            with open(self.feed_path, 'rb') as f:
+                self.body = f.read()
+            self.signature = signature
+            self.mtime = int(stat.st_mtime)
+            self.etag = feed_etag(self.body)
+            self.last_modified = formatdate(self.mtime, usegmt=True)
+            logger.info(f"已加载订阅源: {len(self.body)} 字节, ETag {self.etag}")
+
+    def _not_modified(self, request):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            # 有If-None-Match时忽略If-Modified-Since（RFC 9110）
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or self.etag in tags or f"W/{self.etag}" in tags
+        if_modified_since = request.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                return self.mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    async def feed(self, request):
+        try:
+            self._load()
+        except FileNotFoundError:
+            return web.Response(status=404, text='feed not found')
+
+        headers = {
+            'ETag': self.etag,
+            'Last-Modified': self.last_modified,
+            'Cache-Control': f'public, max-age={self.max_age}'
+        }
+        if self._not_modified(request):
+            return web.Response(status=304, headers=headers)
+        return web.Response(body=self.body if request.method == 'GET' else None,
+                            content_type='application/rss+xml', charset='utf-8', headers=headers)
+
+    async def audio(self, request):
+        path = os.path.abspath(os.path.join(self.audio_dir, request.match_info['filename']))
+        if os.path.dirname(path) != self.audio_dir or not os.path.isfile(path):
+            return web.Response(status=404, text='not found')
+        # FileResponse自带ETag/Last-Modified和Range支持
+        return web.FileResponse(path, headers={'Cache-Control': 'public, max-age=86400'})
+
+
+# 应用中保存的订阅服务器实例
+FEED_SERVER_KEY = web.AppKey('feed_server', FeedServer)
+
+
+def create_app(feed_path, audio_dir, max_age=300):
+    """创建订阅服务器应用"""
+    server = FeedServer(feed_path, audio_dir, max_age)
+    app = web.Application()
+    app[FEED_SERVER_KEY] = server
+    app.router.add_get('/feed.xml', server.feed)
+    app.router.add_get('/audio/{filename}', server.audio)
+    return app
+
+
+def main():
+    """主函数"""
+    config = Config()
+
+    parser = argparse.ArgumentParser(description='自托管RSS订阅服务器（支持ETag/Last-Modified条件请求）')
+    parser.add_argument('--host', type=str, default='0.0.0.0',
+                       help='监听地址')
+    parser.add_argument('--port', type=int, default=8200,
+                       help='监听端口')
+    parser.add_argument('--feed-dir', type=str, default=config.feed_dir,
+                       help='订阅源目录（包含feed.xml）')
+    parser.add_argument('--audio-dir', type=str, default=config.audio_output_dir,
+                       help='音频文件目录')
+    parser.add_argument('--max-age', type=int, default=300,
+                       help='客户端缓存时间（秒）')
+
+    args = parser.parse_args()
+    setup_logging()
+
+    logger.info(f"订阅服务器已启动: http://{args.host}:{args.port}/feed.xml")
+    web.run_app(create_app(os.path.join(args.feed_dir, 'feed.xml'), args.audio_dir, args.max_age),
+                host=args.host, port=args.port, print=None)
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import os
+import hashlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from gtts import gTTS
+from pydub import AudioSegment
+from logger import logger
+
+class SpeechSynthesizer:
+    """带磁盘缓存的分段语音合成器，多段文本并行合成"""
+
+    def __init__(self, cache_dir: str = os.path.join('cache', 'tts'), max_workers: int = 4):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def parse_voice(voice):
+        """
+        解析声音配置
+        voice: 'zh-CN' 或 'zh-CN:com' 形式的字符串（语言:口音域名），也可以直接传dict
+        返回: dict 包含lang、tld、slow
+        """
+        if isinstance(voice, dict):
+            return {'lang': voice.get('lang', 'zh-CN'), 'tld': voice.get('tld', 'com'), 'slow': voice.get('slow', False)}
+        lang, _, tld = (voice or 'zh-CN').partition(':')
+        return {'lang': lang, 'tld': tld or 'com', 'slow': False}
+
+    def _cache_path(self, text, voice):
+        """根据文本和声音生成缓存文件路径"""
+        key = f"{voice['lang']}|{voice['tld']}|{voice['slow']}|{text}"
+        digest = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{digest}.mp3")
+
+    def synthesize(self, text, voice=None):
+        """合成单段文本，命中缓存时直接解码缓存文件"""
+        voice = self.parse_voice(voice)
+        cache_path = self._cache_path(text, voice)
+
+        if not os.path.exists(cache_path):
+            tts = gTTS(text=text, lang=voice['lang'], tld=voice['tld'], slow=voice['slow'])
+            # 先写临时文件再原子替换，避免并发或中断时留下残缺的缓存
+            fd, temp_path = tempfile.mkstemp(suffix='.mp3', dir=self.cache_dir)
+            os.close(fd)
+            try:
+                tts.save(temp_path)
+                os.replace(temp_path, cache_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+        return AudioSegment.from_mp3(cache_path)
+
+    def iter_synthesize(self, items):
+        """
+        并行合成多段文本，按输入顺序逐段产出
+        items: [(文本, 声音配置), ...]
+        """
+        items = list(items)
+        if not items:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            futures = [executor.submit(self.synthesize, text, voice) for text, voice in items]
+            for future in futures:
+                yield future.result()
+
+    def synthesize_many(self, items):
+        """并行合成多段文本，返回AudioSegment列表"""
+        segments = list(self.iter_synthesize(items))
+        logger.info(f"并行合成完成，共 {len(segments)} 段")
+        return segments
@@ -0,0 +1,108 @@
+import re
+import json
+from logger import logger
+
+# 按中英文句末标点和换行切分句子，标点保留在句尾
+SENTENCE_PATTERN = re.compile(r'[^。！？!?；;…\n]+[。！？!?；;…”"’\']*')
+
+# 脚本中的舞台提示，例如 [音乐渐入]、（笑），不参与朗读
+STAGE_DIRECTION_PATTERN = re.compile(r'[\[【（(][^\]】）)]*[\]】）)]')
+
+# 只包含标点或空白的片段
+PUNCTUATION_ONLY = re.compile(r'^[\s\W_]*$')
+
+def strip_stage_directions(text):
+    """去掉舞台提示"""
+    return STAGE_DIRECTION_PATTERN.sub('', text)
+
+def split_sentences(text):
+    """将脚本切分为句子列表，用于分段合成和字幕"""
+    sentences = []
+    for match in SENTENCE_PATTERN.finditer(strip_stage_directions(text)):
+        sentence = match.group(0).strip()
+        if sentence and not PUNCTUATION_ONLY.match(sentence):
+            sentences.append(sentence)
+    return sentences
+
+
+class SubtitleTrack:
+    """字幕轨道，时间单位为毫秒"""
+
+    def __init__(self, cues=None):
+        self.cues = []
+        for cue in cues or []:
+            self.add(cue['text'], cue['start'], cue['end'], cue.get('speaker'))
+
+    def add(self, text, start, end, speaker=None):
+        """添加一条字幕"""
+        cue = {'text': text, 'start': float(start), 'end': float(end)}
+        if speaker:
+            cue['speaker'] = speaker
+        self.cues.append(cue)
+
+    @staticmethod
+    def _format_time(ms, separator):
+        """毫秒转 HH:MM:SS,mmm（SRT）或 HH:MM:SS.mmm（WebVTT）"""
+        ms = max(0, int(round(ms)))
+        hours, ms = divmod(ms, 3600000)
+        minutes, ms = divmod(ms, 60000)
+        seconds, ms = divmod(ms, 1000)
+        return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+    @staticmethod
+    def _cue_text(cue):
+        if cue.get('speaker'):
+            return f"{cue['speaker']}：{cue['text']}"
+        return cue['text']
+
+    def to_srt(self):
+        """生成SRT字幕"""
+        lines = []
+        for index, cue in enumerate(self.cues, 1):
+            lines.append(str(index))
+            lines.append(f"{self._format_time(cue['start'], ',')} --> {self._format_time(cue['end'], ',')}")
+            lines.append(self._cue_text(cue))
+            lines.append('')
+        return '\n'.join(lines)
+
+    def to_vtt(self):
+        """生成WebVTT字幕"""
+        lines = ['WEBVTT', '']
+        for cue in self.cues:
+            lines.append(f"{self._format_time(cue['start'], '.')} --> {self._format_time(cue['end'], '.')}")
+            if cue.get('speaker'):
+                lines.append(f"<v {cue['speaker']}>{cue['text']}")
+            else:
+                lines.append(cue['text'])
+            lines.append('')
+        return '\n'.join(lines)
+
+    def to_json(self):
+        """生成JSON时间轴（秒）"""
+        return {
+            'version': 1,
+            'cues': [
+                dict(cue, start=round(cue['start'] / 1000, 3), end=round(cue['end'] / 1000, 3))
+                for cue in self.cues
+            ]
+        }
+
+    def save(self, base_path):
+        """
+        在base_path旁写出 .srt、.vtt 和 .timings.json
+        返回: dict 各格式的文件路径
+        """
+        paths = {
+            'srt': f"{base_path}.srt",
+            'vtt': f"{base_path}.vtt",
+            'timings': f"{base_path}.timings.json"
+        }
+        with open(paths['srt'], 'w', encoding='utf-8') as f:
+            f.write(self.to_srt())
+        with open(paths['vtt'], 'w', encoding='utf-8') as f:
+            f.write(self.to_vtt())
+        with open(paths['timings'], 'w', encoding='utf-8') as f:
+            json.dump(self.to_json(), f, ensure_ascii=False, indent=2)
+
+        logger.info(f"字幕已生成: {paths['srt']} ({len(self.cues)} 条)")
+        return paths
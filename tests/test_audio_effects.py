@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+from pydub.generators import Sine
+from audio_effects import EffectsChain
+from exceptions import AudioGenerationError
+
+
+def tone(volume, duration=1000, freq=440):
+    return Sine(freq).to_audio_segment(duration=duration, volume=volume)
+
+
+def samples(audio):
+    return np.array(audio.get_array_of_samples(), dtype=np.float64)
+
+
+def test_empty_chain_returns_input():
+    audio = tone(-10)
+    assert EffectsChain().apply(audio) is audio
+
+
+def test_unsupported_effect():
+    with pytest.raises(AudioGenerationError):
+        EffectsChain([{'type': 'reverb'}])
+
+
+def test_fused_linear_effects_match_pydub():
+    """连续的gain/fade合并成一次遍历，结果与pydub逐个处理一致"""
+    audio = tone(-10)
+    fused = EffectsChain([{'type': 'gain', 'db': 3}, {'type': 'fade_in', 'ms': 300},
+                          {'type': 'gain', 'db': -6}, {'type': 'fade_out', 'ms': 200}]).apply(audio)
+    expected = audio.apply_gain(-3).fade_in(300).fade_out(200)
+    assert len(fused) == len(expected)
+    assert np.max(np.abs(samples(fused) - samples(expected))) / 32768 < 0.01
+
+
+def test_overlapping_fades_on_short_audio():
+    audio = EffectsChain([{'type': 'fade_in', 'ms': 300}, {'type': 'fade_out', 'ms': 300}]).apply(tone(-10, 400))
+    values = np.abs(samples(audio))
+    assert values[:20].max() < values.max() * 0.2
+    assert values[-20:].max() < values.max() * 0.2
+
+
+def test_normalize_to_target():
+    assert EffectsChain([{'type': 'normalize', 'target_dbfs': -18.0}]).apply(tone(-3)).dBFS == pytest.approx(-18, abs=0.1)
+
+
+def test_lowpass_removes_high_frequencies():
+    chain = EffectsChain([{'type': 'eq', 'kind': 'lowpass', 'freq': 500}])
+    assert chain.apply(tone(-10, freq=200)).dBFS == pytest.approx(tone(-10, freq=200).dBFS, abs=1.0)
+    assert chain.apply(tone(-10, freq=8000)).dBFS < tone(-10, freq=8000).dBFS - 20
+
+
+def test_compressor_reduces_loud_audio():
+    chain = EffectsChain([{'type': 'compressor', 'threshold_db': -20, 'ratio': 4, 'attack_ms': 5, 'release_ms': 50}])
+    assert chain.apply(tone(-3)).dBFS < tone(-3).dBFS - 6
+    # 低于阈值的音频基本不变
+    assert chain.apply(tone(-30)).dBFS == pytest.approx(tone(-30).dBFS, abs=0.5)
+
+
+def test_resample():
+    audio = EffectsChain([{'type': 'resample', 'rate': 22050}]).apply(tone(-10))
+    assert audio.frame_rate == 22050
+    assert len(audio) == pytest.approx(1000, abs=2)
+
+
+def test_locked_chain_keeps_relative_levels():
+    """固定增益后各片段之间的音量差保持不变，不会被逐段拉平"""
+    chain = EffectsChain([{'type': 'normalize', 'target_dbfs': -15.0}])
+    locked = chain.locked(tone(-20))
+    assert locked.effects == [{'type': 'gain', 'db': pytest.approx(-15.0 - tone(-20).dBFS, abs=0.1)}]
+    assert locked.apply(tone(-20)).dBFS == pytest.approx(-15.0, abs=0.1)
+    assert locked.apply(tone(-26)).dBFS == pytest.approx(-21.0, abs=0.1)
+    assert chain.apply(tone(-26)).dBFS == pytest.approx(-15.0, abs=0.1)
+
+
+def test_locked_gain_follows_preceding_effects():
+    chain = EffectsChain([{'type': 'gain', 'db': 6}, {'type': 'normalize', 'target_dbfs': -15.0},
+                          {'type': 'fade_in', 'ms': 10}])
+    locked = chain.locked(tone(-20))
+    assert [effect['type'] for effect in locked.effects] == ['gain', 'gain', 'fade_in']
+    # 增益按前面提高6 dB之后的响度计算
+    assert locked.effects[1]['db'] == pytest.approx(-15.0 - (tone(-20).dBFS + 6), abs=0.1)
\ No newline at end of file
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+import soundfile as sf
+import audio_probe
+from audio_probe import AudioProbe, parse_mp3_frame_header
+from exceptions import AudioProbeError
+
+# MPEG1 Layer III，128 kbps，44.1 kHz，单声道，不带填充: 每帧417字节、1152个采样
+HEADER = b'\xff\xfb\x90\xc0'
+FRAME_LENGTH = 417
+
+
+def frame(payload=b''):
+    return HEADER + payload + b'\x00' * (FRAME_LENGTH - 4 - len(payload))
+
+
+def write_mp3(path, frames, first=None, id3=False):
+    data = (first or frame()) + frame() * (frames - 1)
+    if id3:
+        data = b'ID3\x03\x00\x00\x00\x00\x00\x20' + b'\x00' * 32 + data + b'TAG' + b'\x00' * 125
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_parse_frame_header():
+    header = parse_mp3_frame_header(HEADER, 0)
+    assert (header['bitrate'], header['sample_rate'], header['channels']) == (128, 44100, 1)
+    assert (header['samples'], header['length']) == (1152, FRAME_LENGTH)
+    assert parse_mp3_frame_header(b'\xff\xfb\xf0\xc0', 0) is None  # 码率索引15无效
+
+
+def test_mp3_frame_scan(tmp_path):
+    info = AudioProbe().probe(write_mp3(tmp_path / 'a.mp3', 100, id3=True))
+    assert info['method'] == 'scan'
+    assert info['duration'] == pytest.approx(100 * 1152 / 44100)
+    assert info['bitrate'] == 128
+    assert (info['format'], info['channels'], info['sample_rate']) == ('mp3', 1, 44100)
+
+
+def test_mp3_scan_across_blocks_and_garbage(tmp_path, monkeypatch):
+    """块大小不是帧长的整数倍，中间夹杂损坏数据时重新同步"""
+    path = tmp_path / 'a.mp3'
+    path.write_bytes(frame() * 40 + b'\x12\xff\x00garbage' + frame() * 60)
+    expected = AudioProbe().probe(str(path))
+    monkeypatch.setattr(audio_probe, 'MP3_SCAN_BLOCK', 1000)
+    info = AudioProbe().probe(str(path))
+    assert info['duration'] == expected['duration'] == pytest.approx(100 * 1152 / 44100)
+
+
+def test_mp3_xing_header(tmp_path):
+    # 单声道MPEG1的side info为17字节
+    xing = b'\x00' * 17 + b'Xing' + (3).to_bytes(4, 'big') + (5000).to_bytes(4, 'big') + (2000000).to_bytes(4, 'big')
+    info = AudioProbe().probe(write_mp3(tmp_path / 'a.mp3', 10, first=frame(xing)))
+    assert info['method'] == 'xing'
+    assert info['duration'] == pytest.approx(5000 * 1152 / 44100)
+    assert info['bitrate'] == round(2000000 * 8 / info['duration'] / 1000)
+
+
+def test_mp3_vbri_header(tmp_path):
+    vbri = b'\x00' * 32 + b'VBRI' + b'\x00' * 6 + (1000000).to_bytes(4, 'big') + (3000).to_bytes(4, 'big')
+    info = AudioProbe().probe(write_mp3(tmp_path / 'a.mp3', 10, first=frame(vbri)))
+    assert info['method'] == 'vbri'
+    assert info['duration'] == pytest.approx(3000 * 1152 / 44100)
+
+
+def test_wav(tmp_path):
+    path = str(tmp_path / 'a.wav')
+    sf.write(path, np.zeros((22050 * 3, 2), dtype=np.float32), 22050, subtype='PCM_16')
+    info = AudioProbe().probe(path)
+    assert info == {'format': 'wav', 'duration': pytest.approx(3.0), 'bitrate': 706,
+                    'sample_rate': 22050, 'channels': 2, 'method': 'header'}
+
+
+def test_streamed_wav_without_data_size(tmp_path):
+    path = tmp_path / 'a.wav'
+    sf.write(str(path), np.zeros(8000, dtype=np.float32), 8000, subtype='PCM_16')
+    data = bytearray(path.read_bytes())
+    position = data.find(b'data')
+    data[position + 4:position + 8] = b'\x00' * 4
+    path.write_bytes(bytes(data))
+    assert AudioProbe().probe(str(path))['duration'] == pytest.approx(1.0)
+
+
+def test_unknown_format(tmp_path):
+    path = tmp_path / 'a.txt'
+    path.write_bytes(b'not audio at all')
+    with pytest.raises(AudioProbeError):
+        AudioProbe().probe(str(path))
+
+
+def test_cache_is_keyed_by_size_and_mtime(tmp_path, monkeypatch):
+    cache_path = str(tmp_path / 'cache' / 'probe.json')
+    path = tmp_path / 'a.mp3'
+    write_mp3(path, 50)
+    assert AudioProbe(cache_path).probe(str(path))['duration'] == pytest.approx(50 * 1152 / 44100)
+
+    # 新实例从缓存文件读取，不再读取音频
+    calls = []
+    original = AudioProbe._probe_file
+    monkeypatch.setattr(AudioProbe, '_probe_file', lambda self, *args: calls.append(args) or original(self, *args))
+    probe = AudioProbe(cache_path)
+    probe.probe(str(path))
+    assert calls == []
+
+    # 文件变化后重新探测
+    write_mp3(path, 80)
+    assert probe.probe(str(path))['duration'] == pytest.approx(80 * 1152 / 44100)
+    assert len(calls) == 1
+
+
+def test_probe_many_skips_unreadable(tmp_path):
+    good = write_mp3(tmp_path / 'a.mp3', 10)
+    bad = tmp_path / 'b.mp3'
+    bad.write_bytes(b'\x00' * 100)
+    results = AudioProbe(str(tmp_path / 'probe.json')).probe_many([good, str(bad), str(tmp_path / 'missing.mp3')])
+    assert list(results) == [good]
+    assert (tmp_path / 'probe.json').exists()
\ No newline at end of file
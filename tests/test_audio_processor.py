@@ -0,0 +1,217 @@
+import os
+import shutil
+import json
+import pytest
+import audio_probe
+from pydub import AudioSegment
+from pydub.generators import Sine
+from audio_probe import AudioProbe
+from audio_processor import AudioProcessor
+from config.music_selector import MusicSelector
+from exceptions import AudioGenerationError
+
+
+@pytest.fixture
+def processor(tmp_path, monkeypatch):
+    monkeypatch.setenv('TTS_CACHE_DIR', str(tmp_path / 'tts'))
+    return AudioProcessor(output_dir=str(tmp_path / 'output'))
+
+
+def speech(sections=15, voiced_ms=1000, pause_ms=1000):
+    """语音和停顿交替: 每段voiced_ms的正弦音后接pause_ms静音"""
+    audio = AudioSegment.empty()
+    for _ in range(sections):
+        audio += Sine(440).to_audio_segment(duration=voiced_ms, volume=-10)
+        audio += AudioSegment.silent(duration=pause_ms, frame_rate=44100)
+    return audio.set_frame_rate(44100)
+
+
+def test_compress_pauses_caps_long_pauses(processor):
+    audio, removed = processor._compress_pauses(speech(), max_pause_ms=600)
+    # 14个内部停顿各保留600ms，末尾只留100ms缓冲
+    assert len(audio) == pytest.approx(15000 + 14 * 600 + 100, abs=100)
+    assert removed == pytest.approx(30 - len(audio) / 1000, abs=0.01)
+
+
+def test_compress_pauses_respects_budget(processor):
+    cues = [{'start': 28000, 'end': 29000}]
+    audio, removed = processor._compress_pauses(speech(), max_pause_ms=250, cues=cues, budget_ms=2000)
+    assert removed == pytest.approx(2.0, abs=0.05)
+    assert len(audio) == pytest.approx(28000, abs=50)
+    # 移除分摊到各个停顿，最后一段语音只提前了约2秒
+    assert cues[0]['start'] == pytest.approx(26000 + 2000 / 15, abs=100)
+
+
+def test_fit_to_duration_removes_only_the_excess(processor):
+    """30秒音频调整到29秒时只压缩1秒停顿，不会把所有停顿压到最短"""
+    audio, rate, removed = processor._fit_to_duration(speech(), 29)
+    assert len(audio) / 1000 == pytest.approx(29, abs=0.05)
+    assert rate == 1.0
+    assert removed == pytest.approx(1.0, abs=0.05)
+
+
+def test_fit_to_duration_stretches_after_pauses(processor):
+    """停顿压到最短仍超出目标时，剩下的差距靠变速"""
+    audio, rate, removed = processor._fit_to_duration(speech(pause_ms=300), 16)
+    assert removed > 0
+    assert rate > 1.0
+    assert len(audio) / 1000 == pytest.approx(16, abs=0.2)
+
+def wav(path, duration_ms):
+    """写一段正弦音WAV作为背景音乐"""
+    Sine(220).to_audio_segment(duration=duration_ms, volume=-20).export(str(path), format='wav')
+    return {'file_path': str(path), 'duration': duration_ms / 1000, 'loudness': {'integrated_lufs': -20.0}}
+
+
+def test_build_bed_loops_to_duration(processor, tmp_path):
+    processor.music_selector.crossfade_ms = 500
+    tracks = [wav(tmp_path / 'a.wav', 3000), wav(tmp_path / 'b.wav', 2000)]
+    assert len(processor._build_bed(tracks, 12000)) == 12000
+
+
+def test_build_bed_without_duration_is_silent(processor, tmp_path):
+    assert len(processor._build_bed([wav(tmp_path / 'a.wav', 1000)], 0)) == 0
+    assert len(processor._build_bed([wav(tmp_path / 'a.wav', 1000)], -50)) == 0
+
+
+def test_build_bed_rejects_empty_tracks(processor, tmp_path):
+    """长度为0的曲目无法循环，报错而不是无限循环"""
+    with pytest.raises(AudioGenerationError):
+        processor._build_bed([wav(tmp_path / 'empty.wav', 0)], 5000)
+
+
+def test_background_music_matches_voice_length(processor, tmp_path, monkeypatch):
+    monkeypatch.setattr(processor, '_load_background_music',
+                        lambda duration_ms, **kwargs: processor._build_bed([wav(tmp_path / 'a.wav', 2000)], duration_ms))
+    voice = speech(sections=3)
+    assert len(processor._add_background_music(voice)) == len(voice)
+
+
+@pytest.fixture
+def library(processor, tmp_path, monkeypatch):
+    """只有一首已测量响度（-20 LUFS）的背景音乐，目标响度-34 LUFS"""
+    monkeypatch.setattr(audio_probe, '_default_probe', AudioProbe(str(tmp_path / 'probe_cache.json')))
+    category = tmp_path / 'music' / 'business'
+    category.mkdir(parents=True)
+    track = wav(category / 'bed.wav', 5000)
+    track['loudness']['duration'] = 5.0
+    (category / 'music_info.json').write_text(json.dumps([track]), encoding='utf-8')
+    processor.bed_target_lufs = -34.0
+    processor.music_selector = MusicSelector(str(tmp_path / 'music'), str(tmp_path / 'history.json'))
+    voice_path = tmp_path / 'voice.wav'
+    speech(sections=2).export(str(voice_path), format='wav')
+    return str(voice_path), track
+
+
+def mixed_beds(processor, monkeypatch):
+    """记录process_podcast交给混音的背景音乐文件"""
+    beds = []
+
+    def mix(voice_path, bed_path, music_volume):
+        beds.append((bed_path, AudioSegment.from_file(bed_path)))
+        return voice_path
+
+    monkeypatch.setattr(processor, 'add_background_music', mix)
+    return beds
+
+
+def test_music_volume_offsets_loudness_matched_gain(processor, library, monkeypatch):
+    voice_path, track = library
+    source = AudioSegment.from_file(track['file_path']).dBFS
+    beds = mixed_beds(processor, monkeypatch)
+    processor.process_podcast(voice_path, music_volume=0.3)
+    processor.process_podcast(voice_path, music_volume=0.6)
+    # 默认音量调整到目标响度（-14 dB），音量加倍再提高约6 dB
+    assert beds[0][1].dBFS == pytest.approx(source - 14, abs=0.2)
+    assert beds[1][1].dBFS - beds[0][1].dBFS == pytest.approx(6.02, abs=0.2)
+    # 临时文件写在输出目录，混音后删除
+    assert all(path.startswith(processor.output_dir) for path, _ in beds)
+    assert not any(os.path.exists(path) for path, _ in beds)
+
+
+def test_zero_music_volume_skips_background(processor, library, monkeypatch):
+    voice_path, _ = library
+    beds = mixed_beds(processor, monkeypatch)
+    assert processor.process_podcast(voice_path, music_volume=0) == voice_path
+    assert beds == []
+
+@pytest.mark.parametrize('generate', ['generate_segmented', 'generate_live'])
+def test_streaming_rejects_target_duration(processor, generate):
+    """渐进式渲染和直播无法调整到目标时长，直接报错而不是忽略"""
+    processor.live_stream_url = 'http://localhost:8000/live.mp3'
+    content = {'title': '标题', 'script': '正文。'}
+    with pytest.raises(AudioGenerationError, match='目标时长'):
+        getattr(processor, generate)(content, target_duration=60)
+    with pytest.raises(AudioGenerationError, match='目标时长'):
+        getattr(processor, generate)(dict(content, target_duration=60))
+
+def test_trim_silence_keeps_edge_padding(processor):
+    processor.trim_silence = True
+    audio = AudioSegment.silent(duration=2000, frame_rate=44100) + speech(sections=1, pause_ms=3000)
+    trimmed, removed = processor._trim_silence(audio)
+    # 首尾各保留edge_padding_ms（100ms）
+    assert len(trimmed) == pytest.approx(1000 + 2 * processor.edge_padding_ms, abs=40)
+    assert removed == pytest.approx((len(audio) - len(trimmed)) / 1000, abs=0.01)
+
+
+def test_trim_silence_maps_cues(processor):
+    processor.trim_silence = True
+    cues = [{'start': 0, 'end': 1000}, {'start': 3000, 'end': 4000}]
+    trimmed, _ = processor._trim_silence(speech(sections=2, pause_ms=2000), max_pause_ms=600, cues=cues)
+    assert cues[0] == {'start': 0, 'end': pytest.approx(1000, abs=40)}
+    assert cues[1]['start'] == pytest.approx(1600, abs=40)
+    assert cues[1]['end'] == pytest.approx(2600, abs=40)
+
+
+def test_trim_silence_disabled(processor):
+    processor.trim_silence = False
+    audio = speech(sections=2)
+    assert processor._trim_silence(audio) == (audio, 0.0)
+
+
+def test_trim_silence_without_speech(processor):
+    processor.trim_silence = True
+    audio = AudioSegment.silent(duration=1000, frame_rate=44100)
+    assert processor._trim_silence(audio) == (audio, 0.0)
+
+def test_estimate_preview_count(processor):
+    # 9个字按每秒4.5字估计为2秒，加上句间停顿
+    sentences = ['一二三四五六七八九'] * 10
+    per_sentence = 2000 + processor.sentence_gap_ms
+    assert processor._estimate_preview_count(sentences, 3 * per_sentence) == 3
+    assert processor._estimate_preview_count(sentences, 3 * per_sentence + 1) == 4
+    assert processor._estimate_preview_count([('甲', text) for text in sentences], per_sentence) == 1
+    assert processor._estimate_preview_count(sentences, 100 * per_sentence) == 10
+
+
+class FastSynthesizer:
+    """每个字100毫秒，比试听估计的语速快，需要追加句子才能填满试听时长"""
+
+    def __init__(self):
+        self.texts = []
+
+    def synthesize(self, text, voice=None):
+        self.texts.append(text)
+        return Sine(440).to_audio_segment(duration=100 * len(text), volume=-10).set_frame_rate(24000)
+
+    def synthesize_many(self, items):
+        return [self.synthesize(text, voice) for text, voice in items]
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='需要ffmpeg')
+def test_preview_synthesizes_only_what_it_needs(processor, monkeypatch):
+    processor.synthesizer = FastSynthesizer()
+    monkeypatch.setattr(processor, '_load_background_music', lambda duration_ms, **kwargs: None)
+    sentences = [f'第{index:02d}句话的内容。' for index in range(60)]
+    info = processor.generate_preview({'title': '标题', 'script': ''.join(sentences)}, seconds=10)
+
+    assert info['preview']
+    assert info['duration'] == pytest.approx(10, abs=0.05)
+    used = [text for text in processor.synthesizer.texts if text != '标题']
+    count = len(set(used))
+    # 只合成开头的句子；第一次估计不够时追加，前面的句子会再次请求（实际运行中命中缓存）
+    assert set(used) == set(sentences[:count]) and count < len(sentences)
+    assert len(used) > count
+    probed = AudioProbe().probe(info['path'])
+    assert (probed['format'], probed['channels'], probed['sample_rate']) == ('mp3', 1, processor.preview_frame_rate)
+    assert probed['duration'] == pytest.approx(10, abs=0.1)
\ No newline at end of file
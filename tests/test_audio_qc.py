@@ -0,0 +1,105 @@
+import shutil
+import numpy as np
+import pytest
+import soundfile as sf
+from audio_qc import AudioQCAnalyzer
+from exceptions import QualityCheckError
+from podcast_publisher import PodcastPublisher
+
+RATE = 44100
+
+
+def sine(seconds, amplitude=0.1, freq=997, channels=1):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return np.repeat((amplitude * np.sin(2 * np.pi * freq * t)).astype(np.float32)[:, None], channels, axis=1)
+
+
+def analyze(samples, block=RATE, **kwargs):
+    analyzer = AudioQCAnalyzer(RATE, samples.shape[1], **kwargs)
+    for start in range(0, len(samples), block):
+        analyzer.process_block(samples[start:start + block])
+    return analyzer.finalize()['qc']
+
+
+def test_loudness_of_reference_tone():
+    """BS.1770: 单声道997Hz正弦，峰值-20 dBFS约为-23 LUFS"""
+    report = analyze(sine(12))
+    assert report['integrated_lufs'] == pytest.approx(-23.0, abs=0.3)
+    assert report['true_peak_dbtp'] == pytest.approx(-20.0, abs=0.1)
+    assert report['duration'] == pytest.approx(12.0)
+    assert report['passed'] and report['failures'] == []
+
+
+def test_result_does_not_depend_on_block_size():
+    samples = sine(12, channels=2)
+    samples[RATE * 5:RATE * 8] = 0
+    first, second = analyze(samples, block=RATE), analyze(samples, block=3001)
+    for key in ('integrated_lufs', 'true_peak_dbtp', 'clipped_samples', 'longest_silence', 'silence_runs'):
+        assert first[key] == pytest.approx(second[key], abs=0.05)
+
+
+def test_clipping_fails():
+    report = analyze(np.clip(sine(12, amplitude=1.5), -1, 1))
+    assert report['clipped_samples'] > 1000
+    assert any('削波' in failure for failure in report['failures'])
+    assert not report['passed']
+
+
+def test_long_silence_fails():
+    samples = np.concatenate([sine(4), np.zeros((RATE * 6, 1), dtype=np.float32), sine(4)])
+    report = analyze(samples)
+    assert report['longest_silence'] == pytest.approx(6.0, abs=0.2)
+    assert report['silence_runs'] == 1
+    assert any('静音过长' in failure for failure in report['failures'])
+
+
+def test_short_and_quiet_audio_fails():
+    report = analyze(sine(3, amplitude=0.005))
+    assert {failure[:4] for failure in report['failures']} == {'响度超出', '时长过短'}
+
+
+def test_spectral_flatness_flags_noise():
+    noise = np.random.default_rng(1).uniform(-0.2, 0.2, (RATE * 12, 1)).astype(np.float32)
+    assert analyze(noise, spectral_flatness=True)['spectral_flatness'] > 0.5
+    assert analyze(sine(12), spectral_flatness=True)['spectral_flatness'] < 0.1
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='需要ffmpeg')
+def test_analyze_file_stops_early(tmp_path):
+    path = str(tmp_path / 'clipped.wav')
+    sf.write(path, np.clip(sine(30, amplitude=1.5), -1, 1), RATE)
+    report = AudioQCAnalyzer.analyze_file(path)
+    assert report['aborted']
+    assert report['duration'] < 30
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    monkeypatch.setenv('QC_ENABLED', 'true')
+    return PodcastPublisher()
+
+
+def test_failed_report_blocks_publishing(publisher):
+    report = {'passed': False, 'failures': ['削波样本过多: 5000']}
+    with pytest.raises(QualityCheckError) as info:
+        publisher._check_audio_quality({'path': 'episode.mp3', 'qc': report})
+    assert info.value.report is report
+
+
+def test_passed_report_allows_publishing(publisher):
+    publisher._check_audio_quality({'path': 'episode.mp3', 'qc': {'passed': True, 'failures': []}})
+
+
+def test_missing_report_analyzes_file(publisher, monkeypatch):
+    calls = []
+
+    def analyze_file(path, **kwargs):
+        calls.append(path)
+        return {'passed': False, 'failures': ['时长过短: 3.0秒']}
+
+    monkeypatch.setattr(AudioQCAnalyzer, 'analyze_file', analyze_file)
+    audio_info = {'path': 'episode.mp3'}
+    with pytest.raises(QualityCheckError):
+        publisher._check_audio_quality(audio_info)
+    assert calls == ['episode.mp3']
+    assert audio_info['qc']['failures'] == ['时长过短: 3.0秒']
\ No newline at end of file
@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+import asyncio
+import argparse
+import subprocess
+from publish_engine import PlatformClient
+from scripts import benchmark_publish
+from scripts.mock_platform_server import add_fault_arguments
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def bench_args(*argv):
+    """按命令行默认值构造压测参数"""
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--episodes', type=int, default=6)
+    parser.add_argument('--concurrency', type=int, default=3)
+    parser.add_argument('--size-mb', type=float, default=0.25)
+    parser.add_argument('--platforms', type=str, default='xiaoyuzhou,lizhi')
+    parser.add_argument('--chunk-size', type=int, default=0)
+    parser.add_argument('--max-retries', type=int, default=10)
+    parser.add_argument('--url', type=str, default=None)
+    parser.add_argument('--api-key', type=str, default='benchmark')
+    add_fault_arguments(parser)
+    return parser.parse_args(argv)
+
+
+def test_benchmark_with_injected_faults(monkeypatch):
+    """注入503、429和中途断开后所有发布仍成功，重试开销计入服务器统计"""
+    monkeypatch.setattr(PlatformClient, 'retry_delay', 0)
+    for chunk_size in ('0', '65536'):
+        args = bench_args('--chunk-size', chunk_size, '--error-rate', '0.15', '--throttle-rate', '0.1',
+                          '--disconnect-rate', '0.1', '--seed', '5')
+        report = asyncio.run(benchmark_publish.benchmark(args))
+        assert report['succeeded'] == 12 and report['failed'] == 0
+        assert sum(report['injected_faults'].values()) > 0
+        assert report['wire_bytes'] >= report['size_bytes'] * 12
+        assert report['requests_per_publish'] > 1
+
+
+def test_benchmark_script_runs(tmp_path):
+    """按文档的用法从仓库根目录运行脚本"""
+    output = tmp_path / 'report.json'
+    subprocess.run(
+        [sys.executable, os.path.join('scripts', 'benchmark_publish.py'), '--episodes', '2',
+         '--size-mb', '0.1', '--output', str(output)],
+        cwd=ROOT, check=True, capture_output=True, timeout=60
+    )
+    report = json.loads(output.read_text(encoding='utf-8'))
+    assert report['succeeded'] == 2 and report['failed'] == 0
\ No newline at end of file
@@ -0,0 +1,82 @@
+import shutil
+import pytest
+from pydub.generators import Sine
+from block_renderer import BlockRenderer, StreamingEncoder, StreamingRenderer
+
+
+class RecordingSink:
+    """记录收到的块和是否被终止的输出端"""
+
+    def __init__(self, fail_after=None, fail_finalize=False):
+        self.blocks = 0
+        self.aborted = False
+        self.fail_after = fail_after
+        self.fail_finalize = fail_finalize
+
+    def process_block(self, block):
+        if self.fail_after is not None and self.blocks >= self.fail_after:
+            raise RuntimeError('输出端出错')
+        self.blocks += 1
+
+    def abort(self):
+        self.aborted = True
+
+    def finalize(self):
+        if self.fail_finalize:
+            raise RuntimeError('结束失败')
+        return {'blocks': self.blocks}
+
+
+class PlainSink:
+    """没有abort()的输出端"""
+
+    def process_block(self, block):
+        pass
+
+    def finalize(self):
+        return {}
+
+
+class BrokenAbortSink(RecordingSink):
+    def abort(self):
+        raise OSError('进程已退出')
+
+
+def tone(seconds=3):
+    return Sine(440).to_audio_segment(duration=seconds * 1000, volume=-10)
+
+
+def test_render_feeds_every_sink():
+    sinks = [RecordingSink(), PlainSink()]
+    assert BlockRenderer(tone(), block_ms=500).render(sinks) == {'blocks': 6}
+
+
+def test_render_aborts_all_sinks_on_error():
+    sinks = [RecordingSink(), PlainSink(), BrokenAbortSink(), RecordingSink(fail_after=2)]
+    with pytest.raises(RuntimeError):
+        BlockRenderer(tone()).render(sinks)
+    assert sinks[0].aborted and sinks[3].aborted
+
+
+def test_render_aborts_when_finalize_fails():
+    sinks = [RecordingSink(fail_finalize=True), RecordingSink()]
+    with pytest.raises(RuntimeError):
+        BlockRenderer(tone()).render(sinks)
+    assert all(sink.aborted for sink in sinks)
+
+
+def test_streaming_renderer_abort():
+    sinks = [RecordingSink(), PlainSink(), BrokenAbortSink(), RecordingSink()]
+    renderer = StreamingRenderer(44100, 1, sinks)
+    renderer.push(tone())
+    renderer.abort()
+    assert sinks[0].aborted and sinks[3].aborted
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='需要ffmpeg')
+def test_render_kills_encoder_on_error(tmp_path):
+    audio = tone().set_sample_width(2)
+    encoder = StreamingEncoder(str(tmp_path / 'out.mp3'), audio.frame_rate, audio.channels)
+    with pytest.raises(RuntimeError):
+        BlockRenderer(audio).render([encoder, RecordingSink(fail_after=1)])
+    assert encoder.process.wait(timeout=5) != 0
\ No newline at end of file
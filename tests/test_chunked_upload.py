@@ -0,0 +1,121 @@
+import os
+import asyncio
+import aiohttp
+import pytest
+from aiohttp import web
+from chunked_upload import ChunkedUploader
+from exceptions import APIError, PublishingError
+from scripts.mock_platform_server import create_app, FaultInjector, MockPlatform, PLATFORM_KEY
+
+CHUNK_SIZE = 64 * 1024
+
+
+async def run_with_server(tmp_path, scenario, faults=None):
+    """在随机端口启动模拟平台服务器并执行scenario(平台, 接口地址)"""
+    app = create_app(str(tmp_path / 'storage'), 'test', faults)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await scenario(app[PLATFORM_KEY], f"http://127.0.0.1:{port}/xiaoyuzhou")
+    finally:
+        await runner.cleanup()
+
+
+async def upload(api_url, path, manifest_dir, max_retries=3):
+    async with aiohttp.ClientSession(headers={'Authorization': 'Bearer test'}) as session:
+        uploader = ChunkedUploader(session, api_url, 'xiaoyuzhou', chunk_size=CHUNK_SIZE,
+                                   manifest_dir=manifest_dir, max_retries=max_retries, retry_delay=0)
+        return await uploader.upload(path)
+
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / 'episode.mp3'
+    path.write_bytes(os.urandom(5 * CHUNK_SIZE + 1000))
+    return str(path)
+
+
+def stored(platform, upload_id):
+    with open(platform._file_path('xiaoyuzhou', upload_id), 'rb') as f:
+        return f.read()
+
+
+def test_upload_in_chunks(tmp_path, audio_file):
+    async def scenario(platform, api_url):
+        upload_id = await upload(api_url, audio_file, str(tmp_path / 'manifests'))
+        assert platform.requests['PUT'] == 6
+        assert platform.received_bytes == os.path.getsize(audio_file)
+        return stored(platform, upload_id)
+
+    with open(audio_file, 'rb') as f:
+        assert asyncio.run(run_with_server(tmp_path, scenario)) == f.read()
+
+
+def test_resume_after_interrupted_upload(tmp_path, audio_file):
+    """第三个分块中途断开，重新运行时从服务器确认的偏移继续，只重传剩下的分块"""
+    manifest_dir = str(tmp_path / 'manifests')
+
+    async def scenario(platform, api_url):
+        # 从第三个分块起一直断开（aiohttp会在复用的连接上自动重发一次幂等的PUT）
+        picks = iter([None, None])
+        platform.faults.pick = lambda: next(picks, 'disconnect')
+        with pytest.raises(PublishingError):
+            await upload(api_url, audio_file, manifest_dir, max_retries=1)
+        assert platform.injected['disconnect'] >= 1
+        assert [upload['offset'] for upload in platform.uploads.values()] == [2 * CHUNK_SIZE]
+
+        platform.faults.pick = lambda: None
+        platform.requests.clear()
+        upload_id = await upload(api_url, audio_file, manifest_dir)
+        # 一次查询偏移，剩下4个分块
+        assert platform.requests == {'GET': 1, 'PUT': 4}
+        assert len(platform.uploads) == 1
+        return stored(platform, upload_id)
+
+    with open(audio_file, 'rb') as f:
+        assert asyncio.run(run_with_server(tmp_path, scenario)) == f.read()
+
+
+def test_retries_through_injected_faults(tmp_path, audio_file):
+    faults = FaultInjector(error_rate=0.2, disconnect_rate=0.2, seed=7)
+
+    async def scenario(platform, api_url):
+        upload_id = await upload(api_url, audio_file, str(tmp_path / 'manifests'), max_retries=10)
+        assert sum(platform.injected.values()) > 0
+        return stored(platform, upload_id)
+
+    with open(audio_file, 'rb') as f:
+        assert asyncio.run(run_with_server(tmp_path, scenario, faults)) == f.read()
+
+
+def test_rejected_chunk_keeps_status_code(tmp_path, audio_file, monkeypatch):
+    """4xx拒绝不重试，抛出带状态码的APIError"""
+    async def reject(self, request):
+        return web.json_response({'error': 'too large'}, status=413)
+    monkeypatch.setattr(MockPlatform, 'put_chunk', reject)
+
+    async def scenario(platform, api_url):
+        with pytest.raises(APIError) as error:
+            await upload(api_url, audio_file, str(tmp_path / 'manifests'))
+        assert error.value.status_code == 413
+        assert platform.requests['PUT'] == 1
+
+    asyncio.run(run_with_server(tmp_path, scenario))
+
+def test_stalled_offset_fails_after_retries(tmp_path, audio_file, monkeypatch):
+    """服务器一直确认原来的偏移（分块未被接收）时按失败计数，重试用尽后报错而不是无限循环"""
+    async def stall(self, request):
+        upload = self.uploads[request.match_info['upload_id']]
+        await request.read()
+        return web.json_response({'offset': upload['offset']})
+    monkeypatch.setattr(MockPlatform, 'put_chunk', stall)
+
+    async def scenario(platform, api_url):
+        with pytest.raises(PublishingError):
+            await upload(api_url, audio_file, str(tmp_path / 'manifests'), max_retries=3)
+        assert platform.requests['PUT'] == 3
+
+    asyncio.run(run_with_server(tmp_path, scenario))
\ No newline at end of file
@@ -0,0 +1,78 @@
+import pytest
+from pydub.generators import Sine
+from dialogue_renderer import DialogueRenderer
+
+SCRIPT = """
+主持人：欢迎收听本期节目。
+**嘉宾**: 谢谢邀请（笑）。
+很高兴来到这里。
+【主持人】：我们开始吧。
+"""
+
+
+class ToneSynthesizer:
+    """每个字合成100毫秒正弦音，不同声音使用不同频率"""
+
+    def _tone(self, text, voice):
+        return Sine(300 + 100 * voice).to_audio_segment(duration=100 * len(text), volume=-10).set_frame_rate(24000)
+
+    def synthesize_many(self, items):
+        return [self._tone(text, voice) for text, voice in items]
+
+    def iter_synthesize(self, items):
+        for text, voice in items:
+            yield self._tone(text, voice)
+
+
+def renderer(**kwargs):
+    return DialogueRenderer(ToneSynthesizer(), voices=[0, 1], **kwargs)
+
+
+def test_parse_turns():
+    assert DialogueRenderer.parse_turns(SCRIPT) == [
+        ('主持人', '欢迎收听本期节目。'),
+        ('嘉宾', '谢谢邀请。很高兴来到这里。'),
+        ('主持人', '我们开始吧。')
+    ]
+
+
+def test_is_dialogue_needs_two_speakers():
+    assert DialogueRenderer.is_dialogue(DialogueRenderer.parse_turns(SCRIPT))
+    assert not DialogueRenderer.is_dialogue([('主持人', '你好。'), ('主持人', '再见。')])
+
+
+def test_render_places_turns_with_gap():
+    turns = [('甲', '一二三'), ('乙', '四五'), ('乙', '六')]
+    audio, timeline, _ = renderer(gap_ms=200).render(turns)
+    assert audio.channels == 2
+    assert [(cue['start'], cue['end']) for cue in timeline] == [(0, 300), (500, 700), (900, 1000)]
+    assert len(audio) == 1000
+
+
+def test_render_overlaps_speaker_changes():
+    turns = [('甲', '一二三'), ('乙', '四五'), ('乙', '六')]
+    _, timeline, _ = renderer(gap_ms=200, overlap_ms=100).render(turns)
+    # 换人时提前100ms开始，同一说话人连续时仍按间隔
+    assert [(cue['start'], cue['end']) for cue in timeline] == [(0, 300), (200, 400), (600, 700)]
+
+
+def test_speakers_are_panned_apart():
+    audio, _, _ = renderer(pan=0.5).render([('甲', '一二'), ('乙', '三四')])
+    first, second = audio[:200].split_to_mono(), audio[200:].split_to_mono()
+    assert first[0].dBFS > first[1].dBFS
+    assert second[1].dBFS > second[0].dBFS
+    assert first[0].dBFS - first[1].dBFS == pytest.approx(second[1].dBFS - second[0].dBFS, abs=0.1)
+
+
+def test_iter_render_trims_each_turn():
+    trimmed = []
+
+    def trim(segment):
+        trimmed.append(len(segment))
+        return segment[:100], (len(segment) - 100) / 1000
+
+    items = list(renderer(trim_func=trim).iter_render([('甲', '一二三'), ('乙', '四五')]))
+    assert trimmed == [300, 200]
+    assert [(speaker, len(segment), segment.channels, removed) for speaker, _, segment, removed in items] == [
+        ('甲', 100, 2, 0.2), ('乙', 100, 2, 0.1)
+    ]
\ No newline at end of file
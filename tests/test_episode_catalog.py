@@ -0,0 +1,90 @@
+import hashlib
+import multiprocessing
+import pytest
+from episode_catalog import EpisodeCatalog, file_sha256
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = EpisodeCatalog(str(tmp_path / 'episodes.db'))
+    yield catalog
+    catalog.close()
+
+
+def content(index, **extra):
+    return dict({'title': f"第{index}期", 'script': f"脚本{index}", 'topic': '科技'}, **extra)
+
+
+def test_register_numbers_each_season(catalog):
+    numbers = [catalog.register(content(i), season=1)['episode'] for i in range(3)]
+    assert numbers == [1, 2, 3]
+    assert catalog.register(content(3), season=2)['episode'] == 1
+    assert catalog.register(content(4), show='other', season=1)['episode'] == 1
+    assert catalog.register(content(5), season=1)['episode'] == 4
+
+
+def test_register_same_content_returns_existing_episode(catalog):
+    first = catalog.register(content(1))
+    # 只有首尾空白不同，仍然是同一集，不占用新集号
+    again = catalog.register(content(1, title=" 第1期 ", style='对话'))
+    assert again['id'] == first['id']
+    assert again['episode'] == 1
+    assert catalog.register(content(2))['episode'] == 2
+    assert catalog.find_by_content(content(1))['id'] == first['id']
+    assert catalog.find_by_content(content(9)) is None
+
+
+def _register_many(db_path, worker, count):
+    catalog = EpisodeCatalog(db_path)
+    for index in range(count):
+        catalog.register(content(f"{worker}-{index}"))
+    catalog.close()
+
+
+def test_concurrent_register_has_no_gaps(tmp_path):
+    db_path = str(tmp_path / 'episodes.db')
+    EpisodeCatalog(db_path).close()
+    processes = [
+        multiprocessing.Process(target=_register_many, args=(db_path, worker, 15))
+        for worker in range(4)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+    catalog = EpisodeCatalog(db_path)
+    numbers = sorted(row[0] for row in catalog.connection.execute("SELECT episode FROM episodes"))
+    catalog.close()
+    assert numbers == list(range(1, 61))
+
+
+def test_platform_records(catalog):
+    episode = catalog.register(content(1))
+    catalog.record_platform(episode['id'], 'xiaoyuzhou', {'episode_id': 'x-1', 'episode_url': 'http://x/1'})
+    assert catalog.published_platforms(content(1))['xiaoyuzhou']['platform_episode_id'] == 'x-1'
+    assert catalog.published_platforms(content(2)) == {}
+
+
+def test_uploads_are_found_by_audio_hash(catalog, tmp_path):
+    audio = tmp_path / 'episode.mp3'
+    audio.write_bytes(b'\xff\xfb' * 100000)
+    digest = file_sha256(str(audio), chunk_size=4096)
+    assert digest == hashlib.sha256(audio.read_bytes()).hexdigest()
+
+    episode = catalog.register(content(1))
+    assert catalog.episode_for_audio(digest) is None
+    catalog.add_rendition(episode['id'], {'path': str(audio), 'sha256': digest})
+    assert catalog.episode_for_audio(digest)['id'] == episode['id']
+
+    catalog.record_upload(episode['id'], 'xiaoyuzhou', digest, {'episode_id': 'x-1'}, content(1))
+    uploads = catalog.uploads_for_audio(digest)
+    assert list(uploads) == ['xiaoyuzhou']
+    assert uploads['xiaoyuzhou']['title'] == '第1期'
+
+    # 只改了标题: 同步目录，集号不变
+    catalog.update_content(episode['id'], content(1, title='新标题'))
+    updated = catalog.get(episode['id'])
+    assert updated['title'] == '新标题'
+    assert updated['episode'] == 1
\ No newline at end of file
@@ -0,0 +1,40 @@
+import os
+import shutil
+import numpy as np
+import pytest
+from hls_writer import HLSSegmentWriter
+
+pytestmark = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='需要ffmpeg')
+
+
+def tone(seconds, frame_rate=44100):
+    t = np.arange(int(seconds * frame_rate)) / frame_rate
+    return (0.3 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)[:, None]
+
+
+def write(writer, samples, block=4096):
+    for start in range(0, len(samples), block):
+        writer.process_block(samples[start:start + block])
+
+
+def test_segments_and_closed_playlist(tmp_path):
+    writer = HLSSegmentWriter(str(tmp_path / 'hls'), 44100, 1, segment_seconds=4, bitrate='64k')
+    write(writer, tone(13))
+    result = writer.finalize()
+    assert result == {'hls_playlist': str(tmp_path / 'hls' / 'playlist.m3u8'), 'hls_segments': 4}
+
+    with open(result['hls_playlist'], encoding='utf-8') as f:
+        lines = f.read().splitlines()
+    assert '#EXT-X-PLAYLIST-TYPE:EVENT' in lines
+    assert lines[-1] == '#EXT-X-ENDLIST'
+    durations = [float(line[len('#EXTINF:'):].rstrip(',')) for line in lines if line.startswith('#EXTINF')]
+    assert sum(durations) == pytest.approx(13, abs=0.1)
+    segments = [line for line in lines if line.endswith('.ts')]
+    assert all(os.path.getsize(tmp_path / 'hls' / segment) > 0 for segment in segments)
+
+
+def test_abort_stops_encoder(tmp_path):
+    writer = HLSSegmentWriter(str(tmp_path / 'hls'), 44100, 1, segment_seconds=4)
+    write(writer, tone(1))
+    writer.abort()
+    assert writer.encoder.process.wait(timeout=5) != 0
\ No newline at end of file
@@ -0,0 +1,75 @@
+import json
+import pytest
+import keyword_classifier
+from keyword_classifier import KeywordAutomaton, KeywordClassifier
+from podcast_publisher import PodcastPublisher
+
+CATEGORIES = {
+    'technology': {'AI': 2, '芯片': 2, '科技': 3},
+    'business': {'投资': 3, '芯片': 1},
+    'health': {'睡眠': 2}
+}
+
+
+def test_automaton_finds_overlapping_matches():
+    automaton = KeywordAutomaton(['he', 'she', 'his', 'hers'])
+    matches = [(end, automaton.keywords[index]) for end, index in automaton.scan('ushers')]
+    assert sorted(matches) == [(3, 'he'), (3, 'she'), (5, 'hers')]
+
+
+def test_automaton_matches_chinese():
+    automaton = KeywordAutomaton(['人工', '人工智能', '智能'])
+    matches = [automaton.keywords[index] for _, index in automaton.scan('人工智能时代')]
+    assert sorted(matches) == ['人工', '人工智能', '智能']
+
+
+def test_categories_are_weighted_by_field():
+    classifier = KeywordClassifier(CATEGORIES)
+    result = classifier.classify({'title': '睡眠与健康', 'script': '投资 投资 投资'})
+    # 标题权重2: 睡眠 2×2=4；正文权重1: 投资 3×1×3=9
+    assert result['categories'] == [('business', round(9 / 13, 3)), ('health', round(4 / 13, 3))]
+    assert result['tags'] == ['投资', '睡眠']
+
+
+def test_keyword_in_several_categories():
+    result = KeywordClassifier(CATEGORIES).classify({'topic': '芯片'})
+    assert result['categories'] == [('technology', 0.667), ('business', 0.333)]
+
+
+def test_ascii_keywords_match_whole_words_ignoring_case():
+    classifier = KeywordClassifier(CATEGORIES)
+    assert classifier.classify({'script': 'He said nothing, but maybe AID helps.'})['categories'] == []
+    assert classifier.classify({'script': '聊聊ai和大家'})['tags'] == ['AI']
+    assert classifier.classify({'script': 'Open-AI, ai!'})['tags'] == ['AI']
+
+
+def test_empty_and_non_text_fields():
+    assert KeywordClassifier(CATEGORIES).classify({'title': '', 'script': None, 'topic': 3}) == {
+        'categories': [], 'tags': []
+    }
+
+
+def test_from_file_merges_with_defaults(tmp_path):
+    path = tmp_path / 'keywords.json'
+    path.write_text(json.dumps({'technology': {'量子': 3}, 'games': {'电竞': 3}}, ensure_ascii=False), encoding='utf-8')
+    classifier = KeywordClassifier.from_file(str(path))
+    assert classifier.classify({'title': '电竞比赛'})['categories'] == [('games', 1.0)]
+    assert classifier.classify({'title': '量子计算与科技'})['categories'] == [('technology', 1.0)]
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    monkeypatch.setattr(keyword_classifier, '_default_classifier', None)
+    monkeypatch.delenv('KEYWORD_DICT_PATH', raising=False)
+    return PodcastPublisher()
+
+
+def test_publisher_category_and_tags(publisher):
+    content = {'style': '深度访谈', 'topic': '创业与融资', 'title': '创业公司如何融资', 'script': '聊聊投资人。'}
+    assert publisher._determine_category(content) == 'business'
+    assert publisher._generate_tags(content) == ['深度访谈', '创业', '融资', '投资', '公司']
+
+
+def test_publisher_default_category(publisher):
+    assert publisher._determine_category({'title': 'Hello'}) == 'society'
+    assert publisher._generate_tags({'title': 'Hello'}) == ['播客', 'AI生成', 'zaka播客']
\ No newline at end of file
@@ -0,0 +1,91 @@
+import json
+import numpy as np
+import pytest
+import soundfile as sf
+from config import music_features
+from config.background_music import MusicMood
+from config.music_features import (
+    MINOR_PROFILE, MusicFeatureAnalyzer, estimate_key, extract_features, features_to_mood
+)
+
+FEATURES = {'bpm': 96.0, 'energy_db': -22.0, 'spectral_centroid': 2000.0, 'mode': 'major', 'key': 'C major'}
+
+
+def test_estimate_key():
+    key = estimate_key(np.roll(MINOR_PROFILE, 9))
+    assert key == {'key': 'A minor', 'mode': 'minor', 'key_confidence': 1.0}
+
+
+@pytest.mark.parametrize('changes, mood', [
+    ({'bpm': 128, 'energy_db': -15}, MusicMood.ENERGETIC),
+    ({'bpm': 70, 'energy_db': -30, 'spectral_centroid': 1000}, MusicMood.CALM),
+    ({'bpm': 70, 'energy_db': -30}, MusicMood.RELAXING),
+    ({'mode': 'minor', 'spectral_centroid': 1200}, MusicMood.MYSTERIOUS),
+    ({'mode': 'minor'}, MusicMood.SERIOUS),
+    ({'spectral_centroid': 3500}, MusicMood.CONTEMPORARY),
+    ({'bpm': 105}, MusicMood.PROFESSIONAL),
+    ({}, MusicMood.FOCUSED)
+])
+def test_features_to_mood(changes, mood):
+    assert features_to_mood(dict(FEATURES, **changes)) is mood
+
+
+def test_extract_features_reads_only_the_opening(tmp_path):
+    path = str(tmp_path / 'a.wav')
+    t = np.arange(22050 * 6) / 22050
+    sf.write(path, 0.3 * np.sin(2 * np.pi * 440 * t), 22050)
+    features = extract_features(path, max_seconds=3)
+    assert features['analyzed_seconds'] == pytest.approx(3.0)
+    assert features['key'].startswith('A ')
+    assert features['energy_db'] == pytest.approx(20 * np.log10(0.3 / np.sqrt(2)), abs=0.5)
+
+
+@pytest.fixture
+def library(tmp_path):
+    """calm类别: a和b内容相同，c只在目录中、没有music_info.json记录"""
+    category = tmp_path / 'music' / 'calm'
+    category.mkdir(parents=True)
+    for name, content in (('a', b'same'), ('b', b'same'), ('c', b'other')):
+        (category / f'{name}.mp3').write_bytes(content)
+    info = [{'id': 'a', 'file_path': str(category / 'a.mp3')}, {'id': 'b', 'file_path': str(category / 'b.mp3')}]
+    (category / 'music_info.json').write_text(json.dumps(info), encoding='utf-8')
+    return tmp_path
+
+
+def analyzer(library):
+    return MusicFeatureAnalyzer(str(library / 'music'), str(library / 'cache' / 'features.json'), max_workers=2)
+
+
+def fake_extract(path, max_seconds=120.0, sample_rate=22050):
+    if path.endswith('c.mp3'):
+        raise ValueError('无法解码')
+    return dict(FEATURES)
+
+
+def fail_extract(path, max_seconds=120.0, sample_rate=22050):
+    raise AssertionError('不应重新分析')
+
+
+def test_analyze_library_labels_tracks(library, monkeypatch):
+    # 进程池以fork方式启动，子进程中使用替换后的extract_features
+    monkeypatch.setattr(music_features, 'extract_features', fake_extract)
+    music_list = analyzer(library).analyze_library()['calm']
+    assert [music['id'] for music in music_list] == ['a', 'b', 'c']
+    assert [music.get('mood') for music in music_list] == ['focused', 'focused', None]
+    assert music_list[0]['mood_source'] == 'features' and music_list[0]['bpm'] == 96
+
+    saved = json.loads((library / 'music' / 'calm' / 'music_info.json').read_text(encoding='utf-8'))
+    assert [music.get('mood') for music in saved] == ['focused', 'focused', None]
+    # 内容相同的文件只有一条特征缓存
+    cache = json.loads((library / 'cache' / 'features.json').read_text(encoding='utf-8'))
+    assert len(cache['features']) == 1 and len(cache['files']) == 3
+
+
+def test_cached_features_are_reused(library, monkeypatch):
+    monkeypatch.setattr(music_features, 'extract_features', fake_extract)
+    analyzer(library).analyze_library()
+    monkeypatch.setattr(music_features, 'extract_features', fail_extract)
+    paths = [str(library / 'music' / 'calm' / name) for name in ('a.mp3', 'b.mp3')]
+    assert set(analyzer(library).analyze_files(paths)) == set(paths)
+    # force时重新分析，失败的文件不出现在结果中
+    assert analyzer(library).analyze_files(paths, force=True) == {}
\ No newline at end of file
@@ -0,0 +1,150 @@
+import shutil
+import numpy as np
+import pytest
+import soundfile as sf
+from config.music_crawler import MusicCrawler
+from config.music_fingerprint import SAMPLE_RATE, HOP_SIZE, FingerprintIndex, landmarks
+from exceptions import AudioProbeError
+
+
+def song(seed, seconds=20):
+    """随机音高、逐渐衰减的短音符序列，不同seed相当于不同的歌"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(SAMPLE_RATE // 4) / SAMPLE_RATE
+    notes = []
+    for freq in rng.uniform(200, 2000, int(seconds * 4)):
+        notes.append(np.exp(-8 * t) * (np.sin(2 * np.pi * freq * t) + 0.5 * np.sin(2 * np.pi * freq * 1.5 * t)))
+    return (0.3 * np.concatenate(notes)).astype(np.float32)
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = FingerprintIndex(str(tmp_path / 'fingerprints.json'))
+    for seed in range(3):
+        index.add(f'business/track_{seed}', f'music/business/track_{seed}.mp3', *landmarks(song(seed)))
+    return index
+
+
+def test_matches_quieter_noisy_copy_with_intro(index):
+    # 开头多了32帧静音，音量降低并加入噪声
+    noise = np.random.default_rng(9).normal(0, 0.01, len(song(1)) + 32 * HOP_SIZE)
+    query = np.concatenate([np.zeros(32 * HOP_SIZE), 0.5 * song(1)]) + noise
+    duplicate = index.match(*landmarks(query.astype(np.float32)))
+    assert duplicate['track_id'] == 'business/track_1'
+    assert duplicate['path'] == 'music/business/track_1.mp3'
+    assert duplicate['offset_seconds'] == pytest.approx(-32 * HOP_SIZE / SAMPLE_RATE, abs=0.01)
+    assert duplicate['matches'] >= index.min_matches
+
+
+def test_different_song_does_not_match(index):
+    assert index.match(*landmarks(song(7))) is None
+    assert index.match(*landmarks(np.zeros(SAMPLE_RATE, dtype=np.float32))) is None
+
+
+def test_index_is_saved_and_loaded(index):
+    index.save()
+    loaded = FingerprintIndex(index.index_path)
+    assert set(loaded.tracks) == set(index.tracks)
+    assert loaded.match(*landmarks(song(2)))['track_id'] == 'business/track_2'
+
+
+def test_remove_track(index):
+    index.remove('business/track_0')
+    assert index.match(*landmarks(song(0))) is None
+    assert all(track_id != 'business/track_0' for postings in index.inverted.values() for track_id, _ in postings)
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='需要ffmpeg')
+def test_index_library_reports_duplicates(tmp_path):
+    for category, name, seed in (('business', 'a', 0), ('calm', 'b', 1), ('calm', 'copy_of_a', 0)):
+        (tmp_path / 'music' / category).mkdir(parents=True, exist_ok=True)
+        sf.write(str(tmp_path / 'music' / category / f'{name}.wav'), song(seed), SAMPLE_RATE)
+    (tmp_path / 'music' / 'calm' / 'broken.mp3').write_bytes(b'not audio')
+
+    index = FingerprintIndex(str(tmp_path / 'fingerprints.json'))
+    duplicates = index.index_library(str(tmp_path / 'music'))
+    assert [(new.rsplit('/', 1)[-1], old.rsplit('/', 1)[-1]) for new, old in duplicates] == [('copy_of_a.wav', 'a.wav')]
+    assert set(index.tracks) == {'business/a', 'calm/b', 'calm/copy_of_a'}
+    # 已入库的文件不会重复计算
+    assert FingerprintIndex(index.index_path).index_library(str(tmp_path / 'music')) == []
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.data = data
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, chunk_size=8192):
+        for start in range(0, len(self.data), chunk_size):
+            yield self.data[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    """支持Range请求的下载服务器"""
+
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+
+    def get(self, url, headers=None, stream=False, timeout=None):
+        requested = (headers or {}).get('Range')
+        self.ranges.append(requested)
+        if not requested:
+            return FakeResponse(self.data)
+        start, end = requested[len('bytes='):].split('-')
+        return FakeResponse(self.data[int(start):int(end) + 1 if end else None], 206)
+
+
+class FakeIndex:
+    def __init__(self, duplicate=None, fail=False):
+        self.duplicate = duplicate
+        self.fail = fail
+        self.added = []
+
+    def find_duplicate(self, head):
+        if self.fail:
+            raise AudioProbeError('无法解码')
+        return self.duplicate
+
+    def add(self, track_id, path):
+        if self.fail:
+            raise AudioProbeError('无法解码')
+        self.added.append(track_id)
+
+
+def crawler(tmp_path, data, index):
+    music = MusicCrawler(str(tmp_path / 'music'))
+    music.prefetch_bytes = 1000
+    music.session = FakeSession(data)
+    music._fingerprints = index
+    return music
+
+
+def test_download_resumes_after_prefetched_head(tmp_path):
+    data = bytes(range(256)) * 10
+    music = crawler(tmp_path, data, FakeIndex())
+    path = music._download_file('https://example.com/a.mp3', 'calm', 'a')
+    assert open(path, 'rb').read() == data
+    assert music.session.ranges == ['bytes=0-999', 'bytes=1000-']
+    assert music.fingerprints.added == ['calm/a']
+
+
+def test_duplicate_is_not_downloaded(tmp_path):
+    index = FakeIndex({'path': 'music/calm/b.mp3', 'matches': 40, 'ratio': 0.5})
+    music = crawler(tmp_path, b'x' * 5000, index)
+    assert music._download_file('https://example.com/a.mp3', 'calm', 'a') is None
+    assert music.session.ranges == ['bytes=0-999']
+
+
+def test_fingerprint_failure_keeps_download(tmp_path):
+    music = crawler(tmp_path, b'x' * 500, FakeIndex(fail=True))
+    path = music._download_file('https://example.com/a.mp3', 'calm', 'a')
+    # 文件比预取长度短，开头已经是完整文件
+    assert open(path, 'rb').read() == b'x' * 500
+    assert music.session.ranges == ['bytes=0-999']
\ No newline at end of file
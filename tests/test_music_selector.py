@@ -0,0 +1,64 @@
+import json
+import pytest
+import audio_probe
+from audio_probe import AudioProbe
+from config.music_selector import MusicSelector
+
+
+@pytest.fixture(autouse=True)
+def probe(tmp_path, monkeypatch):
+    monkeypatch.setattr(audio_probe, '_default_probe', AudioProbe(str(tmp_path / 'probe_cache.json')))
+
+
+@pytest.fixture
+def library(tmp_path):
+    """business类别下时长为 30/60/90/200 秒的曲目，时长记录在music_info.json中"""
+    category = tmp_path / 'music' / 'business'
+    category.mkdir(parents=True)
+    tracks = []
+    for duration in (30, 60, 90, 200):
+        path = category / f'track_{duration}.mp3'
+        path.write_bytes(b'')
+        tracks.append({'file_path': str(path), 'loudness': {'duration': duration}})
+    (category / 'music_info.json').write_text(json.dumps(tracks), encoding='utf-8')
+    return tmp_path
+
+
+def selector(library, **kwargs):
+    return MusicSelector(str(library / 'music'), str(library / 'history.json'),
+                         fallback_dir=str(library / 'none'), **kwargs)
+
+
+def names(tracks):
+    return [track['file_path'].rsplit('/', 1)[-1] for track in tracks]
+
+
+def test_index_is_sorted_by_duration(library):
+    assert [duration for duration, _ in selector(library).get_index('business')] == [30, 60, 90, 200]
+
+
+def test_selects_shortest_covering_track(library):
+    assert names(selector(library).select('business', 55)) == ['track_60.mp3']
+    assert names(selector(library).select('business', 150)) == ['track_200.mp3']
+
+
+def test_concatenates_when_no_track_is_long_enough(library):
+    tracks = selector(library, crossfade_ms=0).select('business', 250)
+    assert names(tracks) == ['track_200.mp3', 'track_60.mp3']
+
+
+def test_avoids_recently_used_tracks(library):
+    music = selector(library, avoid_recent=2)
+    music.record('第1集', music.select('business', 55))
+    assert names(music.select('business', 55)) == ['track_90.mp3']
+
+
+def test_reuses_recent_tracks_when_nothing_else_is_left(library):
+    music = selector(library, avoid_recent=5)
+    for episode in range(4):
+        music.record(f'第{episode}集', music.select('business', 10))
+    assert len(music.select('business', 10)) == 1
+
+
+def test_empty_category(library):
+    assert selector(library).select('news', 60) == []
\ No newline at end of file
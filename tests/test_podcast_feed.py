@@ -0,0 +1,142 @@
+import os
+import asyncio
+import xml.etree.ElementTree as ET
+from email.utils import formatdate
+import aiohttp
+import pytest
+from aiohttp import web
+from podcast_feed import PodcastFeed, feed_etag
+from podcast_publisher import PodcastPublisher
+from scripts.serve_feed import create_app
+
+ITUNES = '{http://www.itunes.com/dtds/podcast-1.0.dtd}'
+
+
+@pytest.fixture
+def audio(tmp_path):
+    path = tmp_path / 'audio' / 'episode.mp3'
+    path.parent.mkdir()
+    path.write_bytes(b'\xff' * 2048)
+    return {'path': str(path), 'duration': 3725.4}
+
+
+@pytest.fixture
+def feed(tmp_path):
+    feed = PodcastFeed(str(tmp_path / 'feed'), base_url='https://example.com/', title='测试 & 播客', max_items=2)
+    yield feed
+    feed.close()
+
+
+def items(feed):
+    return ET.parse(feed.feed_path).getroot().find('channel').findall('item')
+
+
+def test_items_are_rendered(feed, audio):
+    validators = feed.add_item('show-s1e1', {'title': '第一集 <开场>', 'description': '介绍'}, audio, 1, 1, pub_date=1000)
+    channel = ET.parse(feed.feed_path).getroot().find('channel')
+    assert channel.find('title').text == '测试 & 播客'
+    item = channel.find('item')
+    assert item.find('title').text == '第一集 <开场>'
+    assert item.find('enclosure').attrib == {
+        'url': 'https://example.com/audio/episode.mp3', 'length': '2048', 'type': 'audio/mpeg'
+    }
+    assert item.find(f'{ITUNES}duration').text == '01:02:05'
+    assert item.find(f'{ITUNES}episode').text == '1'
+    assert item.find('pubDate').text == formatdate(1000, usegmt=True)
+
+    with open(feed.feed_path, 'rb') as f:
+        assert validators['etag'] == feed_etag(f.read())
+    assert validators['last_modified'] == formatdate(int(os.path.getmtime(feed.feed_path)), usegmt=True)
+    assert validators['items'] == 1
+
+
+def test_update_keeps_position_and_pub_date(feed, audio):
+    feed.add_item('show-s1e1', {'title': '第一集'}, audio, pub_date=1000)
+    feed.add_item('show-s1e2', {'title': '第二集'}, audio, pub_date=2000)
+    feed.add_item('show-s1e1', {'title': '第一集（修订）'}, audio, pub_date=3000)
+    assert [item.find('title').text for item in items(feed)] == ['第二集', '第一集（修订）']
+    assert items(feed)[1].find('pubDate').text == formatdate(1000, usegmt=True)
+
+
+def test_max_items_and_remove(feed, audio):
+    for episode in range(1, 4):
+        feed.add_item(f'show-s1e{episode}', {'title': f'第{episode}集'}, audio, pub_date=episode * 1000)
+    assert [item.find('title').text for item in items(feed)] == ['第3集', '第2集']
+    assert feed.remove_item('show-s1e3')['items'] == 2
+    assert [item.find('title').text for item in items(feed)] == ['第2集', '第1集']
+
+
+async def get(app, scenario):
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        async with aiohttp.ClientSession() as session:
+            return await scenario(session, f"http://127.0.0.1:{port}")
+    finally:
+        await runner.cleanup()
+
+
+def test_server_answers_conditional_requests(feed, audio):
+    validators = feed.add_item('show-s1e1', {'title': '第一集'}, audio)
+    app = create_app(feed.feed_path, os.path.dirname(audio['path']))
+
+    async def scenario(session, base_url):
+        statuses = []
+        async with session.get(f"{base_url}/feed.xml") as response:
+            assert response.headers['ETag'] == validators['etag']
+            assert response.headers['Last-Modified'] == validators['last_modified']
+            assert response.content_type == 'application/rss+xml'
+            statuses.append((response.status, len(await response.read())))
+        for headers in (
+            {'If-None-Match': validators['etag']},
+            {'If-None-Match': f'"other", W/{validators["etag"]}'},
+            {'If-Modified-Since': validators['last_modified']},
+            # If-None-Match不匹配时忽略If-Modified-Since
+            {'If-None-Match': '"other"', 'If-Modified-Since': validators['last_modified']},
+            {'If-Modified-Since': formatdate(0, usegmt=True)}
+        ):
+            async with session.get(f"{base_url}/feed.xml", headers=headers) as response:
+                statuses.append((response.status, len(await response.read())))
+
+        # 新增一集后旧的ETag失效
+        feed.add_item('show-s1e2', {'title': '第二集'}, audio)
+        async with session.get(f"{base_url}/feed.xml", headers={'If-None-Match': validators['etag']}) as response:
+            statuses.append((response.status, response.headers['ETag'] != validators['etag']))
+        return statuses
+
+    size = validators['size']
+    assert asyncio.run(get(app, scenario)) == [
+        (200, size), (304, 0), (304, 0), (304, 0), (200, size), (200, size), (200, True)
+    ]
+
+
+def test_server_serves_audio_with_range(feed, audio, tmp_path):
+    app = create_app(feed.feed_path, os.path.dirname(audio['path']))
+    (tmp_path / 'secret.txt').write_text('secret', encoding='utf-8')
+
+    async def scenario(session, base_url):
+        async with session.get(f"{base_url}/feed.xml") as response:
+            missing = response.status
+        async with session.get(f"{base_url}/audio/episode.mp3", headers={'Range': 'bytes=0-99'}) as response:
+            partial = (response.status, len(await response.read()))
+        async with session.get(f"{base_url}/audio/..%2Fsecret.txt") as response:
+            outside = response.status
+        return missing, partial, outside
+
+    assert asyncio.run(get(app, scenario)) == (404, (206, 100), 404)
+
+
+def test_publisher_updates_feed(tmp_path, monkeypatch, audio):
+    monkeypatch.setenv('FEED_ENABLED', 'true')
+    monkeypatch.setenv('FEED_DIR', str(tmp_path / 'feed'))
+    publisher = PodcastPublisher()
+    episode = {'show': 'show', 'season': 2, 'episode': 5}
+    publisher._update_feed(episode, {'title': '第五集'}, audio)
+    publisher._update_feed(episode, {'title': '第五集（修订）'}, audio)
+
+    root = ET.parse(str(tmp_path / 'feed' / 'feed.xml')).getroot()
+    assert [item.find('guid').text for item in root.iter('item')] == ['show-s2e5']
+    assert [item.find('title').text for item in root.iter('item')] == ['第五集（修订）']
\ No newline at end of file
@@ -0,0 +1,141 @@
+import os
+import asyncio
+from datetime import datetime, timedelta
+import pytest
+from aiohttp import web
+from exceptions import PodcastError
+from podcast_publisher import PodcastPublisher
+from publish_queue import PublishOutbox, PublishWorker
+from scripts.mock_platform_server import create_app, PLATFORM_KEY
+
+CONTENT = {'title': '测试标题', 'description': '简介', 'script': '脚本内容', 'style': '科技', 'topic': 'AI'}
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """发布记录写到临时目录，只配置小宇宙一个平台"""
+    for name, value in {
+        'EPISODE_CATALOG_PATH': tmp_path / 'episodes.db',
+        'PUBLISH_HISTORY_PATH': tmp_path / 'history.db',
+        'PUBLISH_QUEUE_PATH': tmp_path / 'queue.db',
+        'UPLOAD_MANIFEST_DIR': tmp_path / 'uploads',
+        'QC_ENABLED': 'false',
+        'FEED_ENABLED': 'false',
+        'XIAOYUZHOU_API_KEY': 'test',
+    }.items():
+        monkeypatch.setenv(name, str(value))
+    for platform in ('LIZHI', 'XIMALAYA', 'QINGTING'):
+        monkeypatch.delenv(f'{platform}_API_KEY', raising=False)
+    return tmp_path
+
+
+@pytest.fixture
+def audio_info(env):
+    path = env / 'episode.mp3'
+    path.write_bytes(os.urandom(4096))
+    return {'path': str(path), 'filename': 'episode.mp3', 'duration': 60, 'bitrate': 128}
+
+
+async def run_with_server(env, monkeypatch, scenario):
+    app = create_app(str(env / 'storage'), 'test')
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    monkeypatch.setenv('XIAOYUZHOU_API_URL', f"http://127.0.0.1:{port}/xiaoyuzhou")
+    try:
+        return await scenario(app[PLATFORM_KEY], PodcastPublisher())
+    finally:
+        await runner.cleanup()
+
+
+def test_unchanged_episode_is_skipped(env, audio_info, monkeypatch):
+    async def scenario(platform, publisher):
+        first = await publisher.publish_async(dict(audio_info), dict(CONTENT), ['xiaoyuzhou'])
+        assert first['xiaoyuzhou']['success']
+        platform.requests.clear()
+        again = await publisher.publish_async(dict(audio_info), dict(CONTENT), ['xiaoyuzhou'])
+        assert again['xiaoyuzhou']['skipped']
+        assert again['xiaoyuzhou']['episode_id'] == first['xiaoyuzhou']['episode_id']
+        assert not platform.requests
+
+    asyncio.run(run_with_server(env, monkeypatch, scenario))
+
+
+def test_description_change_updates_metadata(env, audio_info, monkeypatch):
+    """标题和脚本不变、只改简介时只更新平台上的元数据，不重新上传音频"""
+    async def scenario(platform, publisher):
+        first = await publisher.publish_async(dict(audio_info), dict(CONTENT), ['xiaoyuzhou'])
+        episode_id = first['xiaoyuzhou']['episode_id']
+        platform.requests.clear()
+        results = await publisher.publish_async(dict(audio_info), dict(CONTENT, description='新简介'), ['xiaoyuzhou'])
+        assert results['xiaoyuzhou']['updated']
+        assert results['xiaoyuzhou']['episode_id'] == episode_id
+        assert platform.requests == {'PATCH': 1}
+        assert platform.episodes[episode_id]['description'] == '新简介'
+
+        # 更新后的简介已记录，再次发布时跳过
+        platform.requests.clear()
+        again = await publisher.publish_async(dict(audio_info), dict(CONTENT, description='新简介'), ['xiaoyuzhou'])
+        assert again['xiaoyuzhou']['skipped']
+        assert not platform.requests
+
+    asyncio.run(run_with_server(env, monkeypatch, scenario))
+
+
+def test_enqueue_description_change(env, audio_info, monkeypatch):
+    async def scenario(platform, publisher):
+        await publisher.publish_async(dict(audio_info), dict(CONTENT), ['xiaoyuzhou'])
+        assert publisher.enqueue(dict(audio_info), dict(CONTENT), ['xiaoyuzhou']) == []
+        assert len(publisher.enqueue(dict(audio_info), dict(CONTENT, description='新简介'), ['xiaoyuzhou'])) == 1
+
+    asyncio.run(run_with_server(env, monkeypatch, scenario))
+
+def test_next_release_slot(env, monkeypatch):
+    monkeypatch.setenv('RELEASE_SLOTS', '07:00, 19:30')
+    publisher = PodcastPublisher()
+    assert publisher.next_release_slot(datetime(2026, 10, 19, 8, 0)) == datetime(2026, 10, 19, 19, 30)
+    assert publisher.next_release_slot(datetime(2026, 10, 19, 19, 30)) == datetime(2026, 10, 20, 7, 0)
+    monkeypatch.setenv('RELEASE_SLOTS', '')
+    with pytest.raises(PodcastError):
+        PodcastPublisher().next_release_slot()
+
+
+@pytest.mark.parametrize('idle_hours, now_hour, release_at, start', [
+    ('', 10, datetime(2026, 10, 20, 7), datetime(2026, 10, 19, 10)),
+    ('1-6', 10, datetime(2026, 10, 20, 7), datetime(2026, 10, 20, 1)),
+    ('1-6', 3, datetime(2026, 10, 19, 7), datetime(2026, 10, 19, 3)),
+    ('22-6', 23, datetime(2026, 10, 20, 7), datetime(2026, 10, 19, 23)),
+    # 等到空闲时段就来不及在发布前UPLOAD_LEAD_SECONDS开始上传
+    ('1-6', 10, datetime(2026, 10, 20, 1, 30), datetime(2026, 10, 19, 10))
+])
+def test_upload_start_prefers_idle_hours(env, monkeypatch, idle_hours, now_hour, release_at, start):
+    monkeypatch.setenv('UPLOAD_IDLE_HOURS', idle_hours)
+    monkeypatch.setenv('UPLOAD_LEAD_SECONDS', '3600')
+    assert PodcastPublisher()._upload_start(release_at, datetime(2026, 10, 19, now_hour)) == start
+
+
+def test_scheduled_draft_is_released_on_time(env, audio_info, monkeypatch):
+    monkeypatch.setenv('XIAOYUZHOU_DRAFTS', 'true')
+
+    async def scenario(platform, publisher):
+        release_at = datetime.now() + timedelta(seconds=1)
+        job_ids = publisher.enqueue(dict(audio_info), dict(CONTENT), ['xiaoyuzhou'], release_at=release_at)
+        outbox = PublishOutbox(str(env / 'queue.db'))
+        try:
+            worker = PublishWorker(outbox, publisher, poll_seconds=5)
+            await asyncio.wait_for(worker.run(job_ids=job_ids), 10)
+            published_at = datetime.now()
+            job = outbox.get(job_ids[0])
+        finally:
+            outbox.close()
+        [episode] = platform.episodes.values()
+        return release_at, published_at, job, episode
+
+    release_at, published_at, job, episode = asyncio.run(run_with_server(env, monkeypatch, scenario))
+    assert (job['state'], job['phase']) == ('done', 'release')
+    assert episode['status'] == 'published'
+    assert datetime.fromisoformat(episode['published_at']) >= release_at
+    # worker按到期时间醒来，不等轮询间隔
+    assert published_at - release_at < timedelta(seconds=1)
\ No newline at end of file
@@ -0,0 +1,138 @@
+import os
+import asyncio
+import pytest
+from aiohttp import web
+from publish_engine import PlatformClient, is_retryable
+from exceptions import APIError, PublishingError
+from scripts.mock_platform_server import create_app, MockPlatform, PLATFORM_KEY
+
+METADATA = {'title': '测试', 'description': '简介', 'publish_date': '2026-10-19T08:00:00'}
+
+
+async def run_with_server(tmp_path, scenario, max_retries=3):
+    """在随机端口启动模拟平台服务器，用连接到它的客户端执行scenario(平台, 客户端)"""
+    app = create_app(str(tmp_path / 'storage'), 'test')
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    client = PlatformClient('xiaoyuzhou', 'test', f"http://127.0.0.1:{port}/xiaoyuzhou",
+                            max_retries=max_retries, manifest_dir=str(tmp_path / 'manifests'))
+    client.retry_delay = 0
+    try:
+        return await scenario(app[PLATFORM_KEY], client)
+    finally:
+        await client.close()
+        await runner.cleanup()
+
+
+def faults(platform, *picks):
+    """按顺序注入故障，用完后不再注入"""
+    picks = iter(picks)
+    platform.faults.pick = lambda: next(picks, None)
+
+
+@pytest.fixture
+def audio_file(tmp_path):
+    path = tmp_path / 'episode.mp3'
+    path.write_bytes(os.urandom(4096))
+    return str(path)
+
+
+def test_is_retryable():
+    assert is_retryable(APIError('x', 503))
+    assert is_retryable(APIError('x', 429))
+    assert is_retryable(APIError('x', 408))
+    assert is_retryable(PublishingError('连接断开'))
+    assert not is_retryable(APIError('x', 400))
+    assert not is_retryable(APIError('x', 401))
+
+
+def test_publish_uploads_audio(tmp_path, audio_file):
+    async def scenario(platform, client):
+        result = await client.publish(audio_file, METADATA)
+        assert result['success'] and result['episode_id'] == 'xiaoyuzhou-1'
+        assert platform.requests == {'POST': 1}
+        assert platform.episodes['xiaoyuzhou-1']['title'] == '测试'
+
+    asyncio.run(run_with_server(tmp_path, scenario))
+
+
+def test_server_error_is_retried(tmp_path, audio_file):
+    """503和429重试，每次重新打开音频文件从头发送"""
+    async def scenario(platform, client):
+        faults(platform, 'error', 'throttle')
+        result = await client.publish(audio_file, METADATA)
+        assert result['success']
+        assert platform.requests == {'POST': 3}
+        with open(platform.episodes[result['episode_id']]['audio_path'], 'rb') as f, open(audio_file, 'rb') as g:
+            assert f.read() == g.read()
+
+    asyncio.run(run_with_server(tmp_path, scenario))
+
+
+def test_client_error_is_not_retried(tmp_path, audio_file, monkeypatch):
+    calls = []
+
+    async def reject(self, request):
+        calls.append(request.method)
+        return web.json_response({'error': 'invalid title'}, status=400)
+
+    monkeypatch.setattr(MockPlatform, 'create_episode', reject)
+
+    async def scenario(platform, client):
+        with pytest.raises(APIError) as info:
+            await client.publish(audio_file, METADATA)
+        assert info.value.status_code == 400
+        assert calls == ['POST']
+
+    asyncio.run(run_with_server(tmp_path, scenario))
+
+
+def test_retries_exhausted_raises_last_error(tmp_path, audio_file):
+    async def scenario(platform, client):
+        faults(platform, 'error', 'error', 'error')
+        with pytest.raises(APIError) as info:
+            await client.publish(audio_file, METADATA)
+        assert info.value.status_code == 503
+        assert platform.requests == {'POST': 3}
+
+    asyncio.run(run_with_server(tmp_path, scenario))
+
+
+@pytest.mark.parametrize('fault, expected', [(None, None), ('error', APIError)])
+def test_zero_max_retries_makes_one_attempt(tmp_path, audio_file, fault, expected):
+    """max_retries=0 时仍发送一次请求，成功返回结果、失败抛出异常，不会返回None"""
+    async def scenario(platform, client):
+        faults(platform, fault)
+        if expected:
+            with pytest.raises(expected):
+                await client.publish(audio_file, METADATA)
+        else:
+            assert (await client.publish(audio_file, METADATA))['success']
+        assert platform.requests == {'POST': 1}
+
+    asyncio.run(run_with_server(tmp_path, scenario, max_retries=0))
+
+
+def test_existing_episode_updates_metadata_only(tmp_path, audio_file):
+    async def scenario(platform, client):
+        episode_id = (await client.publish(audio_file, METADATA))['episode_id']
+        platform.requests.clear()
+        result = await client.publish(audio_file, dict(METADATA, description='新简介'), episode_id=episode_id)
+        assert result['success'] and result['updated']
+        assert result['episode_id'] == episode_id
+        assert platform.requests == {'PATCH': 1}
+        assert platform.episodes[episode_id]['description'] == '新简介'
+
+    asyncio.run(run_with_server(tmp_path, scenario))
+
+
+def test_missing_episode_is_uploaded_again(tmp_path, audio_file):
+    async def scenario(platform, client):
+        result = await client.publish(audio_file, METADATA, episode_id='xiaoyuzhou-404')
+        assert result['success'] and 'updated' not in result
+        assert platform.requests == {'PATCH': 1, 'POST': 1}
+
+    asyncio.run(run_with_server(tmp_path, scenario))
\ No newline at end of file
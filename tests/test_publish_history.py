@@ -0,0 +1,89 @@
+import json
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from publish_history import PublishHistory
+
+AUDIO = {'filename': 'episode.mp3', 'duration': 300.5, 'size': 4.2, 'bitrate': 128}
+RESULTS = {
+    'ximalaya': {'success': True, 'episode_id': 'x1', 'episode_url': 'https://example.com/x1'},
+    'xiaoyuzhou': {'success': False, 'error': '超时'}
+}
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = PublishHistory(str(tmp_path / 'data' / 'history.db'), legacy_path=str(tmp_path / 'legacy.json'))
+    yield history
+    history.close()
+
+
+def test_record_and_query(history):
+    history.record(AUDIO, {'title': 'First Episode'}, RESULTS, timestamp='2026-10-01T08:00:00')
+    history.record(AUDIO, {'title': 'Second Episode'}, {'ximalaya': {'success': True}}, timestamp='2026-10-02T08:00:00')
+
+    records = history.query()
+    assert [(record['slug'], record['platform']) for record in records] == [
+        ('second-episode', 'ximalaya'), ('first-episode', 'xiaoyuzhou'), ('first-episode', 'ximalaya')
+    ]
+    assert records[2]['result'] == RESULTS['ximalaya']
+    assert records[2]['duration'] == 300.5 and records[1]['date'] == '2026-10-01'
+    assert [record['title'] for record in history.query(date_from='2026-10-02')] == ['Second Episode']
+    assert [record['error'] for record in history.query(status='failed')] == ['超时']
+    assert len(history.query(platform='ximalaya', limit=1, offset=1)) == 1
+
+
+def test_summary_and_last_published(history):
+    history.record(AUDIO, {'title': 'First Episode'}, RESULTS, timestamp='2026-10-01T08:00:00')
+    history.record(AUDIO, {'title': 'First Episode'}, RESULTS, timestamp='2026-10-03T08:00:00')
+    assert history.summary() == {'ximalaya': {'success': 2, 'failed': 0}, 'xiaoyuzhou': {'success': 0, 'failed': 2}}
+    assert history.summary(date_to='2026-10-02')['ximalaya'] == {'success': 1, 'failed': 0}
+    assert history.last_published('first-episode', 'ximalaya')['timestamp'] == '2026-10-03T08:00:00'
+    assert history.last_published('first-episode', 'xiaoyuzhou') is None
+
+
+def test_concurrent_writers(tmp_path):
+    """多个连接同时写入同一数据库"""
+    db_path = str(tmp_path / 'history.db')
+
+    def publish(worker):
+        history = PublishHistory(db_path, legacy_path=None)
+        for episode in range(20):
+            history.record(AUDIO, {'title': f'Episode {worker} {episode}'}, RESULTS)
+        history.close()
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(publish, range(4)))
+    history = PublishHistory(db_path, legacy_path=None)
+    assert history.summary()['ximalaya']['success'] == 80
+    history.close()
+
+
+def test_migrates_legacy_json_once(tmp_path):
+    legacy = tmp_path / 'legacy.json'
+    entries = [
+        {'timestamp': '2025-01-05T10:00:00', 'title': 'Old Episode', 'audio_info': AUDIO, 'publish_results': RESULTS},
+        {'title': '没有时间戳'}
+    ]
+    legacy.write_text(json.dumps(entries, ensure_ascii=False), encoding='utf-8')
+    db_path = str(tmp_path / 'history.db')
+
+    history = PublishHistory(db_path, legacy_path=str(legacy))
+    assert len(history.query(slug='old-episode')) == 2
+    assert not legacy.exists() and (tmp_path / 'legacy.json.migrated').exists()
+    history.close()
+
+    # 旧文件再次出现时不会重复导入
+    shutil.copy(tmp_path / 'legacy.json.migrated', legacy)
+    history = PublishHistory(db_path, legacy_path=str(legacy))
+    assert len(history.query()) == 2
+    history.close()
+
+
+def test_unreadable_legacy_file_is_left_in_place(tmp_path):
+    legacy = tmp_path / 'legacy.json'
+    legacy.write_text('{broken', encoding='utf-8')
+    history = PublishHistory(str(tmp_path / 'history.db'), legacy_path=str(legacy))
+    assert history.query() == []
+    assert legacy.exists()
+    history.close()
\ No newline at end of file
@@ -0,0 +1,346 @@
+import asyncio
+import sqlite3
+import aiohttp
+import pytest
+import publish_queue
+from publish_queue import PublishOutbox, PublishWorker, CircuitBreaker, is_retryable, PENDING, RUNNING, FAILED
+from exceptions import APIError, PublishingError
+
+
+class Clock:
+    """可手动推进的时钟，替换 time.time 和 time.monotonic"""
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(publish_queue.time, 'time', clock)
+    monkeypatch.setattr(publish_queue.time, 'monotonic', clock)
+    return clock
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = PublishOutbox(str(tmp_path / 'queue.db'))
+    yield outbox
+    outbox.close()
+
+
+@pytest.fixture
+def audio_info(tmp_path):
+    return {'path': str(tmp_path / 'episode.mp3'), 'filename': 'episode.mp3'}
+
+
+def enqueue(outbox, audio_info, platforms=('xiaoyuzhou',), **kwargs):
+    return outbox.enqueue(audio_info, {'title': '测试'}, {'title': '测试'}, list(platforms), **kwargs)
+
+
+def test_enqueue_ignores_duplicate_episode(outbox, audio_info, clock):
+    assert len(enqueue(outbox, audio_info, ('xiaoyuzhou', 'lizhi'))) == 2
+    assert enqueue(outbox, audio_info, ('xiaoyuzhou',)) == []
+    assert outbox.stats() == {'xiaoyuzhou': {PENDING: 1}, 'lizhi': {PENDING: 1}}
+
+
+def test_claim_leases_job_to_one_worker(outbox, audio_info, clock):
+    [job_id] = enqueue(outbox, audio_info)
+    job = outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    assert job['id'] == job_id
+    assert job['state'] == RUNNING
+    assert job['attempts'] == 1
+    assert job['content'] == {'title': '测试'}
+    assert outbox.claim('xiaoyuzhou', 'w2', lease_seconds=60) is None
+    assert outbox.claim('lizhi', 'w2', lease_seconds=60) is None
+
+
+def test_expired_lease_is_reclaimed(outbox, audio_info, clock):
+    [job_id] = enqueue(outbox, audio_info)
+    outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    clock.advance(30)
+    outbox.renew(job_id, 'w1', lease_seconds=60)
+    clock.advance(59)
+    assert outbox.claim('xiaoyuzhou', 'w2', lease_seconds=60) is None
+
+    # worker崩溃后租约过期，任务被其他worker重新领取
+    clock.advance(2)
+    job = outbox.claim('xiaoyuzhou', 'w2', lease_seconds=60)
+    assert job['id'] == job_id
+    assert job['locked_by'] == 'w2'
+    assert job['attempts'] == 2
+
+
+def test_renew_ignores_other_workers(outbox, audio_info, clock):
+    [job_id] = enqueue(outbox, audio_info)
+    outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    outbox.renew(job_id, 'w2', lease_seconds=600)
+    assert outbox.get(job_id)['lease_until'] == clock.now + 60
+
+
+def test_retry_waits_for_backoff(outbox, audio_info, clock):
+    [job_id] = enqueue(outbox, audio_info)
+    outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    outbox.retry(job_id, '503', delay=30)
+
+    job = outbox.get(job_id)
+    assert job['state'] == PENDING
+    assert job['last_error'] == '503'
+    assert job['locked_by'] is None
+    assert outbox.next_due() == clock.now + 30
+    assert outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60) is None
+
+    clock.advance(30)
+    assert outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)['attempts'] == 2
+
+
+def test_release_gives_back_attempt(outbox, audio_info, clock):
+    [job_id] = enqueue(outbox, audio_info)
+    outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    outbox.release(job_id)
+    assert outbox.get(job_id)['attempts'] == 0
+    assert outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)['attempts'] == 1
+
+
+def test_failed_job_is_not_claimed_until_requeued(outbox, audio_info, clock):
+    [job_id] = enqueue(outbox, audio_info)
+    outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    outbox.fail(job_id, '401 unauthorized')
+
+    assert outbox.get(job_id)['state'] == FAILED
+    assert outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60) is None
+    assert outbox.platforms() == []
+
+    assert outbox.requeue_failed('xiaoyuzhou') == 1
+    job = outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    assert job['id'] == job_id
+    assert job['attempts'] == 1
+
+
+def test_complete_records_result(outbox, audio_info, clock):
+    [job_id] = enqueue(outbox, audio_info)
+    outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    outbox.complete(job_id, {'success': True, 'episode_id': 'x-1'})
+    job = outbox.get(job_id)
+    assert job['state'] == 'done'
+    assert job['result']['episode_id'] == 'x-1'
+    assert outbox.next_due() is None
+
+
+def test_draft_is_released_at_release_time(outbox, audio_info, clock):
+    release_at = clock.now + 3600
+    [job_id] = enqueue(outbox, audio_info, release_at=release_at, drafts=('xiaoyuzhou',))
+    job = outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60, phase=publish_queue.UPLOAD)
+    assert job['draft'] == 1
+
+    outbox.stage_release(job_id, {'success': True, 'episode_id': 'x-1'})
+    assert outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60, phase=publish_queue.RELEASE) is None
+    clock.advance(3600)
+    job = outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60, phase=publish_queue.RELEASE)
+    assert job['id'] == job_id
+    assert job['attempts'] == 1
+
+
+def test_token_bucket_limits_uploads(outbox, clock):
+    assert outbox.take_token('xiaoyuzhou', per_hour=3600, burst=2)
+    assert outbox.take_token('xiaoyuzhou', per_hour=3600, burst=2)
+    assert not outbox.take_token('xiaoyuzhou', per_hour=3600, burst=2)
+    clock.advance(1)
+    assert outbox.take_token('xiaoyuzhou', per_hour=3600, burst=2)
+    outbox.return_token('xiaoyuzhou', burst=2)
+    assert outbox.take_token('xiaoyuzhou', per_hour=3600, burst=2)
+    assert outbox.take_token('lizhi', per_hour=0)
+
+
+def test_circuit_breaker_opens_and_probes(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=10)
+    assert breaker.state == 'closed'
+    breaker.record_failure()
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == 'open'
+    assert not breaker.allow()
+
+    # 冷却后半开: 只放行一个试探请求，失败立即重新打开
+    clock.advance(10)
+    assert breaker.state == 'half_open'
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == 'open'
+
+    clock.advance(10)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == 'closed'
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+@pytest.mark.parametrize('error, retryable', [
+    (APIError('bad request', 400), False),
+    (APIError('unauthorized', 401), False),
+    (APIError('forbidden', 403), False),
+    (APIError('too large', 413), False),
+    (APIError('timeout', 408), True),
+    (APIError('rate limited', 429), True),
+    (APIError('server error', 500), True),
+    (APIError('unavailable', 503), True),
+    (APIError('no status'), True),
+    (PublishingError('connection reset'), True),
+    (aiohttp.ClientConnectionError(), True),
+    (asyncio.TimeoutError(), True),
+])
+def test_is_retryable(error, retryable):
+    assert is_retryable(error) is retryable
+
+def test_finished_job_is_requeued(outbox, audio_info, clock):
+    [job_id] = enqueue(outbox, audio_info)
+    outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    outbox.complete(job_id, {'success': True})
+    # 再次发布（例如只改了标题）时复用同一条任务并重新排队
+    assert outbox.enqueue(audio_info, {'title': '新标题'}, {'title': '新标题'}, ['xiaoyuzhou']) == [job_id]
+    job = outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60)
+    assert job['content'] == {'title': '新标题'}
+    assert job['attempts'] == 1
+    assert job['result'] is None
+
+
+class FakeClient:
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    async def publish(self, audio_path, metadata, episode_id=None):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return {'success': True, 'platform': 'xiaoyuzhou', 'episode_id': 'x-1', 'episode_url': 'http://x/1'}
+
+    async def close(self):
+        pass
+
+
+class FakePublisher:
+    supported_platforms = ['xiaoyuzhou', 'lizhi']
+
+    def __init__(self, client):
+        self.client = client
+        self.recorded = []
+
+    def build_client(self, platform, max_retries=None):
+        return self.client
+
+    def plan_uploads(self, audio_info, content, platforms, results):
+        return platforms, {}
+
+    def record_publish_result(self, audio_info, content, platform, result):
+        self.recorded.append((platform, result['success']))
+
+
+def run_worker(outbox, publisher, job_ids):
+    worker = PublishWorker(outbox, publisher, backoff_base=0.01, backoff_max=0.01, poll_seconds=0.01)
+    asyncio.run(asyncio.wait_for(worker.run(job_ids=job_ids), 10))
+
+
+def test_worker_waits_for_its_jobs(outbox, audio_info):
+    publisher = FakePublisher(FakeClient())
+    job_ids = enqueue(outbox, audio_info)
+    run_worker(outbox, publisher, job_ids)
+    assert outbox.get(job_ids[0])['state'] == 'done'
+    assert outbox.get(job_ids[0])['result']['episode_id'] == 'x-1'
+    assert publisher.recorded == [('xiaoyuzhou', True)]
+
+
+def test_worker_fails_permanent_errors_without_retry(outbox, audio_info):
+    client = FakeClient(APIError('unauthorized', 401))
+    job_ids = enqueue(outbox, audio_info)
+    run_worker(outbox, FakePublisher(client), job_ids)
+    job = outbox.get(job_ids[0])
+    assert job['state'] == FAILED
+    assert job['attempts'] == 1
+    assert client.calls == 1
+
+
+def test_worker_retries_transient_errors(outbox, audio_info):
+    client = FakeClient(APIError('unavailable', 503))
+    job_ids = outbox.enqueue(audio_info, {}, {}, ['xiaoyuzhou'], max_attempts=3)
+    run_worker(outbox, FakePublisher(client), job_ids)
+    assert outbox.get(job_ids[0])['state'] == FAILED
+    assert client.calls == 3
+
+def test_enqueue_schedules_by_release_time(outbox, audio_info, clock):
+    """草稿平台从upload_at开始上传，其余平台到发布时间才上传"""
+    release_at = clock.now + 3600
+    draft_id, upload_id = enqueue(outbox, audio_info, ('xiaoyuzhou', 'lizhi'), release_at=release_at,
+                                  drafts=('xiaoyuzhou',), upload_at=clock.now + 600)
+    assert outbox.get(draft_id)['next_attempt_at'] == clock.now + 600
+    assert outbox.get(upload_id)['next_attempt_at'] == release_at
+    assert (outbox.get(upload_id)['draft'], outbox.get(upload_id)['phase']) == (0, publish_queue.UPLOAD)
+
+    # upload_at晚于发布时间时不推迟发布
+    other = dict(audio_info, path=audio_info['path'] + '.2')
+    [late_id] = enqueue(outbox, other, release_at=release_at, drafts=('xiaoyuzhou',), upload_at=release_at + 600)
+    assert outbox.get(late_id)['next_attempt_at'] == release_at
+
+
+def test_old_queue_gains_schedule_columns(tmp_path, audio_info, clock):
+    db_path = str(tmp_path / 'queue.db')
+    connection = sqlite3.connect(db_path)
+    connection.execute("""
+        CREATE TABLE publish_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, episode_key TEXT NOT NULL, platform TEXT NOT NULL,
+            audio_info TEXT NOT NULL, content TEXT NOT NULL, metadata TEXT NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL,
+            next_attempt_at REAL NOT NULL, locked_by TEXT, lease_until REAL, last_error TEXT, result TEXT,
+            created_at REAL NOT NULL, updated_at REAL NOT NULL, UNIQUE (episode_key, platform)
+        )
+    """)
+    connection.execute(
+        "INSERT INTO publish_jobs (episode_key, platform, audio_info, content, metadata, max_attempts, "
+        "next_attempt_at, created_at, updated_at) VALUES ('a', 'xiaoyuzhou', '{}', '{}', '{}', 8, 0, 0, 0)"
+    )
+    connection.commit()
+    connection.close()
+
+    outbox = PublishOutbox(db_path)
+    job = outbox.claim('xiaoyuzhou', 'w1', lease_seconds=60, phase=publish_queue.UPLOAD)
+    assert (job['phase'], job['draft'], job['release_at']) == (publish_queue.UPLOAD, 0, None)
+    outbox.close()
+
+
+def test_next_due_after(outbox, audio_info, clock):
+    enqueue(outbox, audio_info)
+    enqueue(outbox, dict(audio_info, path=audio_info['path'] + '.2'), release_at=clock.now + 100)
+    assert outbox.next_due() == clock.now
+    assert outbox.next_due(after=clock.now) == clock.now + 100
+    assert outbox.next_due(after=clock.now + 100) is None
+
+
+def test_releases_are_not_rate_limited(outbox, audio_info, clock):
+    worker = PublishWorker(outbox, FakePublisher(FakeClient()), rate_limits={'xiaoyuzhou': 1}, bucket_burst=1)
+    [draft_id] = enqueue(outbox, audio_info, release_at=clock.now + 60, drafts=('xiaoyuzhou',))
+    clock.advance(1)
+    [upload_id] = enqueue(outbox, dict(audio_info, path=audio_info['path'] + '.2'))
+
+    assert worker._claim('xiaoyuzhou')['id'] == draft_id
+    outbox.stage_release(draft_id, {'success': True, 'episode_id': 'x-1'})
+    # 令牌已用完，上传任务等待；到点的草稿发布照常领取
+    assert worker._claim('xiaoyuzhou') is None
+    clock.advance(60)
+    assert worker._claim('xiaoyuzhou')['id'] == draft_id
+    assert worker._claim('xiaoyuzhou') is None
+    assert outbox.get(upload_id)['state'] == PENDING
+
+
+def test_unused_token_is_returned(outbox, clock):
+    worker = PublishWorker(outbox, FakePublisher(FakeClient()), rate_limits={'xiaoyuzhou': 1}, bucket_burst=1)
+    assert worker._claim('xiaoyuzhou') is None
+    assert outbox.take_token('xiaoyuzhou', per_hour=1, burst=1)
\ No newline at end of file
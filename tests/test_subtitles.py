@@ -0,0 +1,58 @@
+import json
+from subtitles import SubtitleTrack, split_sentences, strip_stage_directions
+
+
+def track():
+    return SubtitleTrack([
+        {'text': '欢迎收听。', 'start': 0, 'end': 1500, 'speaker': '主持人'},
+        {'text': '谢谢。', 'start': 3723004.4, 'end': 3724000}
+    ])
+
+
+def test_split_sentences():
+    text = '[音乐渐入]大家好！今天聊什么？\n聊聊“播客”。Hello world! ……'
+    assert split_sentences(text) == ['大家好！', '今天聊什么？', '聊聊“播客”。', 'Hello world!']
+
+
+def test_strip_stage_directions():
+    assert strip_stage_directions('好的（笑）【停顿】[音效]继续(pause)。') == '好的继续。'
+
+
+def test_format_time():
+    assert SubtitleTrack._format_time(3723004.6, ',') == '01:02:03,005'
+    assert SubtitleTrack._format_time(-20, '.') == '00:00:00.000'
+
+
+def test_to_srt():
+    assert track().to_srt() == (
+        '1\n00:00:00,000 --> 00:00:01,500\n主持人：欢迎收听。\n\n'
+        '2\n01:02:03,004 --> 01:02:04,000\n谢谢。\n'
+    )
+
+
+def test_to_vtt_uses_voice_tags():
+    assert track().to_vtt() == (
+        'WEBVTT\n\n'
+        '00:00:00.000 --> 00:00:01.500\n<v 主持人>欢迎收听。\n\n'
+        '01:02:03.004 --> 01:02:04.000\n谢谢。\n'
+    )
+
+
+def test_to_json_in_seconds():
+    assert track().to_json() == {'version': 1, 'cues': [
+        {'text': '欢迎收听。', 'start': 0.0, 'end': 1.5, 'speaker': '主持人'},
+        {'text': '谢谢。', 'start': 3723.004, 'end': 3724.0}
+    ]}
+
+
+def test_save_writes_all_formats(tmp_path):
+    subtitles = track()
+    paths = subtitles.save(str(tmp_path / 'episode'))
+    assert paths == {
+        'srt': str(tmp_path / 'episode.srt'),
+        'vtt': str(tmp_path / 'episode.vtt'),
+        'timings': str(tmp_path / 'episode.timings.json')
+    }
+    assert (tmp_path / 'episode.srt').read_text(encoding='utf-8') == subtitles.to_srt()
+    assert (tmp_path / 'episode.vtt').read_text(encoding='utf-8') == subtitles.to_vtt()
+    assert json.loads((tmp_path / 'episode.timings.json').read_text(encoding='utf-8')) == subtitles.to_json()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import json
+import numpy as np
+from waveform_peaks import WaveformPeaksBuilder
+
+
+def signal(frames=10000, channels=2):
+    rng = np.random.default_rng(3)
+    return rng.uniform(-0.8, 0.8, (frames, channels)).astype(np.float32)
+
+
+def build(path, samples, block=4096, **kwargs):
+    builder = WaveformPeaksBuilder(str(path), 8000, **kwargs)
+    for start in range(0, len(samples), block):
+        builder.process_block(samples[start:start + block])
+    assert builder.finalize() == {'peaks_path': str(path)}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_levels_and_format(tmp_path):
+    peaks = build(tmp_path / 'peaks.json', signal(), samples_per_pixel=100, levels=3)
+    assert (peaks['version'], peaks['channels'], peaks['sample_rate'], peaks['bits']) == (2, 1, 8000, 8)
+    assert [level['samples_per_pixel'] for level in peaks['levels']] == [100, 400, 1600]
+    assert [level['length'] for level in peaks['levels']] == [100, 25, 7]
+    assert all(len(level['data']) == 2 * level['length'] for level in peaks['levels'])
+
+
+def test_block_size_does_not_change_peaks(tmp_path):
+    samples = signal()
+    first = build(tmp_path / 'a.json', samples, block=4096, samples_per_pixel=64)
+    second = build(tmp_path / 'b.json', samples, block=333, samples_per_pixel=64)
+    assert first == second
+
+
+def test_coarse_levels_match_direct_computation(tmp_path):
+    """合并得到的粗级别与直接按更大的samples_per_pixel计算一致"""
+    samples = signal(frames=10050)
+    merged = build(tmp_path / 'a.json', samples, samples_per_pixel=50, levels=2, zoom_factor=4)
+    direct = build(tmp_path / 'b.json', samples, samples_per_pixel=200, levels=1)
+    assert merged['levels'][1] == direct['levels'][0]
+
+
+def test_min_max_are_quantized(tmp_path):
+    samples = np.zeros((400, 1), dtype=np.float32)
+    samples[10] = 1.0
+    samples[250] = -1.0
+    data = build(tmp_path / 'peaks.json', samples, samples_per_pixel=200, levels=1)['levels'][0]['data']
+    assert data == [0, 127, -127, 0]
+
+
+def test_stops_at_single_pixel(tmp_path):
+    peaks = build(tmp_path / 'peaks.json', signal(frames=500), samples_per_pixel=256, levels=6)
+    assert [level['length'] for level in peaks['levels']] == [2, 1]
+
+
+def test_empty_audio(tmp_path):
+    peaks = build(tmp_path / 'peaks.json', np.zeros((0, 1), dtype=np.float32), levels=3)
+    assert peaks['levels'] == [{'samples_per_pixel': 256, 'length': 0, 'data': []}]
\ No newline at end of file
@@ -0,0 +1,78 @@
+import json
+import numpy as np
+from logger import logger
+
+class WaveformPeaksBuilder:
+    """
+    波形峰值生成器，作为BlockRenderer的输出端在导出时顺带计算
+    最细一级为每samples_per_pixel个采样点的最小/最大值，更粗的级别由上一级合并得到
+    输出格式参考audiowaveform的JSON格式（8位精度），多级数据放在levels中
+    """
+
+    def __init__(self, output_path, frame_rate, samples_per_pixel=256, levels=4, zoom_factor=4):
+        self.output_path = output_path
+        self.frame_rate = frame_rate
+        self.samples_per_pixel = samples_per_pixel
+        self.levels = levels
+        self.zoom_factor = zoom_factor
+
+        self.remainder = np.zeros(0, dtype=np.float32)
+        self.mins = []
+        self.maxs = []
+
+    def process_block(self, block):
+        """处理一个 (帧数, 声道数) 的float32块"""
+        mono = np.concatenate([self.remainder, block.mean(axis=1)])
+        n_pixels = len(mono) // self.samples_per_pixel
+        used = n_pixels * self.samples_per_pixel
+        if n_pixels:
+            pixels = mono[:used].reshape(n_pixels, self.samples_per_pixel)
+            self.mins.append(pixels.min(axis=1))
+            self.maxs.append(pixels.max(axis=1))
+        self.remainder = mono[used:]
+
+    def _quantize(self, values):
+        """float转8位有符号整数"""
+        return np.clip(np.round(values * 127), -128, 127).astype(np.int8)
+
+    def finalize(self):
+        """生成多级峰值并写入JSON文件，返回 {'peaks_path': 路径}"""
+        if len(self.remainder):
+            self.mins.append(np.array([self.remainder.min()]))
+            self.maxs.append(np.array([self.remainder.max()]))
+
+        mins = np.concatenate(self.mins) if self.mins else np.zeros(0, dtype=np.float32)
+        maxs = np.concatenate(self.maxs) if self.maxs else np.zeros(0, dtype=np.float32)
+
+        levels = []
+        samples_per_pixel = self.samples_per_pixel
+        for _ in range(self.levels):
+            data = np.empty(len(mins) * 2, dtype=np.int8)
+            data[0::2] = self._quantize(mins)
+            data[1::2] = self._quantize(maxs)
+            levels.append({
+                'samples_per_pixel': samples_per_pixel,
+                'length': len(mins),
+                'data': data.tolist()
+            })
+
+            # 下一级: 每zoom_factor个像素合并为一个，末尾不足的部分补齐
+            pad = (-len(mins)) % self.zoom_factor
+            if len(mins) <= 1:
+                break
+            mins = np.concatenate([mins, np.repeat(mins[-1:], pad)]).reshape(-1, self.zoom_factor).min(axis=1)
+            maxs = np.concatenate([maxs, np.repeat(maxs[-1:], pad)]).reshape(-1, self.zoom_factor).max(axis=1)
+            samples_per_pixel *= self.zoom_factor
+
+        peaks = {
+            'version': 2,
+            'channels': 1,
+            'sample_rate': self.frame_rate,
+            'bits': 8,
+            'levels': levels
+        }
+        with open(self.output_path, 'w', encoding='utf-8') as f:
+            json.dump(peaks, f, separators=(',', ':'))
+
+        logger.info(f"波形峰值已生成: {self.output_path} ({len(levels)} 级)")
+        return {'peaks_path': self.output_path}